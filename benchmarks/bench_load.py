@@ -0,0 +1,144 @@
+"""
+Load test of the label pipeline against csv_shipper.simulator: generated
+CSVs of growing size are shipped through csv_reader.ship_csv with a
+ShipEngineExecutor at several concurrency levels, and labels/sec plus the
+p50/p99 latency of the individual POST /labels calls are reported.
+
+The client's own rate limiter is lifted, so the only throttling is what
+the simulator is told to do.
+
+Usage:
+    python -m benchmarks.bench_load [max_rows] [latency_ms] [error_rate] [rate_limit]
+"""
+import csv
+import dataclasses
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from csv_shipper.concurrency import ShipEngineExecutor, TokenBucket
+from csv_shipper.csv_reader import ADDRESS_COLUMNS, ship_csv
+from csv_shipper.models import ShipFromAddress
+from csv_shipper.se_client import ShipEngine
+from csv_shipper.se_retry import RetryPolicy
+from csv_shipper.se_transport import DEFAULT_CONFIG, close_sessions
+from csv_shipper.simulator import SimulatorConfig, start_simulator
+
+CONCURRENCY_LEVELS = (1, 4, 16, 64)
+
+ADDRESS = dict(
+    name="Kasey Cantu",
+    phone="1-789-456-1234",
+    company_name="ShipEngine",
+    address_line1="4009 Marathon Blvd",
+    address_line2="Suite 100",
+    address_line3=None,
+    city_locality="Austin",
+    state_province="TX",
+    postal_code="78756",
+    country_code="US",
+    address_residential_indicator="no",
+)
+
+
+def write_csv(path: str, rows: int):
+    columns = (*ADDRESS_COLUMNS, "weight_value", "weight_unit", "external_order_id")
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row_number in range(1, rows + 1):
+            writer.writerow(
+                dict(
+                    ADDRESS,
+                    name=f"Customer {row_number}",
+                    weight_value=1 + row_number % 20 / 4,
+                    weight_unit="pound",
+                    external_order_id=f"order-{row_number}",
+                )
+            )
+
+
+class TimedShipEngine(ShipEngine):
+    """Records the latency of every create_label attempt, retries included."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def create_label(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().create_label(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.latencies.append(seconds)
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(base_url: str, csv_path: str, concurrency: int):
+    se = TimedShipEngine(
+        api_key="TEST_simulator",
+        transport_config=dataclasses.replace(DEFAULT_CONFIG, pool_maxsize=concurrency),
+    )
+    se._BASE_URL = base_url
+    executor = ShipEngineExecutor(
+        max_workers=concurrency,
+        rate_limiter=TokenBucket(rate=1e9),
+        retry_policy=RetryPolicy(base_delay=0.05, max_delay=1),
+    )
+    ship_from = ShipFromAddress(**ADDRESS)
+
+    labels = failed = 0
+    start = time.perf_counter()
+    for _, resp in ship_csv(se, csv_path, ship_from, executor=executor):
+        if isinstance(resp, Exception):
+            failed += 1
+        else:
+            labels += 1
+    seconds = time.perf_counter() - start
+    close_sessions()
+    return labels, failed, seconds, se.latencies
+
+
+def main(max_rows: int = 1000, latency_ms: float = 20, error_rate: float = 0, rate_limit: float = 0):
+    config = SimulatorConfig(
+        latency_ms=latency_ms,
+        latency_jitter_ms=latency_ms / 2,
+        error_rate=error_rate,
+        rate_limit=rate_limit,
+    )
+    server = start_simulator(config)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1/"
+    print(f"simulator: {config}")
+    print(f"{'rows':>6} {'workers':>7} {'labels/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'failed':>6}")
+
+    sizes = []
+    rows = 100
+    while rows <= int(max_rows):
+        sizes.append(rows)
+        rows *= 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            csv_path = os.path.join(tmp, f"orders_{rows}.csv")
+            write_csv(csv_path, rows)
+            for concurrency in CONCURRENCY_LEVELS:
+                labels, failed, seconds, latencies = run(base_url, csv_path, concurrency)
+                print(
+                    f"{rows:>6} {concurrency:>7} {labels / seconds:>9.1f} "
+                    f"{percentile(latencies, 0.5) * 1e3:>8.1f} "
+                    f"{percentile(latencies, 0.99) * 1e3:>8.1f} {failed:>6}"
+                )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*map(float, sys.argv[1:]))
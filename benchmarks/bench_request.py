@@ -0,0 +1,98 @@
+"""
+Per-call overhead of ShipEngine.request against a local stub server that
+answers every request with a label response carrying an inline base64
+document, compared to the old pipeline that parsed the body twice and
+pretty-printed it for logging on every call.
+
+Usage:
+    python -m benchmarks.bench_request [requests] [label_kb]
+"""
+import base64
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from csv_shipper.se_client import ShipEngine
+
+
+def label_body(label_kb: int) -> bytes:
+    document = base64.b64encode(os.urandom(label_kb * 1024)).decode("ascii")
+    return json.dumps(
+        {
+            "label_id": "se-123456",
+            "status": "completed",
+            "shipment_id": "se-654321",
+            "tracking_number": "1Z12345E0205271688",
+            "shipment_cost": {"currency": "usd", "amount": 9.37},
+            "label_download": {"href": f"data:application/pdf;base64,{document}"},
+        }
+    ).encode("utf-8")
+
+
+def start_stub_server(body: bytes) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def legacy_request(se: ShipEngine, method: str, endpoint: str, **kwargs):
+    """ShipEngine.request as it was: two parses and an eager json.dumps."""
+    resp = se.session.request(method, se._BASE_URL + endpoint.strip("/"), **kwargs)
+    resp.raise_for_status()
+    logging.debug(json.dumps(resp.json(), indent=4))
+    return resp.json()
+
+
+def timed(name: str, number: int, fn):
+    fn()  # warm up the connection
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    seconds = time.perf_counter() - start
+    print(f"{name:<32} {seconds / number * 1e3:8.3f} ms/request")
+
+
+def main(number: int = 500, label_kb: int = 64):
+    server = start_stub_server(label_body(label_kb))
+    se = ShipEngine(api_key="TEST_stub")
+    se._BASE_URL = f"http://127.0.0.1:{server.server_port}/v1/"
+    payload = {"label_format": "pdf"}
+
+    for level in (logging.INFO, logging.DEBUG):
+        # Log to nowhere, only the cost of building the records counts.
+        logging.basicConfig(handlers=[logging.NullHandler()], level=level, force=True)
+        suffix = logging.getLevelName(level)
+        timed(
+            f"legacy request ({suffix})",
+            number,
+            lambda: legacy_request(se, "POST", "labels", json=payload),
+        )
+        timed(
+            f"ShipEngine.request ({suffix})",
+            number,
+            lambda: se.request("POST", "labels", json=payload),
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,89 @@
+"""
+Per-shipment payload serialization cost, dataclasses.asdict vs to_payload,
+and the per-row cost of building a Shipment and serializing it vs merging
+the row into a ShipmentTemplate.
+
+Usage:
+    python -m benchmarks.bench_serialization [shipments]
+"""
+import dataclasses
+import sys
+import timeit
+
+from csv_shipper.models import (
+    Package,
+    PackageDimensions,
+    PackageWeight,
+    Shipment,
+    ShipFromAddress,
+    ShipToAddress,
+)
+from csv_shipper.serializers import to_payload
+from csv_shipper.shipment_template import ShipmentTemplate
+
+
+def build_shipment() -> Shipment:
+    address = dict(
+        name="Kasey Cantu",
+        phone="1-789-456-1234",
+        company_name="ShipEngine",
+        address_line1="4009 Marathon Blvd",
+        address_line2="Suite 100",
+        address_line3=None,
+        city_locality="Austin",
+        state_province="TX",
+        postal_code="78756",
+        country_code="US",
+        address_residential_indicator="no",
+    )
+    package = Package(
+        weight=PackageWeight(value=2.5, unit="pound"),
+        dimensions=PackageDimensions(unit="inch", length=12.5, width=12.5, height=12.5),
+    )
+    return Shipment(
+        carrier_id="se-123456",
+        service_code="ups_next_day_air",
+        validate_address="validate_and_clean",
+        external_order_id=None,
+        items=None,
+        external_shipment_id=None,
+        ship_date="10/18/2026",
+        ship_to=ShipToAddress(**address),
+        ship_from=ShipFromAddress(**address),
+        warehouse_id=None,
+        return_to=None,
+        confirmation="delivery",
+        customs=None,
+        advanced_options=None,
+        insurance_provider="none",
+        packages=[package, package],
+    )
+
+
+def main(number: int = 50000):
+    shipment = build_shipment()
+    for name, fn in (
+        ("dataclasses.asdict", dataclasses.asdict),
+        ("to_payload", to_payload),
+    ):
+        seconds = min(timeit.repeat(lambda: fn(shipment), number=number, repeat=3))
+        print(f"{name:<20} {seconds / number * 1e6:8.2f} us/shipment")
+
+    def per_row_shipment():
+        return to_payload(
+            dataclasses.replace(shipment, ship_to=shipment.ship_to, packages=shipment.packages)
+        )
+
+    template = ShipmentTemplate(
+        shipment.carrier_id, shipment.service_code, shipment.ship_from, shipment.ship_date
+    )
+    for name, fn in (
+        ("Shipment+to_payload", per_row_shipment),
+        ("ShipmentTemplate", lambda: template.payload(shipment.ship_to, shipment.packages)),
+    ):
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        print(f"{name:<20} {seconds / number * 1e6:8.2f} us/row")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
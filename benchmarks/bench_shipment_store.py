@@ -0,0 +1,126 @@
+"""
+Write throughput of ShipmentStore: shipments with one package and a label
+each, flushed every STORE_FLUSH_EVERY shipments. The same labels are then
+written a second time, every one a duplicate the flush has to skip.
+
+Uses POSTGRES_DB_URL when it is set (the COPY path with psycopg2), a
+temporary sqlite file otherwise (the executemany fallback). The tables are
+created if needed and the benchmark rows deleted afterwards.
+
+Usage:
+    python -m benchmarks.bench_shipment_store [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from csv_shipper.config import Config
+
+Config.SQLALCHEMY_ECHO = False
+if not Config.SQLALCHEMY_DATABASE_URI:
+    Config.SQLALCHEMY_DATABASE_URI = (
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    )
+
+from csv_shipper import create_app, db, db_session  # noqa: E402
+from csv_shipper.models import (  # noqa: E402
+    LabelRecord,
+    Order,
+    Package,
+    PackageRecord,
+    PackageWeight,
+    ShipmentRecord,
+    ShipmentRun,
+    ShipToAddress,
+    User,
+    db_add,
+)
+from csv_shipper.shipment_store import ShipmentStore  # noqa: E402
+
+SHIP_TO = ShipToAddress(
+    name="Kasey Cantu",
+    phone="1-789-456-1234",
+    company_name="ShipEngine",
+    address_line1="4009 Marathon Blvd",
+    address_line2=None,
+    address_line3=None,
+    city_locality="Austin",
+    state_province="TX",
+    postal_code="78756",
+    country_code="US",
+    address_residential_indicator="no",
+)
+
+
+def label(tag: str, number: int) -> dict:
+    return {
+        "label_id": f"se-{tag}-l{number}",
+        "shipment_id": f"se-{tag}-s{number}",
+        "status": "completed",
+        "tracking_number": f"1Z{number:012d}",
+        "carrier_code": "ups",
+        "service_code": "ups_ground",
+        "shipment_cost": {"currency": "usd", "amount": 9.5},
+        "label_download": {"href": f"https://example.com/{number}.pdf"},
+        "packages": [{"weight": {"value": 2.5, "unit": "pound"}}],
+    }
+
+
+def timed(name: str, rows: int, fn):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    print(f"{name:<28} {seconds:8.2f} s {rows / seconds:10.0f} rows/s")
+
+
+def main(rows: int = 50000):
+    create_app(Config)
+    db.create_all()
+    tag = uuid.uuid4().hex[:8]
+    user = User(
+        first_name="Bench",
+        last_name="Mark",
+        email=f"{tag}@bench.invalid",
+        username=f"bench-{tag}",
+        pw_hash=tag,
+    )
+    db_add(user)
+    run = ShipmentRun(user_id=user.id, status="running", csv_path="/tmp/bench.csv")
+    db_add(run)
+    orders = [
+        Order(
+            row_number=number,
+            ship_to=SHIP_TO,
+            packages=[Package(weight=PackageWeight(value=2.5, unit="pound"), dimensions=None)],
+        )
+        for number in range(rows)
+    ]
+    labels = [label(tag, number) for number in range(rows)]
+
+    def store_labels():
+        store = ShipmentStore(run.id, user.id)
+        for order, resp in zip(orders, labels):
+            store.add_label(order, resp)
+        store.flush()
+
+    try:
+        timed("ShipmentStore", rows, store_labels)
+        timed("ShipmentStore, duplicates", rows, store_labels)
+        print(f"shipments stored: {ShipmentRecord.query.filter_by(run_id=run.id).count()}")
+    finally:
+        shipment_ids = [label["shipment_id"] for label in labels]
+        for start in range(0, rows, 1000):
+            PackageRecord.query.filter(
+                PackageRecord.shipment_id.in_(shipment_ids[start:start + 1000])
+            ).delete(synchronize_session=False)
+        LabelRecord.query.filter_by(run_id=run.id).delete()
+        ShipmentRecord.query.filter_by(run_id=run.id).delete()
+        db_session.delete(run)
+        db_session.delete(user)
+        db_session.commit()
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
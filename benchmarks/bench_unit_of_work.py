@@ -0,0 +1,92 @@
+"""
+Insert throughput of db_add (a commit per row) vs UnitOfWork, for
+ShippingAddress rows.
+
+Uses POSTGRES_DB_URL when it is set, a temporary sqlite file otherwise.
+The tables are created if needed and the benchmark rows deleted afterwards.
+
+Usage:
+    python -m benchmarks.bench_unit_of_work [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from csv_shipper.config import Config
+
+Config.SQLALCHEMY_ECHO = False
+if not Config.SQLALCHEMY_DATABASE_URI:
+    Config.SQLALCHEMY_DATABASE_URI = (
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    )
+
+from csv_shipper import create_app, db, db_session  # noqa: E402
+from csv_shipper.models import ShippingAddress, UnitOfWork, User, db_add  # noqa: E402
+
+
+def address_row(user_id: int, prefix: str, number: int) -> dict:
+    return dict(
+        user_id=user_id,
+        description=f"{prefix}{number}",
+        name="Kasey Cantu",
+        phone="1-789-456-1234",
+        company_name="ShipEngine",
+        address_line_1="4009 Marathon Blvd",
+        city_locality="Austin",
+        state_province="TX",
+        postal_code=78756,
+        country_code="US",
+        address_residential_indicator="no",
+    )
+
+
+def timed(name: str, rows: int, fn):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    print(f"{name:<28} {seconds:8.2f} s {rows / seconds:10.0f} rows/s")
+
+
+def main(rows: int = 10000):
+    create_app(Config)
+    db.create_all()
+    tag = uuid.uuid4().hex[:8]
+    user = User(
+        first_name="Bench",
+        last_name="Mark",
+        email=f"{tag}@bench.invalid",
+        username=f"bench-{tag}",
+        pw_hash=tag,
+    )
+    db_add(user)
+
+    def per_object():
+        for number in range(rows):
+            db_add(ShippingAddress(**address_row(user.id, f"a{tag}", number)))
+
+    def unit_of_work():
+        with UnitOfWork() as uow:
+            for number in range(rows):
+                uow.add(ShippingAddress(**address_row(user.id, f"b{tag}", number)))
+
+    def mappings():
+        with UnitOfWork() as uow:
+            uow.add_mappings(
+                ShippingAddress,
+                (address_row(user.id, f"c{tag}", number) for number in range(rows)),
+            )
+
+    try:
+        timed("db_add", rows, per_object)
+        timed("UnitOfWork.add", rows, unit_of_work)
+        timed("UnitOfWork.add_mappings", rows, mappings)
+    finally:
+        ShippingAddress.query.filter_by(user_id=user.id).delete()
+        db_session.delete(user)
+        db_session.commit()
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -3,11 +3,11 @@ import os
 from dotenv import load_dotenv
 from flask import Flask
 from flask_bcrypt import Bcrypt
-from flask_login import LoginManager
+from flask_login import LoginManager, login_required
 from flask_mail import Mail
 from flask_sqlalchemy import SQLAlchemy
 
-from csv_shipper.config import Config
+from csv_shipper.config import get_config
 
 # from typing import Optional, List, Dict
 
@@ -25,9 +25,9 @@ db = SQLAlchemy()
 db_session = db.session
 
 
-def create_app(config_class=Config):
+def create_app(config_class=None):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class or get_config())
     app.app_context().push()
 
     db.init_app(app)
@@ -39,9 +39,24 @@ def create_app(config_class=Config):
     from csv_shipper.main.routes import main
     from csv_shipper.users.routes import users
     from csv_shipper.errors.handlers import errors
+    from csv_shipper.graphql.limits import LimitedBackend
+    from csv_shipper.graphql.schema import schema
+    from flask_graphql import GraphQLView
 
     app.register_blueprint(main)
     app.register_blueprint(users)
     app.register_blueprint(errors)
+    # The schema only ever returns the logged in user's own rows.
+    app.add_url_rule(
+        "/graphql",
+        view_func=login_required(
+            GraphQLView.as_view(
+                "graphql",
+                schema=schema,
+                backend=LimitedBackend(),
+                graphiql=app.config["GRAPHIQL"],
+            )
+        ),
+    )
 
     return app
@@ -0,0 +1,187 @@
+import dataclasses
+import datetime
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+from csv_shipper import db_session
+from csv_shipper.csv_reader import ADDRESS_COLUMNS, batched
+from csv_shipper.models import Order, ShipToAddress, ValidatedAddress, dialect_insert
+from csv_shipper.se_errors import ShipEngineError
+
+ADDRESS_CACHE_TTL = int(os.getenv("ADDRESS_CACHE_TTL", 30 * 24 * 60 * 60))
+ADDRESS_VALIDATION_BATCH_SIZE = int(os.getenv("ADDRESS_VALIDATION_BATCH_SIZE", 250))
+
+# Only these fields are checked by ShipEngine, the contact fields are not.
+VALIDATED_FIELDS = (
+    "address_line1",
+    "address_line2",
+    "address_line3",
+    "city_locality",
+    "state_province",
+    "postal_code",
+    "country_code",
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = _WHITESPACE.sub(" ", value).strip()
+    return value or None
+
+
+def _as_utc(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def normalize_address(address: ShipToAddress) -> ShipToAddress:
+    """
+    Collapses whitespace and upper-cases the code fields so that trivially
+    different spellings of the same address dedup to one entry.
+    """
+    fields = {column: _clean(getattr(address, column)) for column in ADDRESS_COLUMNS}
+    for column in ("state_province", "postal_code", "country_code"):
+        if fields[column] is not None:
+            fields[column] = fields[column].upper()
+    return dataclasses.replace(address, **fields)
+
+
+def address_key(address: ShipToAddress) -> str:
+    """Hashes the validated fields of an already normalized address."""
+    fields = [
+        (getattr(address, column) or "").upper() for column in VALIDATED_FIELDS
+    ]
+    return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()
+
+
+class AddressValidator:
+    """
+    Validates each distinct recipient once through POST /addresses/validate
+    and keeps the cleaned result in the validated_addresses table for `ttl`
+    seconds. Orders whose address was verified can then be shipped with
+    validate_address="no_validation".
+
+    Args:
+        se (ShipEngine): The client used for the validation calls.
+        ttl (int): How long, in seconds, a validation result is trusted.
+        batch_size (int): Addresses per validation request.
+    """
+
+    def __init__(
+            self,
+            se,
+            ttl: int = ADDRESS_CACHE_TTL,
+            batch_size: int = ADDRESS_VALIDATION_BATCH_SIZE,
+    ):
+        self.se = se
+        self.ttl = datetime.timedelta(seconds=ttl)
+        self.batch_size = batch_size
+
+    def _cached(self, keys: List[str]) -> Dict[str, ValidatedAddress]:
+        if not keys:
+            return {}
+        rows = ValidatedAddress.query.filter(
+            ValidatedAddress.address_hash.in_(keys)
+        ).all()
+        return {row.address_hash: row for row in rows}
+
+    def validate(self, addresses: Dict[str, ShipToAddress]) -> Dict[str, ValidatedAddress]:
+        """
+        Args:
+            addresses (dict): Normalized addresses keyed by address_key().
+
+        Returns:
+            A ValidatedAddress row for every key that is fresh in the cache
+            or was validated now. Keys whose validation failed are left
+            out, expired rows are never returned.
+        """
+        results = self._cached(list(addresses))
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - self.ttl
+        for key, row in list(results.items()):
+            if row.validated_at is None or _as_utc(row.validated_at) < cutoff:
+                del results[key]
+        stale = [key for key in addresses if key not in results]
+
+        rows = []
+        for chunk in batched(stale, self.batch_size):
+            try:
+                resp = self.se.validate_addresses([addresses[key] for key in chunk])
+            except ShipEngineError:
+                # Leave these to ShipEngine's inline validation.
+                continue
+
+            now = datetime.datetime.now(datetime.timezone.utc)
+            for key, result in zip(chunk, resp):
+                rows.append(
+                    {
+                        "address_hash": key,
+                        "status": result["status"],
+                        "matched_address": result.get("matched_address"),
+                        "validated_at": now,
+                    }
+                )
+
+        if rows:
+            # Parallel workers validate the same new recipients, the last
+            # result wins instead of failing on the unique address_hash.
+            table = ValidatedAddress.__table__
+            stmt = dialect_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.address_hash],
+                set_={
+                    "status": stmt.excluded.status,
+                    "matched_address": stmt.excluded.matched_address,
+                    "validated_at": stmt.excluded.validated_at,
+                },
+            )
+            db_session.execute(stmt, rows)
+            db_session.commit()
+            results.update(self._cached([row["address_hash"] for row in rows]))
+        return results
+
+    def prepare(self, orders: List[Order]) -> List[Order]:
+        """
+        Dedups the recipients of a batch of orders, validates each unique
+        one and swaps in the cleaned address for every verified order.
+        """
+        normalized = {}
+        keys = []
+        for order in orders:
+            address = normalize_address(order.ship_to)
+            key = address_key(address)
+            normalized.setdefault(key, address)
+            keys.append(key)
+
+        results = self.validate(normalized)
+
+        prepared = []
+        for order, key in zip(orders, keys):
+            row = results.get(key)
+            if row is None or row.status != "verified" or not row.matched_address:
+                prepared.append(order)
+                continue
+
+            # Keep the row's own contact details, take the cleaned address.
+            cleaned = {
+                column: row.matched_address.get(column)
+                for column in VALIDATED_FIELDS + ("address_residential_indicator",)
+            }
+            if cleaned["address_residential_indicator"] is None:
+                cleaned["address_residential_indicator"] = (
+                    order.ship_to.address_residential_indicator
+                )
+            prepared.append(
+                dataclasses.replace(
+                    order,
+                    ship_to=dataclasses.replace(order.ship_to, **cleaned),
+                    address_validated=True,
+                )
+            )
+        return prepared
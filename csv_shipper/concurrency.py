@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+from csv_shipper.models import Order, ShipFromAddress
+from csv_shipper.se_errors import ShipEngineError, ShipEngineRateLimitError
+from csv_shipper.se_retry import RetryPolicy
+
+# ShipEngine's default quota is 200 requests per minute per API key.
+DEFAULT_RATE_LIMIT = float(os.getenv("SHIPENGINE_RATE_LIMIT", 200 / 60))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("SHIPENGINE_MAX_CONCURRENCY", 8))
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. `rate` tokens are added every second up to
+    `capacity`, and every call to acquire() takes one, blocking until one is
+    available.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE_LIMIT, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        Drains the bucket so nobody sends again for `seconds`. Pauses do
+        not add up, when several in-flight calls get a 429 at once the
+        longest Retry-After wins.
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens = self._tokens + (now - self._updated_at) * self.rate
+            self._tokens = min(tokens, -seconds * self.rate)
+            self._updated_at = now
+
+
+class ShipEngineExecutor:
+    """
+    Runs ShipEngine calls on a bounded thread pool behind a shared token
+    bucket. Failed calls are retried as the retry policy allows. A 429
+    pauses the whole bucket for its Retry-After delay, so every worker
+    backs off together.
+
+    A call that still fails does not raise, its ShipEngineError takes the
+    place of the response in the results, so one bad row never stops a run.
+
+    Args:
+        max_workers (int): The concurrency ceiling.
+        rate_limiter (TokenBucket): Shared limiter tuned to the API key quota.
+        retry_policy (RetryPolicy): Which failures are retried, and when.
+    """
+
+    def __init__(
+            self,
+            max_workers: int = DEFAULT_MAX_CONCURRENCY,
+            rate_limiter: TokenBucket = None,
+            retry_policy: RetryPolicy = None,
+    ):
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    def _call(self, fn: Callable, item):
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                return fn(item)
+            except ShipEngineError as e:
+                retry = self.retry_policy.should_retry(e, attempt)
+                self.retry_policy.record(e, retry)
+                if not retry:
+                    return e
+
+                delay = self.retry_policy.delay(e, attempt)
+                logging.debug(f"{e}, retrying in {delay:.2f}s")
+                if isinstance(e, ShipEngineRateLimitError):
+                    self.rate_limiter.pause(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
+
+    def _run(self, fn: Callable, items: Iterable) -> Iterator[tuple]:
+        window = deque()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for item in items:
+                window.append((item, pool.submit(self._call, fn, item)))
+                if len(window) >= 2 * self.max_workers:
+                    item, future = window.popleft()
+                    yield item, future.result()
+
+            while window:
+                item, future = window.popleft()
+                yield item, future.result()
+
+    def map(self, fn: Callable, items: Iterable) -> Iterator:
+        """
+        Applies `fn` to every item concurrently and yields the results in
+        input order. Only a window of `2 * max_workers` items is in flight,
+        so `items` may be a lazy generator over a very large CSV.
+        """
+        for _, result in self._run(fn, items):
+            yield result
+
+    def create_labels(
+            self, se, ship_from_address: ShipFromAddress, orders: Iterable[Order]
+    ):
+        """
+        Buys a label for every order concurrently.
+
+        Returns:
+            A generator of (Order, response) tuples in input order.
+        """
+
+        def create_label(order):
+            return se.create_label(
+                ship_to_address=order.ship_to,
+                ship_from_address=ship_from_address,
+                packages=order.packages,
+            )
+
+        return self._run(create_label, orders)
+
+    def get_rates(self, se, requests: Iterable[tuple]):
+        """
+        Fetches rates concurrently for (shipment_id, RateOptions) pairs.
+
+        Returns:
+            A generator of rate responses in input order.
+        """
+        return self.map(lambda request: se.get_rates(*request), requests)
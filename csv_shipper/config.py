@@ -10,10 +10,54 @@ class Config:
     JSONIFY_PRETTYPRINT_REGULAR = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.getenv("POSTGRES_DB_URL")
-    SQLALCHEMY_ECHO = True
+    SQLALCHEMY_ECHO = False
+    SQLALCHEMY_ENGINE_OPTIONS = {"pool_pre_ping": True}
     SECRET_KEY = os.getenv("SECRET_KEY")
     MAIL_SERVER = os.getenv("MAIL_SERVER")
     MAIL_PORT = os.getenv("MAIL_PORT")
     MAIL_USE_TLS = True
     MAIL_USERNAME = os.getenv("MAIL_USER")
     MAIL_PASSWORD = os.getenv("MAIL_PW")
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "/tmp/csv_shipper_uploads")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+    WEBHOOK_SECRET_HEADER = os.getenv("WEBHOOK_SECRET_HEADER", "X-CSV-Shipper-Secret")
+    GRAPHIQL = False
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    SQLALCHEMY_ECHO = True
+    GRAPHIQL = True
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+    TEMPLATES_AUTO_RELOAD = False
+    JSONIFY_PRETTYPRINT_REGULAR = False
+    # Sized per worker process: every uWSGI thread can hold a connection,
+    # plus some overflow for the webhook consumer and request bursts.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": True,
+    }
+
+
+CONFIG_PROFILES = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+}
+
+
+def get_config(profile: str = None):
+    """The Config class for `profile`, CSV_SHIPPER_ENV by default."""
+    profile = profile or os.getenv("CSV_SHIPPER_ENV", "production")
+    try:
+        return CONFIG_PROFILES[profile]
+    except KeyError:
+        raise ValueError(
+            f"Unknown config profile {profile!r}, use one of {sorted(CONFIG_PROFILES)}"
+        )
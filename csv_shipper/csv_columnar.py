@@ -0,0 +1,241 @@
+import os
+from typing import IO, Callable, Iterable, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from csv_shipper.csv_reader import (
+    ADDRESS_COLUMNS,
+    DIMENSION_UNIT_ALIASES,
+    RESIDENTIAL_ALIASES,
+    WEIGHT_UNIT_ALIASES,
+)
+from csv_shipper.models import (
+    CURRENCIES,
+    DIMENSION_UNITS,
+    RESIDENTIAL_INDICATORS,
+    WEIGHT_UNITS,
+    Order,
+    Package,
+    PackageDimensions,
+    PackageWeight,
+    ShipToAddress,
+    build_unchecked,
+)
+
+CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", 10000))
+
+REQUIRED_COLUMNS = (
+    "name",
+    "phone",
+    "address_line1",
+    "city_locality",
+    "state_province",
+    "postal_code",
+    "country_code",
+)
+DIMENSION_COLUMNS = ("length", "width", "height")
+PACKAGE_COLUMNS = ("weight_value", "weight_unit", "dimension_unit") + DIMENSION_COLUMNS
+
+
+def _codes(column: pd.Series, aliases: dict) -> pd.Series:
+    column = column.str.strip().str.lower()
+    return column.replace(aliases)
+
+
+def normalize_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalizes a chunk of raw CSV columns in place: unit and currency
+    spellings, residential indicators, country codes and postal codes.
+    """
+    for column in ADDRESS_COLUMNS:
+        chunk[column] = chunk[column].str.strip()
+
+    chunk["country_code"] = chunk["country_code"].str.upper()
+    chunk["state_province"] = chunk["state_province"].str.upper()
+    chunk["address_residential_indicator"] = _codes(
+        chunk["address_residential_indicator"], RESIDENTIAL_ALIASES
+    )
+    chunk["weight_unit"] = _codes(chunk["weight_unit"], WEIGHT_UNIT_ALIASES)
+    chunk["dimension_unit"] = _codes(chunk["dimension_unit"], DIMENSION_UNIT_ALIASES)
+    if "currency" in chunk:
+        chunk["currency"] = chunk["currency"].str.strip().str.lower()
+
+    # Spreadsheets drop the leading zeros of US ZIP codes, put them back and
+    # format nine digit ZIPs as ZIP+4. Only ZIPs made of digits, spaces and
+    # dashes are touched, blank or lettered ones are left to be rejected.
+    postal = chunk["postal_code"].str.upper()
+    us = (chunk["country_code"] == "US") & postal.str.fullmatch(r"[\d\s-]*\d[\d\s-]*")
+    digits = postal[us].str.replace(r"\D", "", regex=True)
+    short = digits.str.len() < 5
+    digits[short] = digits[short].str.zfill(5)
+    long = digits.str.len() == 9
+    digits[long] = digits[long].str[:5] + "-" + digits[long].str[5:]
+    postal[us] = digits
+    chunk["postal_code"] = postal
+
+    for column in ("weight_value",) + DIMENSION_COLUMNS:
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce").astype(float)
+    return chunk
+
+
+def reject_reasons(chunk: pd.DataFrame) -> pd.Series:
+    """
+    Checks a normalized chunk column by column.
+
+    Returns:
+        A string Series, empty for valid rows and a "; " separated list of
+        problems otherwise.
+    """
+    checks = [
+        (~chunk["address_residential_indicator"].isin(RESIDENTIAL_INDICATORS),
+         "invalid address_residential_indicator"),
+        (~chunk["weight_unit"].isin(WEIGHT_UNITS), "invalid weight_unit"),
+        (~(chunk["weight_value"] > 0), "weight_value must be a positive number"),
+        (chunk["country_code"].str.len() != 2, "country_code must be 2 letters"),
+    ]
+    for column in REQUIRED_COLUMNS:
+        checks.append((chunk[column] == "", f"{column} is required"))
+
+    has_dimensions = chunk["dimension_unit"] != ""
+    checks.append(
+        (has_dimensions & ~chunk["dimension_unit"].isin(DIMENSION_UNITS),
+         "invalid dimension_unit")
+    )
+    for column in DIMENSION_COLUMNS:
+        checks.append(
+            (has_dimensions & ~(chunk[column] > 0), f"{column} must be a positive number")
+        )
+
+    us = chunk["country_code"] == "US"
+    checks.append(
+        (us & ~chunk["postal_code"].str.fullmatch(r"\d{5}(-\d{4})?"),
+         "invalid US postal_code")
+    )
+    if "currency" in chunk:
+        checks.append(
+            ((chunk["currency"] != "") & ~chunk["currency"].isin(CURRENCIES),
+             "invalid currency")
+        )
+
+    reasons = pd.Series("", index=chunk.index)
+    for mask, message in checks:
+        mask = mask.fillna(True).to_numpy(dtype=bool)
+        reasons[mask] = np.where(
+            reasons[mask] == "", message, reasons[mask] + "; " + message
+        )
+    return reasons
+
+
+def _to_order(row: dict) -> Order:
+    # Every value was checked in bulk, so the per-object checks are skipped.
+    ship_to = build_unchecked(
+        ShipToAddress,
+        **{column: row[column] or None for column in ADDRESS_COLUMNS},
+    )
+    dimensions = None
+    if row["dimension_unit"]:
+        dimensions = build_unchecked(
+            PackageDimensions,
+            unit=row["dimension_unit"],
+            length=row["length"],
+            width=row["width"],
+            height=row["height"],
+        )
+    package = build_unchecked(
+        Package,
+        weight=build_unchecked(
+            PackageWeight, value=row["weight_value"], unit=row["weight_unit"]
+        ),
+        dimensions=dimensions,
+    )
+    return build_unchecked(
+        Order,
+        row_number=row["row_number"],
+        ship_to=ship_to,
+        packages=[package],
+        external_order_id=row.get("external_order_id") or None,
+    )
+
+
+def read_orders_columnar(
+        csv_file: Union[str, IO],
+        rejects_path: Optional[str] = None,
+        chunksize: int = CHUNK_SIZE,
+        shard: int = 0,
+        shards: int = 1,
+        on_reject: Callable[[int, str], None] = None,
+) -> Iterator[Order]:
+    """
+    Loads a CSV file in chunks, normalizes and validates whole columns at a
+    time and yields an Order for every valid row. Invalid rows are appended
+    to `rejects_path` with a `reject_reason` column.
+
+    Args:
+        csv_file (str | IO): A path to a CSV file or an open file-like object.
+        rejects_path (str): Where to write the rejected rows, or None.
+        chunksize (int): Rows per chunk.
+        shard (int): Only rows with row_number % shards == shard are read,
+            see jobs.worker.ship_shard.
+        shards (int): The number of shards.
+        on_reject (Callable): Called with the row number and the reason of
+            every rejected row.
+
+    Returns:
+        A generator of Order objects in file order.
+    """
+    wrote_header = False
+    first_row = 1
+
+    reader = pd.read_csv(
+        csv_file, dtype=str, keep_default_na=False, chunksize=chunksize
+    )
+    for chunk in reader:
+        for column in ADDRESS_COLUMNS + PACKAGE_COLUMNS:
+            if column not in chunk:
+                chunk[column] = ""
+
+        chunk.insert(0, "row_number", range(first_row, first_row + len(chunk)))
+        first_row += len(chunk)
+        if shards > 1:
+            chunk = chunk[chunk["row_number"] % shards == shard]
+
+        raw = chunk.copy() if rejects_path else None
+        chunk = normalize_chunk(chunk)
+        reasons = reject_reasons(chunk)
+        rejected = reasons != ""
+
+        if rejects_path and rejected.any():
+            rejects = raw[rejected].assign(reject_reason=reasons[rejected])
+            rejects.to_csv(
+                rejects_path, mode="a" if wrote_header else "w",
+                header=not wrote_header, index=False,
+            )
+            wrote_header = True
+        if on_reject is not None:
+            for row_number, reason in zip(chunk["row_number"][rejected], reasons[rejected]):
+                on_reject(int(row_number), reason)
+
+        for row in chunk[~rejected].to_dict("records"):
+            yield _to_order(row)
+
+
+def merge_rejects(paths: Iterable[str], rejects_path: str) -> Optional[str]:
+    """
+    Merges the rejects files of several shards into `rejects_path`, in row
+    order, and removes them.
+
+    Returns:
+        `rejects_path`, or None when no row was rejected.
+    """
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return None
+    rejects = pd.concat(
+        [pd.read_csv(path, dtype=str, keep_default_na=False) for path in paths]
+    )
+    rejects = rejects.iloc[rejects["row_number"].astype(int).argsort(kind="stable")]
+    rejects.to_csv(rejects_path, index=False)
+    for path in paths:
+        os.remove(path)
+    return rejects_path
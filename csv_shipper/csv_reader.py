@@ -0,0 +1,268 @@
+import csv
+import io
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import IO, Iterable, Iterator, List, Union
+
+from csv_shipper.models import (
+    Order,
+    Package,
+    PackageDimensions,
+    PackageWeight,
+    ShipFromAddress,
+    ShipToAddress,
+)
+from csv_shipper.se_errors import ShipEngineError
+
+ADDRESS_COLUMNS = (
+    "name",
+    "phone",
+    "company_name",
+    "address_line1",
+    "address_line2",
+    "address_line3",
+    "city_locality",
+    "state_province",
+    "postal_code",
+    "country_code",
+    "address_residential_indicator",
+)
+
+DEFAULT_BATCH_SIZE = 50
+
+# Spellings of the enum-like columns that are accepted and mapped onto
+# ShipEngine's values, by every CSV path: row_to_order, csv_columnar and
+# validation.
+WEIGHT_UNIT_ALIASES = {
+    "lb": "pound",
+    "lbs": "pound",
+    "pounds": "pound",
+    "oz": "ounce",
+    "ounces": "ounce",
+    "g": "gram",
+    "grams": "gram",
+    "kg": "kilogram",
+    "kgs": "kilogram",
+    "kilograms": "kilogram",
+}
+DIMENSION_UNIT_ALIASES = {
+    "in": "inch",
+    "inches": "inch",
+    "cm": "centimeter",
+    "centimeters": "centimeter",
+    "centimetre": "centimeter",
+}
+RESIDENTIAL_ALIASES = {
+    "y": "yes",
+    "true": "yes",
+    "1": "yes",
+    "n": "no",
+    "false": "no",
+    "0": "no",
+    "": "unknown",
+}
+CHOICE_ALIASES = {
+    "address_residential_indicator": RESIDENTIAL_ALIASES,
+    "weight_unit": WEIGHT_UNIT_ALIASES,
+    "dimension_unit": DIMENSION_UNIT_ALIASES,
+}
+
+
+def _blank_to_none(value):
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+
+def normalize_choice(column: str, value: str) -> str:
+    """Lower-cases an enum-like CSV value and resolves its aliases."""
+    value = (value or "").strip().lower()
+    return CHOICE_ALIASES[column].get(value, value)
+
+
+def open_csv(csv_file: Union[str, IO]) -> IO:
+    """
+    Wraps a path, a binary stream (e.g. a werkzeug FileStorage.stream) or a
+    text stream so that it can be handed to csv.DictReader.
+
+    Args:
+        csv_file (str | IO): A path to a CSV file or an open file-like object.
+
+    Returns:
+        A text stream positioned at the start of the CSV data.
+    """
+    if isinstance(csv_file, str):
+        return open(csv_file, newline="", encoding="utf-8-sig")
+    if isinstance(csv_file, io.TextIOBase):
+        return csv_file
+    return io.TextIOWrapper(csv_file, encoding="utf-8-sig", newline="")
+
+
+def row_to_order(row_number: int, row: dict) -> Order:
+    """
+    Maps a single CSV row onto the ShipEngine payload dataclasses.
+
+    Args:
+        row_number (int): The 1-based data row number in the CSV file.
+        row (dict): A row as produced by csv.DictReader.
+
+    Returns:
+        An Order holding a ShipToAddress and its Package.
+    """
+    address = {column: _blank_to_none(row.get(column)) for column in ADDRESS_COLUMNS}
+    address["address_residential_indicator"] = normalize_choice(
+        "address_residential_indicator", row.get("address_residential_indicator")
+    )
+    ship_to = ShipToAddress(**address)
+
+    dimensions = None
+    dimension_unit = normalize_choice("dimension_unit", row.get("dimension_unit"))
+    if dimension_unit:
+        dimensions = PackageDimensions(
+            unit=dimension_unit,
+            length=float(row["length"]),
+            width=float(row["width"]),
+            height=float(row["height"]),
+        )
+
+    package = Package(
+        weight=PackageWeight(
+            value=float(row["weight_value"]),
+            unit=normalize_choice("weight_unit", row["weight_unit"]),
+        ),
+        dimensions=dimensions,
+    )
+
+    return Order(
+        row_number=row_number,
+        ship_to=ship_to,
+        packages=[package],
+        external_order_id=_blank_to_none(row.get("external_order_id")),
+    )
+
+
+def read_orders(csv_file: Union[str, IO]) -> Iterator[Order]:
+    """
+    Lazily yields one Order per CSV row. Only the current row is held in
+    memory, so the file may be arbitrarily large and may still be uploading.
+
+    Args:
+        csv_file (str | IO): A path to a CSV file or an open file-like object.
+
+    Returns:
+        A generator of Order objects in file order.
+    """
+    stream = open_csv(csv_file)
+    try:
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            yield row_to_order(row_number, row)
+    finally:
+        if isinstance(csv_file, str):
+            stream.close()
+
+
+@dataclass(frozen=True)
+class RowError:
+    """
+    A CSV row that could not be mapped onto an Order, e.g. a weight that is
+    not a number. ship_csv yields it in place of the Order.
+    """
+
+    row_number: int
+    error: Exception
+
+
+def _read_rows(csv_file: Union[str, IO]) -> Iterator[Union[Order, RowError]]:
+    """Like read_orders, but a malformed row yields a RowError instead of raising."""
+    stream = open_csv(csv_file)
+    try:
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            try:
+                yield row_to_order(row_number, row)
+            except (TypeError, ValueError) as e:
+                yield RowError(row_number, e)
+    finally:
+        if isinstance(csv_file, str):
+            stream.close()
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """
+    Groups an iterable into lists of at most `size` items without reading
+    ahead more than one batch.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ship_csv(
+        se,
+        csv_file: Union[str, IO],
+        ship_from_address: ShipFromAddress,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        executor=None,
+):
+    """
+    Streams a CSV file into ShipEngine.create_label, one batch at a time.
+    When an executor is given the labels are bought concurrently instead.
+    Either way one bad row never stops the file: a failed purchase yields
+    its ShipEngineError in place of the response, and a row that cannot be
+    parsed yields (RowError, error) without any API call.
+
+    Args:
+        se (ShipEngine): The client used to purchase labels.
+        csv_file (str | IO): A path to a CSV file or an open file-like object.
+        ship_from_address (ShipFromAddress): The origin for every order.
+        batch_size (int): How many rows are parsed ahead of the API calls.
+        executor (ShipEngineExecutor): Optional bounded worker pool.
+
+    Returns:
+        A generator of (Order | RowError, response) tuples in CSV row order.
+    """
+    if executor is not None:
+        yield from _ship_concurrently(se, csv_file, ship_from_address, executor)
+        return
+
+    for batch in batched(_read_rows(csv_file), batch_size):
+        for order in batch:
+            if isinstance(order, RowError):
+                yield order, order.error
+                continue
+            try:
+                resp = se.create_label(
+                    ship_to_address=order.ship_to,
+                    ship_from_address=ship_from_address,
+                    packages=order.packages,
+                )
+            except ShipEngineError as e:
+                resp = e
+            yield order, resp
+
+
+def _ship_concurrently(se, csv_file, ship_from_address: ShipFromAddress, executor):
+    # Only orders go to the executor. Every row is noted in `rows` before
+    # the executor sees it, so the row errors in front of an order's
+    # result can be yielded first and the CSV order is kept.
+    rows = deque()
+
+    def orders():
+        for row in _read_rows(csv_file):
+            rows.append(row)
+            if not isinstance(row, RowError):
+                yield row
+
+    for order, resp in executor.create_labels(se, ship_from_address, orders()):
+        while isinstance(rows[0], RowError):
+            row = rows.popleft()
+            yield row, row.error
+        rows.popleft()
+        yield order, resp
+    while rows:
+        row = rows.popleft()
+        yield row, row.error
@@ -0,0 +1,104 @@
+import os
+
+from graphql import GraphQLError
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.language import ast
+
+DEFAULT_PAGE_SIZE = int(os.getenv("GRAPHQL_DEFAULT_PAGE_SIZE", 25))
+MAX_PAGE_SIZE = int(os.getenv("GRAPHQL_MAX_PAGE_SIZE", 100))
+MAX_QUERY_DEPTH = int(os.getenv("GRAPHQL_MAX_QUERY_DEPTH", 8))
+MAX_QUERY_COST = int(os.getenv("GRAPHQL_MAX_QUERY_COST", 10000))
+
+_PAGE_ARGUMENTS = ("first", "last")
+
+
+def _page_size(field: ast.Field) -> int:
+    """
+    How many nodes a field can return per parent. A page size passed in a
+    variable is not known before execution, so it counts as the maximum.
+    """
+    for argument in field.arguments or ():
+        if argument.name.value in _PAGE_ARGUMENTS:
+            if isinstance(argument.value, ast.IntValue):
+                return int(argument.value.value)
+            return MAX_PAGE_SIZE
+    return 1
+
+
+def _measure(selection_set, fragments: dict, multiplier: int, visited: frozenset):
+    """Returns (depth, cost) of a selection set."""
+    if selection_set is None:
+        return 0, 0
+
+    depth = cost = 0
+    for selection in selection_set.selections:
+        if isinstance(selection, ast.Field):
+            if selection.name.value.startswith("__"):
+                # Introspection is answered from the schema, not the database.
+                continue
+            child_depth, child_cost = _measure(
+                selection.selection_set,
+                fragments,
+                multiplier * _page_size(selection),
+                visited,
+            )
+            depth = max(depth, child_depth + 1)
+            cost += multiplier + child_cost
+            continue
+
+        if isinstance(selection, ast.FragmentSpread):
+            name = selection.name.value
+            if name in visited or name not in fragments:
+                continue
+            child = fragments[name].selection_set
+            visited = visited | {name}
+        else:
+            child = selection.selection_set
+        child_depth, child_cost = _measure(child, fragments, multiplier, visited)
+        depth = max(depth, child_depth)
+        cost += child_cost
+    return depth, cost
+
+
+def check_query_limits(document: ast.Document):
+    """
+    Rejects operations nested deeper than MAX_QUERY_DEPTH, or whose
+    estimated cost, the number of fields weighted by the page sizes of the
+    connections around them, is above MAX_QUERY_COST.
+    """
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, ast.FragmentDefinition)
+    }
+    for definition in document.definitions:
+        if not isinstance(definition, ast.OperationDefinition):
+            continue
+        depth, cost = _measure(definition.selection_set, fragments, 1, frozenset())
+        if depth > MAX_QUERY_DEPTH:
+            raise GraphQLError(
+                f"Query depth {depth} exceeds the limit of {MAX_QUERY_DEPTH}"
+            )
+        if cost > MAX_QUERY_COST:
+            raise GraphQLError(
+                f"Query cost {cost} exceeds the limit of {MAX_QUERY_COST}"
+            )
+
+
+def check_page_size(args: dict):
+    """Defaults connection arguments to one page and caps first/last."""
+    for name in _PAGE_ARGUMENTS:
+        value = args.get(name)
+        if value is not None and not 0 <= value <= MAX_PAGE_SIZE:
+            raise GraphQLError(f"{name} must be between 0 and {MAX_PAGE_SIZE}")
+    if args.get("first") is None and args.get("last") is None:
+        args["first"] = DEFAULT_PAGE_SIZE
+
+
+class LimitedBackend(GraphQLCoreBackend):
+    """A graphql-core backend that checks query limits before executing."""
+
+    def document_from_string(self, schema, document_string):
+        document = super().document_from_string(schema, document_string)
+        check_query_limits(document.document_ast)
+        return document
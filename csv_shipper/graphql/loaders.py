@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+from flask import g
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from csv_shipper.models import (
+    LabelRecord,
+    PackageRecord,
+    RateRecord,
+    ShipmentRun,
+    ShippingAddress,
+)
+
+
+class ColumnLoader(DataLoader):
+    """
+    Batches lookups of `model` rows by one column. All keys requested while
+    a level of the query is resolved are fetched with a single
+    `column IN (...)` query, instead of one lazy load per parent row.
+
+    Args:
+        model: The SQLAlchemy model to load.
+        column: The model attribute the keys are matched against.
+        many (bool): Resolve every key to a list of rows, or to the first
+            matching row (None when there is none).
+    """
+
+    def __init__(self, model, column, many: bool = True):
+        super().__init__()
+        self.model = model
+        self.column = column
+        self.many = many
+
+    def batch_load_fn(self, keys):
+        grouped = defaultdict(list)
+        rows = self.model.query.filter(self.column.in_(keys)).order_by(self.model.id)
+        for row in rows:
+            grouped[getattr(row, self.column.key)].append(row)
+
+        if self.many:
+            return Promise.resolve([grouped.get(key, []) for key in keys])
+        return Promise.resolve([next(iter(grouped.get(key, [])), None) for key in keys])
+
+
+LOADERS = {
+    "addresses_by_user": (ShippingAddress, ShippingAddress.user_id, True),
+    "runs_by_user": (ShipmentRun, ShipmentRun.user_id, True),
+    "packages_by_shipment": (PackageRecord, PackageRecord.shipment_id, True),
+    "rates_by_shipment": (RateRecord, RateRecord.shipment_id, True),
+    "label_by_shipment": (LabelRecord, LabelRecord.shipment_id, False),
+}
+
+
+def get_loader(name: str) -> ColumnLoader:
+    """
+    Returns the request's loader for `name`. Loaders live on flask.g so
+    their cache never outlives a single GraphQL request.
+    """
+    loaders = g.setdefault("graphql_loaders", {})
+    loader = loaders.get(name)
+    if loader is None:
+        model, column, many = LOADERS[name]
+        loader = loaders[name] = ColumnLoader(model, column, many=many)
+    return loader
@@ -1,28 +1,146 @@
 import graphene
+from flask_login import current_user
 from graphene import relay
 from graphene_sqlalchemy import SQLAlchemyObjectType, SQLAlchemyConnectionField
-from csv_shipper.models import User, ShippingAddress
+from csv_shipper import db_session, models
+from csv_shipper.graphql.limits import check_page_size
+from csv_shipper.graphql.loaders import get_loader
+from csv_shipper.models import (
+    User,
+    ShippingAddress,
+    ShipmentRun,
+    ShipmentRecord,
+    PackageRecord,
+    RateRecord,
+    LabelRecord,
+)
 
 
-class User(SQLAlchemyObjectType):
+def owned_by_user(model, query):
+    """
+    Narrows a query of `model` rows to the logged in user's. Packages carry
+    no user_id and are matched through their shipment.
+    """
+    if model is models.User:
+        return query.filter(models.User.id == current_user.id)
+    if model is models.PackageRecord:
+        shipment_ids = db_session.query(models.ShipmentRecord.shipment_id).filter(
+            models.ShipmentRecord.user_id == current_user.id
+        )
+        return query.filter(models.PackageRecord.shipment_id.in_(shipment_ids))
+    return query.filter(model.user_id == current_user.id)
+
+
+class OwnedNode:
+    """Scopes relay node lookups by global id to the logged in user."""
+
+    @classmethod
+    def get_node(cls, info, id):
+        model = cls._meta.model
+        query = owned_by_user(model, cls.get_query(info))
+        return query.filter(model.id == id).first()
+
+
+class LimitedConnectionField(SQLAlchemyConnectionField):
+    """
+    A connection field that always pages, at most MAX_PAGE_SIZE nodes, and
+    only ever lists the logged in user's rows.
+    """
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection_type, model, root, info, **args):
+        check_page_size(args)
+        return super().connection_resolver(
+            resolver, connection_type, model, root, info, **args
+        )
+
+    @classmethod
+    def get_query(cls, model, info, sort=None, **args):
+        return owned_by_user(model, super().get_query(model, info, sort, **args))
+
+
+class ShippingAddress(OwnedNode, SQLAlchemyObjectType):
+    class Meta:
+        model = ShippingAddress
+        interfaces = (relay.Node, )
+
+
+class ShipmentRun(OwnedNode, SQLAlchemyObjectType):
+    class Meta:
+        model = ShipmentRun
+        interfaces = (relay.Node, )
+
+
+class User(OwnedNode, SQLAlchemyObjectType):
     class Meta:
         model = User
         interfaces = (relay.Node, )
+        exclude_fields = ("pw_hash", "token")
+
+    ship_from_addresses = graphene.List(ShippingAddress)
+    shipment_runs = graphene.List(ShipmentRun)
+
+    def resolve_ship_from_addresses(self, info):
+        return get_loader("addresses_by_user").load(self.id)
+
+    def resolve_shipment_runs(self, info):
+        return get_loader("runs_by_user").load(self.id)
+
+
+class Package(OwnedNode, SQLAlchemyObjectType):
+    class Meta:
+        model = PackageRecord
+        interfaces = (relay.Node, )
 
 
-class ShippingAddress(SQLAlchemyObjectType):
+class Rate(OwnedNode, SQLAlchemyObjectType):
     class Meta:
-        model = ShippingAddress
+        model = RateRecord
         interfaces = (relay.Node, )
 
 
+class Label(OwnedNode, SQLAlchemyObjectType):
+    class Meta:
+        model = LabelRecord
+        interfaces = (relay.Node, )
+
+
+class Shipment(OwnedNode, SQLAlchemyObjectType):
+    class Meta:
+        model = ShipmentRecord
+        interfaces = (relay.Node, )
+
+    packages = graphene.List(Package)
+    rates = graphene.List(Rate)
+    label = graphene.Field(Label)
+
+    def resolve_packages(self, info):
+        if self.shipment_id is None:
+            return []
+        return get_loader("packages_by_shipment").load(self.shipment_id)
+
+    def resolve_rates(self, info):
+        if self.shipment_id is None:
+            return []
+        return get_loader("rates_by_shipment").load(self.shipment_id)
+
+    def resolve_label(self, info):
+        if self.shipment_id is None:
+            return None
+        return get_loader("label_by_shipment").load(self.shipment_id)
+
+
 class Query(graphene.ObjectType):
     node = relay.Node.Field()
-    all_users = SQLAlchemyConnectionField(User.connection)
-    all_shipping_addresses = SQLAlchemyConnectionField(
+    all_users = LimitedConnectionField(User.connection)
+    all_shipping_addresses = LimitedConnectionField(
             ShippingAddress.connection,
             sort=None
     )
+    all_shipment_runs = LimitedConnectionField(ShipmentRun.connection)
+    all_shipments = LimitedConnectionField(Shipment.connection)
+    all_rates = LimitedConnectionField(Rate.connection)
+    all_labels = LimitedConnectionField(Label.connection)
 
 
 schema = graphene.Schema(query=Query)
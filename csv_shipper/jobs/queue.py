@@ -0,0 +1,138 @@
+import json
+import os
+import time
+import uuid
+from typing import Optional
+
+import redis
+
+JOB_QUEUE_KEY = "csv_shipper:jobs"
+JOB_KEY = "csv_shipper:job:{}"
+JOB_RESULTS_KEY = "csv_shipper:job:{}:results"
+JOB_TTL = int(os.getenv("JOB_TTL", 7 * 24 * 60 * 60))
+
+
+def get_redis(url: str = None) -> redis.Redis:
+    return redis.Redis.from_url(
+        url or os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+        decode_responses=True,
+    )
+
+
+class JobQueue:
+    """
+    A small CSV shipping job queue on top of Redis.
+
+    Jobs are hashes holding their status and progress counters, their ids
+    are pushed onto a list that workers block on, and per-row results are
+    appended to a second list. Everything expires after JOB_TTL seconds.
+
+    Args:
+        client (redis.Redis): A client created with decode_responses=True.
+            A fakeredis.FakeRedis works as well for local testing.
+    """
+
+    def __init__(self, client: redis.Redis = None):
+        self.client = client or get_redis()
+
+    def enqueue(
+        self, user_id: int, run_id: int, csv_path: str, ship_from: dict, job_id: str = None
+    ) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        key = JOB_KEY.format(job_id)
+
+        pipe = self.client.pipeline()
+        pipe.hset(
+            key,
+            mapping={
+                "user_id": user_id,
+                "run_id": run_id,
+                "csv_path": csv_path,
+                "ship_from": json.dumps(ship_from),
+                "status": "queued",
+                "total": 0,
+                "done": 0,
+                "failed": 0,
+                "skipped": 0,
+                "created_at": time.time(),
+            },
+        )
+        pipe.expire(key, JOB_TTL)
+        pipe.lpush(JOB_QUEUE_KEY, job_id)
+        pipe.execute()
+        return job_id
+
+    def requeue(self, job_id: str):
+        """
+        Restarts a job. The restart reports every row again, the ones
+        already in the run ledger as skipped, so the counters and results
+        of the previous attempt are cleared.
+        """
+        pipe = self.client.pipeline()
+        pipe.hset(
+            JOB_KEY.format(job_id),
+            mapping={"status": "queued", "done": 0, "failed": 0, "skipped": 0},
+        )
+        pipe.delete(JOB_RESULTS_KEY.format(job_id))
+        pipe.lpush(JOB_QUEUE_KEY, job_id)
+        pipe.execute()
+
+    def dequeue(self, timeout: int = 5) -> Optional[str]:
+        item = self.client.brpop(JOB_QUEUE_KEY, timeout=timeout)
+        return item[1] if item else None
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self.client.hgetall(JOB_KEY.format(job_id))
+        return job or None
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """The cheap view polled by the dashboard, no results included."""
+        job = self.client.hmget(
+            JOB_KEY.format(job_id),
+            "user_id",
+            "status",
+            "total",
+            "done",
+            "failed",
+            "skipped",
+            "api_summary",
+        )
+        if job[1] is None:
+            return None
+        user_id, status, total, done, failed, skipped, api_summary = job
+        return {
+            "job_id": job_id,
+            "user_id": int(user_id),
+            "status": status,
+            "total": int(total),
+            "done": int(done),
+            "failed": int(failed),
+            "skipped": int(skipped or 0),
+            "api_summary": json.loads(api_summary) if api_summary else None,
+        }
+
+    def set_status(self, job_id: str, status: str, **fields):
+        self.client.hset(JOB_KEY.format(job_id), mapping={"status": status, **fields})
+
+    def record(self, job_id: str, results: list, failed: int, skipped: int = 0):
+        """
+        Stores a batch of row results and bumps the progress counters, every
+        result that is neither failed nor skipped counts as done.
+        """
+        key = JOB_KEY.format(job_id)
+        results_key = JOB_RESULTS_KEY.format(job_id)
+
+        pipe = self.client.pipeline()
+        if results:
+            pipe.rpush(results_key, *(json.dumps(result) for result in results))
+            pipe.expire(results_key, JOB_TTL)
+        pipe.hincrby(key, "done", len(results) - failed - skipped)
+        pipe.hincrby(key, "failed", failed)
+        pipe.hincrby(key, "skipped", skipped)
+        pipe.execute()
+
+    def results(self, job_id: str, start: int = 0, end: int = -1) -> list:
+        return [
+            json.loads(result)
+            for result in self.client.lrange(JOB_RESULTS_KEY.format(job_id), start, end)
+        ]
@@ -0,0 +1,222 @@
+import csv
+import json
+import logging
+import os
+import time
+from multiprocessing import Pool
+
+from sqlalchemy import func
+
+from csv_shipper import create_app, db_session
+from csv_shipper.concurrency import DEFAULT_RATE_LIMIT, ShipEngineExecutor, TokenBucket
+from csv_shipper.csv_columnar import merge_rejects, read_orders_columnar
+from csv_shipper.csv_reader import batched, open_csv
+from csv_shipper.jobs.queue import JobQueue
+from csv_shipper.ledger import RunLedger
+from csv_shipper.models import ShipFromAddress, ShipmentRun
+from csv_shipper.se_client import ShipEngine
+from csv_shipper.se_errors import ShipEngineError
+from csv_shipper.se_metrics import ApiMetrics, collect, merge_snapshots, publish, summarize
+from csv_shipper.se_retry import CircuitBreaker, RetryPolicy
+from csv_shipper.shipment_store import ShipmentStore
+from csv_shipper.tracking import track_labels
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 4))
+RESULT_BATCH_SIZE = int(os.getenv("JOB_RESULT_BATCH_SIZE", 50))
+
+
+def count_rows(csv_path: str) -> int:
+    with open_csv(csv_path) as stream:
+        return sum(1 for _ in csv.DictReader(stream))
+
+
+def _label_result(order, resp) -> dict:
+    result = {"row_number": order.row_number, "external_order_id": order.external_order_id}
+    if isinstance(resp, ShipEngineError):
+        result["errors"] = resp.messages
+        result["request_id"] = resp.request_id
+    else:
+        result["label_id"] = resp.get("label_id")
+        result["tracking_number"] = resp.get("tracking_number")
+    return result
+
+
+def _rejects_path(csv_path: str, shard: int = None) -> str:
+    base = os.path.splitext(csv_path)[0]
+    if shard is None:
+        return f"{base}.rejects.csv"
+    return f"{base}.rejects.{shard}.csv"
+
+
+def ship_shard(
+        job_id: str,
+        run_id: int,
+        user_id: int,
+        csv_path: str,
+        ship_from: dict,
+        shard: int,
+        shards: int,
+):
+    """
+    Buys the labels for every row whose number falls into this shard
+    (row_number % shards == shard). Runs in its own process with its own
+    client, and gets an equal slice of the API key's rate limit.
+
+    Rows are normalized and validated column-wise by csv_columnar, the
+    rejected ones are written to a rejects file next to the upload and
+    recorded as failed results.
+
+    Every batch is claimed in the run ledger before its labels are bought,
+    and only the rows the claim returns are bought, so a restarted job
+    picks up where the last attempt stopped. The rows it skips, shipped
+    before or repeated within the batch, are recorded as skipped results.
+
+    The shard's API metrics are published under "<job_id>:<shard>" after
+    every batch for the run summary, and added to the /metrics totals.
+    """
+    create_app()  # pushes an app context for the ledger's database session
+    queue = JobQueue()
+    metrics = ApiMetrics()
+    se = ShipEngine(metrics=metrics, breaker=CircuitBreaker(metrics=metrics))
+    executor = ShipEngineExecutor(
+        rate_limiter=TokenBucket(DEFAULT_RATE_LIMIT / shards),
+        retry_policy=RetryPolicy(metrics=metrics),
+    )
+    ledger = RunLedger(run_id, user_id)
+    store = ShipmentStore(run_id, user_id)
+    ship_from_address = ShipFromAddress(**ship_from)
+    parse_errors, skipped = [], []
+    published = None
+
+    def reject(row_number: int, reason: str):
+        parse_errors.append({"row_number": row_number, "errors": reason.split("; ")})
+
+    def skip(order, reason: str):
+        skipped.append(
+            {
+                "row_number": order.row_number,
+                "external_order_id": order.external_order_id,
+                "skipped": reason,
+            }
+        )
+
+    orders = read_orders_columnar(
+        csv_path,
+        rejects_path=_rejects_path(csv_path, shard),
+        shard=shard,
+        shards=shards,
+        on_reject=reject,
+    )
+    for batch in batched(orders, RESULT_BATCH_SIZE):
+        batch = ledger.claim(batch, on_skip=skip)
+
+        results, labels = [], []
+        for order, resp in executor.create_labels(se, ship_from_address, batch):
+            ledger.record(order, resp)
+            store.add_label(order, resp)
+            results.append(_label_result(order, resp))
+            if not isinstance(resp, ShipEngineError):
+                labels.append(resp)
+        ledger.flush()
+        store.flush()
+        track_labels(user_id, labels)
+
+        results.extend(parse_errors)
+        results.extend(skipped)
+        parse_errors.clear()
+        skipped.clear()
+        queue.record(
+            job_id,
+            results,
+            failed=sum(1 for result in results if "errors" in result),
+            skipped=sum(1 for result in results if "skipped" in result),
+        )
+        snapshot = metrics.snapshot()
+        publish(queue.client, f"{job_id}:{shard}", snapshot, previous=published)
+        published = snapshot
+
+    if parse_errors:
+        queue.record(job_id, parse_errors, failed=len(parse_errors))
+
+
+def run_job(queue: JobQueue, job_id: str, processes: int = WORKER_PROCESSES):
+    job = queue.get(job_id)
+    if job is None:
+        logging.warning(f"Job {job_id} expired before it was picked up")
+        return
+
+    csv_path = job["csv_path"]
+    run = ShipmentRun.query.get(int(job["run_id"]))
+    if run is not None:
+        run.status = "running"
+        db_session.commit()
+    queue.set_status(job_id, "running", total=count_rows(csv_path), started_at=time.time())
+    try:
+        with Pool(processes) as pool:
+            pool.starmap(
+                ship_shard,
+                [
+                    (
+                        job_id,
+                        int(job["run_id"]),
+                        int(job["user_id"]),
+                        csv_path,
+                        json.loads(job["ship_from"]),
+                        shard,
+                        processes,
+                    )
+                    for shard in range(processes)
+                ],
+            )
+    except Exception:
+        logging.exception(f"Job {job_id} failed")
+        _finish_run(queue, job_id, int(job["run_id"]), csv_path, "failed", processes)
+        raise
+    _finish_run(queue, job_id, int(job["run_id"]), csv_path, "finished", processes)
+
+
+def _finish_run(
+        queue: JobQueue, job_id: str, run_id: int, csv_path: str, status: str, shards: int
+):
+    rejects_path = merge_rejects(
+        (_rejects_path(csv_path, shard) for shard in range(shards)), _rejects_path(csv_path)
+    )
+    summary = summarize(
+        merge_snapshots(collect(queue.client, (f"{job_id}:{shard}" for shard in range(shards))))
+    )
+    for row in summary:
+        logging.info(f"Job {job_id} {row['endpoint']}: {row}")
+    queue.set_status(
+        job_id,
+        status,
+        finished_at=time.time(),
+        api_summary=json.dumps(summary),
+        rejects_path=rejects_path or "",
+    )
+
+    run = ShipmentRun.query.get(run_id)
+    if run is not None:
+        run.status = status
+        run.finished_at = func.now()
+        run.api_summary = summary
+        db_session.commit()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    create_app()
+    queue = JobQueue()
+    logging.info("CSV shipping worker waiting for jobs")
+    while True:
+        job_id = queue.dequeue()
+        if job_id is None:
+            continue
+        try:
+            run_job(queue, job_id)
+        except Exception:
+            # Already recorded on the job, keep serving the queue.
+            continue
+
+
+if __name__ == "__main__":
+    main()
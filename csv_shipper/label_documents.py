@@ -0,0 +1,162 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
+
+from pypdf import PdfWriter
+
+from csv_shipper.concurrency import DEFAULT_MAX_CONCURRENCY
+from csv_shipper.csv_reader import batched
+
+CHUNK_BYTES = 64 * 1024
+LABELS_PER_PRINT_FILE = int(os.getenv("LABELS_PER_PRINT_FILE", 100))
+
+
+def label_url(label: dict, file_format: str = "pdf") -> str:
+    """
+    Picks the download link of a label purchase response. `href` is only
+    used when the label was bought in `file_format`, a PDF is never handed
+    out as a ZPL file.
+    """
+    links = label.get("label_download") or {}
+    if links.get(file_format):
+        return links[file_format]
+    if links.get("href") and label.get("label_format") == file_format:
+        return links["href"]
+    raise ValueError(
+        f"label {label.get('label_id')} has no {file_format} download, "
+        f"got {sorted(key for key, url in links.items() if url)}"
+    )
+
+
+def download_label(session, url: str, path: str, timeout=None) -> str:
+    """
+    Streams one label document to `path`. The document is written to a
+    temporary file first and renamed, so an interrupted download never
+    leaves a truncated label behind, and existing files are not fetched
+    again.
+    """
+    if os.path.exists(path):
+        return path
+
+    tmp_path = path + ".part"
+    try:
+        with session.get(url, stream=True, timeout=timeout) as resp:
+            resp.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in resp.iter_content(CHUNK_BYTES):
+                    f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def _download(session, label: dict, dest_dir: str, file_format: str, timeout) -> str:
+    url = label_url(label, file_format)
+    return download_label(
+        session, url, os.path.join(dest_dir, f"{label['label_id']}.{file_format}"), timeout
+    )
+
+
+def download_labels(
+        session,
+        labels: Iterable[dict],
+        dest_dir: str,
+        file_format: str = "pdf",
+        max_workers: int = DEFAULT_MAX_CONCURRENCY,
+        timeout=None,
+) -> Iterator[Tuple[dict, Union[str, Exception]]]:
+    """
+    Downloads label documents concurrently over a pooled session (pass
+    ShipEngine.session so the API-Key header and connection pool are
+    reused). Only a window of `2 * max_workers` downloads is in flight and
+    every document goes straight to disk.
+
+    A label without a `file_format` download, or whose download failed,
+    does not stop the others, its error is yielded in place of the path.
+
+    Returns:
+        A generator of (label, path or exception) tuples in input order.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for batch in batched(labels, 2 * max_workers):
+            futures = [
+                pool.submit(_download, session, label, dest_dir, file_format, timeout)
+                for label in batch
+            ]
+            for label, future in zip(batch, futures):
+                try:
+                    result = future.result()
+                except (ValueError, OSError) as e:
+                    # requests.RequestException is an OSError.
+                    result = e
+                yield label, result
+
+
+def merge_documents(paths: List[str], dest_path: str, file_format: str = "pdf") -> str:
+    """
+    Merges label documents into one print file. ZPL and other raw printer
+    formats are concatenated as bytes; PDFs are merged page by page.
+    """
+    tmp_path = dest_path + ".part"
+    if file_format == "pdf":
+        writer = PdfWriter()
+        for path in paths:
+            writer.append(path)
+        with open(tmp_path, "wb") as f:
+            writer.write(f)
+        writer.close()
+    else:
+        with open(tmp_path, "wb") as out:
+            for path in paths:
+                with open(path, "rb") as f:
+                    shutil.copyfileobj(f, out, CHUNK_BYTES)
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def build_print_files(
+        session,
+        labels: Iterable[dict],
+        dest_dir: str,
+        file_format: str = "pdf",
+        labels_per_file: int = LABELS_PER_PRINT_FILE,
+        max_workers: int = DEFAULT_MAX_CONCURRENCY,
+        on_error: Callable[[dict, Exception], None] = None,
+) -> Iterator[str]:
+    """
+    Downloads every label and merges them into print files of at most
+    `labels_per_file` labels each, one printer batch per file. A print file
+    is written as soon as its labels are on disk.
+
+    Args:
+        on_error (Callable): Called with the label and the error of every
+            label that could not be downloaded, those are left out of the
+            print files.
+
+    Returns:
+        A generator of print file paths, in label order.
+    """
+    label_dir = os.path.join(dest_dir, "labels")
+    downloads = download_labels(
+        session, labels, label_dir, file_format=file_format, max_workers=max_workers
+    )
+    paths = (path for label, path in downloads if not _failed(label, path, on_error))
+    for number, batch in enumerate(batched(paths, labels_per_file), start=1):
+        yield merge_documents(
+            batch,
+            os.path.join(dest_dir, f"print_batch_{number:04d}.{file_format}"),
+            file_format=file_format,
+        )
+
+
+def _failed(label: dict, result, on_error) -> bool:
+    if not isinstance(result, Exception):
+        return False
+    if on_error is not None:
+        on_error(label, result)
+    return True
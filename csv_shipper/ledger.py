@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import uuid
+from typing import Callable, List
+
+from sqlalchemy import bindparam, func
+
+from csv_shipper import db, db_session
+from csv_shipper.models import LedgerEntry, Order, dialect_insert
+from csv_shipper.se_errors import ShipEngineError, ShipEngineRequestError
+from csv_shipper.serializers import to_payload
+
+LEDGER_COMMIT_EVERY = int(os.getenv("LEDGER_COMMIT_EVERY", 500))
+
+IN_FLIGHT = "in_flight"
+COMPLETED = "completed"
+FAILED = "failed"
+
+SKIP_REASONS = {
+    COMPLETED: "already shipped",
+    IN_FLIGHT: "in flight in another attempt, check it against ShipEngine",
+}
+
+
+def idempotency_key(user_id: int, order: Order, run_id: int) -> str:
+    """
+    Derives a stable key from the content of a CSV row.
+
+    Only a row with an external_order_id is deduplicated across runs: the
+    same order id, recipient and packages map to the same ledger entry no
+    matter which upload or row number it shows up in. Without an order id
+    identical rows may well be repeat orders, so the key is scoped to the
+    run and row and only keeps a restarted run from buying the row twice.
+    """
+    content = {
+        "user_id": user_id,
+        "external_order_id": order.external_order_id,
+        "ship_to": to_payload(order.ship_to),
+        "packages": to_payload(order.packages),
+    }
+    if not order.external_order_id:
+        content.update(run_id=run_id, row_number=order.row_number)
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class RunLedger:
+    """
+    The persistent record of which rows of a shipping run already have a
+    paid label.
+
+    A batch is claimed (one commit) before its labels are bought, and the
+    outcomes are written back in bulk every `commit_every` rows. A row can
+    only be claimed when its idempotency key is new or its last attempt
+    failed, so rows that are completed, or that were in flight when a
+    previous attempt died, are never bought twice, even by another shard or
+    a concurrent run. See idempotency_key for which rows count as the same
+    order. In-flight leftovers are reported by unresolved() for
+    a manual check against ShipEngine, and so is every purchase whose
+    error leaves open whether ShipEngine bought the label, e.g. a 5xx or a
+    timeout after the request was sent.
+
+    Args:
+        run_id (int): The ShipmentRun being processed.
+        user_id (int): The owner of the run, part of every idempotency key.
+        commit_every (int): How many results are buffered per commit.
+    """
+
+    def __init__(self, run_id: int, user_id: int, commit_every: int = LEDGER_COMMIT_EVERY):
+        self.run_id = run_id
+        self.user_id = user_id
+        self.commit_every = commit_every
+        self._keys = {}
+        self._results = []
+
+    def key(self, order: Order) -> str:
+        key = self._keys.get(order.row_number)
+        if key is None:
+            key = self._keys[order.row_number] = idempotency_key(self.user_id, order, self.run_id)
+        return key
+
+    def claim(
+            self, orders: List[Order], on_skip: Callable[[Order, str], None] = None
+    ) -> List[Order]:
+        """
+        Claims a batch of rows before any label for them is bought.
+
+        The claim is a single upsert that only takes over existing entries
+        whose status is failed, so the database decides atomically which
+        rows this attempt owns. Rows repeating a key that is already in the
+        batch are dropped as well.
+
+        Args:
+            orders (list): The batch, in CSV row order.
+            on_skip (callable): Called with every order that is not claimed
+                and the reason why, e.g. "already shipped".
+
+        Returns:
+            The orders that were claimed, in batch order. Only these may be
+            bought.
+        """
+        batch = {}
+        for order in orders:
+            batch.setdefault(self.key(order), order)
+        for order in orders:
+            first = batch.get(self.key(order))
+            if first is not order:
+                self._keys.pop(order.row_number, None)
+                if on_skip is not None:
+                    on_skip(order, f"duplicate of row {first.row_number}")
+        if not batch:
+            return []
+
+        claim_id = uuid.uuid4().hex
+        table = LedgerEntry.__table__
+        stmt = dialect_insert(table).values(
+            [
+                {
+                    "run_id": self.run_id,
+                    "idempotency_key": key,
+                    "row_number": order.row_number,
+                    "external_order_id": order.external_order_id,
+                    "status": IN_FLIGHT,
+                    "claim_id": claim_id,
+                }
+                for key, order in batch.items()
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.idempotency_key],
+            set_={
+                "run_id": stmt.excluded.run_id,
+                "row_number": stmt.excluded.row_number,
+                "status": IN_FLIGHT,
+                "claim_id": stmt.excluded.claim_id,
+                "error": None,
+                "updated_at": func.now(),
+            },
+            where=table.c.status == FAILED,
+        )
+        if db.engine.dialect.name == "postgresql":
+            claimed = {key for key, in db_session.execute(stmt.returning(table.c.idempotency_key))}
+        else:
+            # sqlite has no RETURNING here, the claim id tells our rows apart.
+            db_session.execute(stmt)
+            claimed = {
+                key
+                for key, in db_session.query(LedgerEntry.idempotency_key).filter(
+                    LedgerEntry.claim_id == claim_id
+                )
+            }
+        db_session.commit()
+
+        skipped = {key: order for key, order in batch.items() if key not in claimed}
+        if skipped and on_skip is not None:
+            statuses = dict(
+                db_session.query(LedgerEntry.idempotency_key, LedgerEntry.status).filter(
+                    LedgerEntry.idempotency_key.in_(list(skipped))
+                )
+            )
+            for key, order in skipped.items():
+                on_skip(order, SKIP_REASONS.get(statuses.get(key), "claimed by another attempt"))
+        for order in skipped.values():
+            self._keys.pop(order.row_number, None)
+        return [order for key, order in batch.items() if key in claimed]
+
+    def record(self, order: Order, resp):
+        """
+        Buffers the outcome of a label purchase for `order`. Only definite
+        rejections (4xx, 429, an open circuit, a request never sent) are
+        failed and may be claimed again, anything else stays in flight.
+        """
+        if isinstance(resp, ShipEngineError):
+            may_be_bought = resp.request_sent and not isinstance(resp, ShipEngineRequestError)
+            status = IN_FLIGHT if may_be_bought else FAILED
+            result = {"_status": status, "_label_id": None, "_error": str(resp)}
+        else:
+            result = {
+                "_status": COMPLETED,
+                "_label_id": resp.get("label_id"),
+                "_error": None,
+            }
+        result["_key"] = self.key(order)
+        self._results.append(result)
+        self._keys.pop(order.row_number, None)
+
+        if len(self._results) >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        if not self._results:
+            return
+        table = LedgerEntry.__table__
+        db_session.execute(
+            table.update()
+            .where(table.c.idempotency_key == bindparam("_key"))
+            .values(
+                status=bindparam("_status"),
+                label_id=bindparam("_label_id"),
+                error=bindparam("_error"),
+                updated_at=func.now(),
+            ),
+            self._results,
+        )
+        db_session.commit()
+        self._results = []
+
+    def unresolved(self) -> List[LedgerEntry]:
+        return LedgerEntry.query.filter_by(run_id=self.run_id, status=IN_FLIGHT).all()
@@ -1,4 +1,12 @@
-from flask import render_template, Blueprint
+import logging
+
+from flask import render_template, Blueprint, request, current_app, abort, Response
+from flask_login import login_required
+from redis import RedisError
+
+from csv_shipper.jobs.queue import get_redis
+from csv_shipper.se_metrics import publish_local, render_prometheus, totals
+from csv_shipper.webhooks import get_consumer, verify
 
 main = Blueprint("main", __name__)
 
@@ -10,4 +18,34 @@ def home():
 
 @main.route("/csv_shipper-webhook", methods=["POST"])
 def consume_webhook():
-    pass
+    if not verify(request.headers, current_app.config):
+        abort(403)
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        abort(400)
+
+    # Only queue the event here, the consumer thread writes it to the
+    # database in bulk. A full queue asks ShipEngine to retry later.
+    consumer = get_consumer(current_app._get_current_object())
+    if not consumer.submit(request.get_data(), payload):
+        return "", 503
+    return "", 204
+
+
+@main.route("/metrics")
+@login_required
+def metrics():
+    """
+    ShipEngine API metrics in the Prometheus text format: the cumulative
+    counters every worker and web process added to Redis, this process's
+    own calls included.
+    """
+    try:
+        client = get_redis(current_app.config["REDIS_URL"])
+        publish_local(client)
+        snapshot = totals(client)
+    except RedisError:
+        logging.exception("Could not read the metrics totals")
+        return "", 503
+    return Response(render_prometheus(snapshot), mimetype="text/plain; version=0.0.4")
@@ -1,8 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import MISSING, dataclass, fields
 from enum import Enum, unique
 from typing import List, Optional
 
 from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
 from flask_login import UserMixin, AnonymousUserMixin
 from itsdangerous import TimedJSONWebSignatureSerializer as Serializer
 from flask import current_app
@@ -19,16 +20,213 @@ class Anon(AnonymousUserMixin):
 login_manager.anonymous_user = Anon
 
 
+@unique
+class SupportedCurrencies(str, Enum):
+    usd = "usd"
+    cad = "cad"
+    aud = "aud"
+    gbp = "gbp"
+    eur = "eur"
+    nzd = "nzd"
+
+
+# Allowed values for the enum-like payload fields. They are built once at
+# import time so that __post_init__ only does a set lookup per object.
+CURRENCIES = frozenset(currency.value for currency in SupportedCurrencies)
+RESIDENTIAL_INDICATORS = frozenset(("yes", "no", "unknown"))
+ORDER_SOURCES = frozenset(
+    (
+        "amazon_ca",
+        "amazon_us",
+        "brightpearl",
+        "channel_advisor",
+        "cratejoy",
+        "ebay",
+        "etsy",
+        "jane",
+        "groupon_goods",
+        "magento",
+        "paypal",
+        "seller_active",
+        "shopify",
+        "stitch_labs",
+        "squarespace",
+        "three_dcart",
+        "tophatter",
+        "walmart",
+        "woo_commerce",
+        "volusion",
+    )
+)
+CUSTOMS_CONTENTS = frozenset(
+    ("merchandise", "documents", "gift", "returned_goods", "sample")
+)
+NON_DELIVERY_OPTIONS = frozenset(("return_to_sender", "treat_as_abandoned"))
+WEIGHT_UNITS = frozenset(("pound", "ounce", "gram", "kilogram"))
+DIMENSION_UNITS = frozenset(("inch", "centimeter"))
+PAYMENT_TYPES = frozenset(("any", "cash", "cash_equivalent", "none"))
+CONFIRMATION_OPTIONS = frozenset(
+    (
+        "none",
+        "delivery",
+        "signature",
+        "adult_signature",
+        "direct_signature",
+        "delivery_mailed",
+    )
+)
+
+
+def check_choice(field: str, value, choices: frozenset):
+    if value not in choices:
+        raise ValueError(f"{field} must be one of {sorted(choices)}, got {value!r}")
+
+
+def slotted_dataclass(cls):
+    """
+    A @dataclass that also gets __slots__, which dataclasses only learned to
+    do on their own in Python 3.10. The class is rebuilt with one slot per
+    field, so instances have no per-object __dict__ and attribute access is
+    cheaper. Field defaults survive because they live in the generated
+    __init__.
+    """
+    cls = dataclass(cls)
+    field_names = tuple(f.name for f in fields(cls))
+
+    cls_dict = dict(cls.__dict__)
+    cls_dict["__slots__"] = field_names
+    for name in field_names:
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+
+    slotted = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted.__qualname__ = getattr(cls, "__qualname__")
+    return slotted
+
+
+def build_unchecked(cls, **values):
+    """
+    Builds a payload dataclass without running its __post_init__ checks.
+    Only for values that were already validated in bulk, e.g. by
+    csv_shipper.csv_columnar. Fields that are not given get their default,
+    or None.
+    """
+    obj = object.__new__(cls)
+    for f in fields(cls):
+        if f.name in values:
+            value = values[f.name]
+        elif f.default is not MISSING:
+            value = f.default
+        else:
+            value = None
+        object.__setattr__(obj, f.name, value)
+    return obj
+
+
+def dialect_insert(table):
+    """
+    An INSERT that supports ON CONFLICT for the configured database. sqlite
+    only matters for local runs, production is Postgres.
+    """
+    if db.engine.dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
 def db_add(obj):
     db_session.add(obj)
     return db_session.commit()
 
 
 def db_rm(obj):
-    db_session.remove(obj)
+    db_session.delete(obj)
     return db_session.commit()
 
 
+class UnitOfWork:
+    """
+    Collects adds and deletes and writes them in batches inside a single
+    transaction, instead of one commit per object like db_add/db_rm.
+
+    Objects are flushed with bulk_save_objects every `flush_size` adds, and
+    plain dicts given to add_mappings are written with one executemany
+    INSERT per batch. Everything is committed when the block exits, or
+    rolled back if it, or the final commit, raises.
+
+        with UnitOfWork() as uow:
+            for row in rows:
+                uow.add(ShippingAddress(**row))
+
+    bulk_save_objects does not fetch primary keys back, so use db_add for
+    objects whose id is needed right away.
+
+    Args:
+        flush_size (int): How many pending rows are written per batch.
+    """
+
+    def __init__(self, flush_size: int = 1000):
+        self.flush_size = flush_size
+        self._objects = []
+        self._mappings = {}
+
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            try:
+                self.commit()
+                return False
+            except BaseException:
+                # The batches flushed before the failing one are rolled back too.
+                self.rollback()
+                raise
+        self.rollback()
+        return False
+
+    def add(self, obj):
+        self._objects.append(obj)
+        if len(self._objects) >= self.flush_size:
+            self.flush()
+
+    def add_all(self, objs):
+        for obj in objs:
+            self.add(obj)
+
+    def add_mappings(self, model, rows):
+        pending = self._mappings.setdefault(model, [])
+        for row in rows:
+            pending.append(row)
+            if len(pending) >= self.flush_size:
+                self.flush()
+                pending = self._mappings.setdefault(model, [])
+
+    def delete(self, obj):
+        db_session.delete(obj)
+
+    def flush(self):
+        """Writes the pending rows without committing."""
+        if self._objects:
+            db_session.bulk_save_objects(self._objects)
+            self._objects = []
+        for model, rows in self._mappings.items():
+            if rows:
+                db_session.execute(model.__table__.insert(), rows)
+        self._mappings = {}
+        db_session.flush()
+
+    def commit(self):
+        self.flush()
+        db_session.commit()
+
+    def rollback(self):
+        """Drops the pending rows and rolls back what was flushed."""
+        self._objects = []
+        self._mappings = {}
+        db_session.rollback()
+
+
 @login_manager.user_loader
 def load_user(user_id: int) -> repr:
     return User.query.get(int(user_id))  # might not need to int() the int lol
@@ -101,14 +299,237 @@ class ShippingAddress(db.Model):
     )
 
     def __post_init__(self):
-        valid_residential_indicators = ("yes", "no", "unknown")
-        if self.address_residential_indicator not in valid_residential_indicators:
-            raise ValueError(
-                f"address_residential_indicator must be on of {valid_residential_indicators}"
-            )
+        check_choice(
+            "address_residential_indicator",
+            self.address_residential_indicator,
+            RESIDENTIAL_INDICATORS,
+        )
+
+    def to_ship_from(self) -> "ShipFromAddress":
+        return ShipFromAddress(
+            name=self.name,
+            phone=self.phone,
+            company_name=self.company_name,
+            address_line1=self.address_line_1,
+            address_line2=self.address_line_2,
+            address_line3=self.address_line_3,
+            city_locality=self.city_locality,
+            state_province=self.state_province,
+            postal_code=str(self.postal_code),
+            country_code=self.country_code,
+            address_residential_indicator=self.address_residential_indicator,
+        )
+
+
+@dataclass
+class ValidatedAddress(db.Model):
+    __tablename__ = "validated_addresses"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    address_hash = db.Column(db.String(64), unique=True, index=True, nullable=False)
+    status = db.Column(db.String(20), unique=False, nullable=False)
+    matched_address = db.Column(db.JSON, unique=False, nullable=True)
+    validated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=func.now(),
+        server_default=func.now(),
+        index=True,
+    )
+
+    def __repr__(self):
+        return f"<ValidatedAddress {self.address_hash[:12]} {self.status}>"
+
+
+@dataclass
+class ShipmentRun(db.Model):
+    __tablename__ = "shipment_runs"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    job_id = db.Column(db.String(32), unique=True, nullable=True)
+    csv_path = db.Column(db.String(255), unique=False, nullable=False)
+    status = db.Column(db.String(12), unique=False, nullable=False, default="queued")
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=func.now(), server_default=func.now()
+    )
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    api_summary = db.Column(db.JSON, unique=False, nullable=True)
+
+    def __repr__(self):
+        return f"<ShipmentRun {self.id} {self.status}>"
+
+
+@dataclass
+class LedgerEntry(db.Model):
+    __tablename__ = "run_ledger"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    run_id = db.Column(
+        db.Integer, db.ForeignKey("shipment_runs.id"), nullable=False, index=True
+    )
+    idempotency_key = db.Column(db.String(64), unique=True, nullable=False)
+    row_number = db.Column(db.Integer, unique=False, nullable=False)
+    external_order_id = db.Column(db.String(50), unique=False, nullable=True, index=True)
+    status = db.Column(db.String(12), unique=False, nullable=False)
+    label_id = db.Column(db.String(30), unique=False, nullable=True)
+    error = db.Column(db.Text, unique=False, nullable=True)
+    # Set by every claim, see RunLedger.claim.
+    claim_id = db.Column(db.String(32), unique=False, nullable=True, index=True)
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=func.now(),
+        onupdate=func.now(),
+        server_default=func.now(),
+    )
+
+    def __repr__(self):
+        return f"<LedgerEntry {self.row_number} {self.status} {self.label_id}>"
+
+
+@dataclass
+class WebhookEvent(db.Model):
+    __tablename__ = "webhook_events"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    event_id = db.Column(db.String(64), unique=True, nullable=False)
+    resource_type = db.Column(db.String(30), unique=False, nullable=True, index=True)
+    resource_url = db.Column(db.String(255), unique=False, nullable=True)
+    payload = db.Column(db.JSON, unique=False, nullable=False)
+    received_at = db.Column(
+        db.DateTime(timezone=True), default=func.now(), server_default=func.now()
+    )
+
+    def __repr__(self):
+        return f"<WebhookEvent {self.resource_type} {self.event_id[:12]}>"
 
 
 @dataclass
+class TrackedLabel(db.Model):
+    __tablename__ = "tracked_labels"
+    __table_args__ = (
+        db.Index("ix_tracked_labels_refresh", "is_terminal", "last_checked_at"),
+        db.Index("ix_tracked_labels_user_status", "user_id", "status_code"),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    label_id = db.Column(db.String(30), unique=True, nullable=False)
+    tracking_number = db.Column(db.String(60), unique=False, nullable=True, index=True)
+    carrier_code = db.Column(db.String(30), unique=False, nullable=True)
+    status_code = db.Column(db.String(2), unique=False, nullable=False, default="UN")
+    status_description = db.Column(db.String(60), unique=False, nullable=True)
+    carrier_status_description = db.Column(db.String(255), unique=False, nullable=True)
+    estimated_delivery_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    is_terminal = db.Column(db.Boolean, unique=False, nullable=False, default=False)
+    last_checked_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=func.now(),
+        onupdate=func.now(),
+        server_default=func.now(),
+    )
+
+    def __repr__(self):
+        return f"<TrackedLabel {self.label_id} {self.status_code}>"
+
+
+@dataclass
+class ShipmentRecord(db.Model):
+    __tablename__ = "shipments"
+    __table_args__ = (
+        db.Index("ix_shipments_run_row", "run_id", "row_number"),
+        db.Index("ix_shipments_user_created", "user_id", "created_at"),
+        db.Index("ix_shipments_user_status", "user_id", "status"),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    run_id = db.Column(db.Integer, db.ForeignKey("shipment_runs.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    row_number = db.Column(db.Integer, unique=False, nullable=False)
+    external_order_id = db.Column(db.String(50), unique=False, nullable=True, index=True)
+    shipment_id = db.Column(db.String(30), unique=True, nullable=True)
+    status = db.Column(db.String(20), unique=False, nullable=False)
+    carrier_id = db.Column(db.String(30), unique=False, nullable=True)
+    service_code = db.Column(db.String(50), unique=False, nullable=True)
+    ship_to = db.Column(db.JSON, unique=False, nullable=False)
+    error = db.Column(db.Text, unique=False, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        default=func.now(),
+        server_default=func.now(),
+        index=True,
+    )
+
+    def __repr__(self):
+        return f"<ShipmentRecord {self.row_number} {self.status} {self.shipment_id}>"
+
+
+@dataclass
+class PackageRecord(db.Model):
+    __tablename__ = "shipment_packages"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    shipment_id = db.Column(db.String(30), unique=False, nullable=False, index=True)
+    package_index = db.Column(db.Integer, unique=False, nullable=False)
+    weight_value = db.Column(db.Float, unique=False, nullable=False)
+    weight_unit = db.Column(db.String(10), unique=False, nullable=False)
+    length = db.Column(db.Float, unique=False, nullable=True)
+    width = db.Column(db.Float, unique=False, nullable=True)
+    height = db.Column(db.Float, unique=False, nullable=True)
+    dimension_unit = db.Column(db.String(10), unique=False, nullable=True)
+    tracking_number = db.Column(db.String(60), unique=False, nullable=True)
+
+    def __repr__(self):
+        return f"<PackageRecord {self.shipment_id} #{self.package_index}>"
+
+
+@dataclass
+class RateRecord(db.Model):
+    __tablename__ = "shipment_rates"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    rate_id = db.Column(db.String(30), unique=True, nullable=False)
+    shipment_id = db.Column(db.String(30), unique=False, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    carrier_id = db.Column(db.String(30), unique=False, nullable=True)
+    service_code = db.Column(db.String(50), unique=False, nullable=True)
+    total_amount = db.Column(db.Numeric(10, 2), unique=False, nullable=False)
+    currency = db.Column(db.String(3), unique=False, nullable=True)
+    delivery_days = db.Column(db.Integer, unique=False, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        default=func.now(),
+        server_default=func.now(),
+        index=True,
+    )
+
+    def __repr__(self):
+        return f"<RateRecord {self.rate_id} {self.service_code} {self.total_amount}>"
+
+
+@dataclass
+class LabelRecord(db.Model):
+    __tablename__ = "labels"
+    __table_args__ = (db.Index("ix_labels_user_created", "user_id", "created_at"),)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    label_id = db.Column(db.String(30), unique=True, nullable=False)
+    shipment_id = db.Column(db.String(30), unique=False, nullable=False, index=True)
+    run_id = db.Column(
+        db.Integer, db.ForeignKey("shipment_runs.id"), nullable=True, index=True
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    external_order_id = db.Column(db.String(50), unique=False, nullable=True, index=True)
+    status = db.Column(db.String(20), unique=False, nullable=False, index=True)
+    tracking_number = db.Column(db.String(60), unique=False, nullable=True, index=True)
+    carrier_code = db.Column(db.String(30), unique=False, nullable=True)
+    service_code = db.Column(db.String(50), unique=False, nullable=True)
+    shipment_cost = db.Column(db.Numeric(10, 2), unique=False, nullable=True)
+    currency = db.Column(db.String(3), unique=False, nullable=True)
+    label_url = db.Column(db.String(255), unique=False, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        default=func.now(),
+        server_default=func.now(),
+        index=True,
+    )
+
+    def __repr__(self):
+        return f"<LabelRecord {self.label_id} {self.status}>"
+
+
+@slotted_dataclass
 class ShipFromAddress:
     name: str
     phone: str
@@ -123,14 +544,14 @@ class ShipFromAddress:
     address_residential_indicator: str  # Might change to ENUM
 
     def __post_init__(self):
-        valid_residential_indicators = ("yes", "no", "unknown")
-        if self.address_residential_indicator not in valid_residential_indicators:
-            raise ValueError(
-                f"address_residential_indicator must be on of {valid_residential_indicators}"
-            )
+        check_choice(
+            "address_residential_indicator",
+            self.address_residential_indicator,
+            RESIDENTIAL_INDICATORS,
+        )
 
 
-@dataclass
+@slotted_dataclass
 class ShipToAddress:
     name: str
     phone: str
@@ -145,14 +566,14 @@ class ShipToAddress:
     address_residential_indicator: str  # Might change to ENUM
 
     def __post_init__(self):
-        valid_residential_indicators = ("yes", "no", "unknown")
-        if self.address_residential_indicator not in valid_residential_indicators:
-            raise ValueError(
-                f"address_residential_indicator must be on of {valid_residential_indicators}"
-            )
+        check_choice(
+            "address_residential_indicator",
+            self.address_residential_indicator,
+            RESIDENTIAL_INDICATORS,
+        )
 
 
-@dataclass
+@slotted_dataclass
 class ReturnAddress:
     name: str
     phone: str
@@ -167,14 +588,14 @@ class ReturnAddress:
     address_residential_indicator: str  # Might change to ENUM
 
     def __post_init__(self):
-        valid_residential_indicators = ("yes", "no", "unknown")
-        if self.address_residential_indicator not in valid_residential_indicators:
-            raise ValueError(
-                f"address_residential_indicator must be on of {valid_residential_indicators}"
-            )
+        check_choice(
+            "address_residential_indicator",
+            self.address_residential_indicator,
+            RESIDENTIAL_INDICATORS,
+        )
 
 
-@dataclass
+@slotted_dataclass
 class Items:
     name: str
     sales_order_id: Optional[str]
@@ -186,33 +607,10 @@ class Items:
     order_source_code: str  # Might change to ENUM
 
     def __post_init__(self):
-        valid_order_sources = (
-            "amazon_ca",
-            "amazon_us",
-            "brightpearl",
-            "channel_advisor",
-            "cratejoy",
-            "ebay",
-            "etsy",
-            "jane",
-            "groupon_goods",
-            "magento",
-            "paypal",
-            "seller_active",
-            "shopify",
-            "stitch_labs",
-            "squarespace",
-            "three_dcart",
-            "tophatter",
-            "walmart",
-            "woo_commerce",
-            "volusion",
-        )
-        if self.order_source_code not in valid_order_sources:
-            raise ValueError(f"order_source_code must be one of {valid_order_sources}")
+        check_choice("order_source_code", self.order_source_code, ORDER_SOURCES)
 
 
-@dataclass
+@slotted_dataclass
 class RateOptions:
     carrier_ids: List[str]
     package_types: List[str]
@@ -220,32 +618,27 @@ class RateOptions:
     calculate_tax_amount: bool
     preferred_currency: str  # Might change to ENUM
 
-    # TODO: Implement ENUM for preferred currencies
     def __post_init__(self):
-        valid_currencies = ("usd", "cad", "aud", "gbp", "eur", "nzd")
-        if self.preferred_currency not in valid_currencies:
-            raise ValueError(f"preferred_currency must be one of {valid_currencies}")
+        check_choice("preferred_currency", self.preferred_currency, CURRENCIES)
 
 
-@dataclass
+@slotted_dataclass
 class CustomsValue:
     currency: str  # Might change to ENUM
     amount: float
 
     def __post_init__(self):
-        valid_currencies = ("usd", "cad", "aud", "gbp", "eur", "nzd")
-        if self.currency not in valid_currencies:
-            raise ValueError(f"currency must be one of {valid_currencies}")
+        check_choice("currency", self.currency, CURRENCIES)
 
 
-@dataclass
+@slotted_dataclass
 class CustomsItem:
     description: Optional[str]
     quantity: int
     value: Optional[List[CustomsValue]]
 
 
-@dataclass
+@slotted_dataclass
 class CustomsOptions:
     contents: str  # Might change to ENUM
     non_delivery: str  # Might change to ENUM
@@ -254,66 +647,47 @@ class CustomsOptions:
     country_of_origin: Optional[str]
 
     def __post_init__(self):
-        valid_contents = (
-            "merchandise",
-            "documents",
-            "gift",
-            "returned_goods",
-            "sample",
-        )
-        if self.contents not in valid_contents:
-            return ValueError(f"contents must be one of {valid_contents}")
-
-        non_delivery_options = ("return_to_sender", "treat_as_abandoned")
-        if self.non_delivery not in non_delivery_options:
-            raise ValueError(f"non_delivery must be one of {non_delivery_options}")
+        check_choice("contents", self.contents, CUSTOMS_CONTENTS)
+        check_choice("non_delivery", self.non_delivery, NON_DELIVERY_OPTIONS)
 
 
-@dataclass
+@slotted_dataclass
 class DryIceWeight:
     value: int
     unit: str  # Might change to ENUM
 
     def __post_init__(self):
-        valid_units = ("pound", "ounce", "gram", "kilogram")
-        if self.unit not in valid_units:
-            raise ValueError(f"weight unit must be one of {valid_units}.")
+        check_choice("weight unit", self.unit, WEIGHT_UNITS)
 
 
-@dataclass
+@slotted_dataclass
 class PaymentAmount:
     currency: str  # Might change to ENUM
     amount: float
 
     def __post_init__(self):
-        valid_currencies = ("usd", "cad", "aud", "gbp", "eur", "nzd")
-        if self.currency not in valid_currencies:
-            raise ValueError(f"currency must be one of {valid_currencies}")
+        check_choice("currency", self.currency, CURRENCIES)
 
 
-@dataclass
+@slotted_dataclass
 class CollectOnDelivery:
     payment_type: str  # Might change to ENUM
     payment_amount: PaymentAmount
 
     def __post_init__(self):
-        valid_payment_types = ("any", "cash", "cash_equivalent", "none")
-        if self.payment_type not in valid_payment_types:
-            raise ValueError(f"payment_type must be one of {valid_payment_types}")
+        check_choice("payment_type", self.payment_type, PAYMENT_TYPES)
 
 
-@dataclass
+@slotted_dataclass
 class PackageWeight:
     value: float
     unit: str  # Might change to ENUM
 
     def __post_init__(self):
-        valid_units = ("pound", "ounce", "gram", "kilogram")
-        if self.unit not in valid_units:
-            raise ValueError(f"weight unit must be one of {valid_units}.")
+        check_choice("weight unit", self.unit, WEIGHT_UNITS)
 
 
-@dataclass
+@slotted_dataclass
 class PackageDimensions:
     unit: str
     length: float
@@ -321,25 +695,23 @@ class PackageDimensions:
     height: float
 
     def __post_init__(self):
-        valid_units = ("inch", "centimeter")
-        if self.unit not in valid_units:
-            raise ValueError(f"dimension unit must be one of {valid_units}.")
+        check_choice("dimension unit", self.unit, DIMENSION_UNITS)
 
 
-@dataclass
+@slotted_dataclass
 class PackageInsuredValue:
     currency: str
     amount: float
 
 
-@dataclass
+@slotted_dataclass
 class PackageLabelMessages:
     reference1: str
     reference2: str
     reference3: str
 
 
-@dataclass
+@slotted_dataclass
 class Package:
     weight: PackageWeight
     dimensions: Optional[PackageDimensions]
@@ -349,7 +721,7 @@ class Package:
     external_package_id: Optional[str] = None
 
 
-@dataclass
+@slotted_dataclass
 class AdvancedOptions:
     bill_to_account: Optional[str]
     bill_to_country_code: Optional[str]
@@ -368,7 +740,7 @@ class AdvancedOptions:
 
 
 # TODO: finish making the shipment class
-@dataclass
+@slotted_dataclass
 class Shipment:
     carrier_id: str
     service_code: str
@@ -388,16 +760,7 @@ class Shipment:
     packages: List[Package]
 
     def __post_init__(self):
-        confirmation_options = (
-            "none",
-            "delivery",
-            "signature",
-            "adult_signature",
-            "direct_signature",
-            "delivery_mailed",
-        )
-        if self.confirmation not in confirmation_options:
-            return ValueError(f"confirmation must be one of {confirmation_options}")
+        check_choice("confirmation", self.confirmation, CONFIRMATION_OPTIONS)
 
         # valid_order_sources = ("amazon_ca", "amazon_us", "brightpearl",
         #                        "channel_advisor", "cratejoy", "ebay",
@@ -409,12 +772,10 @@ class Shipment:
         #     raise ValueError(f"order_source_code must be one of {valid_order_sources}")
 
 
-# TODO: Finish learning the ways of the enum
-@unique
-class SupportedCurrencies(Enum):
-    usd = 1
-    cad = 2
-    aud = 3
-    gbp = 4
-    eur = 5
-    nzd = 6
+@slotted_dataclass
+class Order:
+    row_number: int
+    ship_to: ShipToAddress
+    packages: List[Package]
+    external_order_id: Optional[str] = None
+    address_validated: bool = False
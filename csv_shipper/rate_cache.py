@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import redis
+
+from csv_shipper.models import (
+    Package,
+    RateOptions,
+    ShipFromAddress,
+    ShipToAddress,
+)
+from csv_shipper.serializers import to_payload
+
+RATE_CACHE_TTL = int(os.getenv("RATE_CACHE_TTL", 15 * 60))
+RATE_CACHE_MAXSIZE = int(os.getenv("RATE_CACHE_MAXSIZE", 50000))
+
+
+def _normalize_postal_code(postal_code: str, country_code: str) -> str:
+    postal_code = (postal_code or "").strip().upper().replace(" ", "")
+    if country_code == "US":
+        # ZIP+4 does not change the quote, only the 5 digit ZIP does.
+        return postal_code[:5]
+    return postal_code
+
+
+def rate_cache_key(
+        ship_from_address: ShipFromAddress,
+        ship_to_address: ShipToAddress,
+        packages: List[Package],
+        rate_opt: RateOptions,
+) -> str:
+    """
+    Builds a canonical hash for a rate quote. Only the parts of the shipment
+    that change the price take part: the full origin, the destination
+    postal/country (plus the residential flag, which carriers surcharge),
+    the package weights and dimensions and the rate options.
+
+    Returns:
+        A hex sha256 digest.
+    """
+    country_code = (ship_to_address.country_code or "").strip().upper()
+    canonical = {
+        "from": to_payload(ship_from_address),
+        "to": {
+            "postal_code": _normalize_postal_code(
+                    ship_to_address.postal_code, country_code
+            ),
+            "country_code": country_code,
+            "residential": ship_to_address.address_residential_indicator,
+        },
+        "packages": [
+            {
+                "weight": to_payload(package.weight),
+                "dimensions": to_payload(package.dimensions),
+            }
+            for package in packages
+        ],
+        "rate_options": to_payload(rate_opt),
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+# The fields of a rate that describe its price and service. Everything else,
+# most of all rate_id and shipment_id, belongs to the one shipment that was
+# quoted and must not be handed out for another.
+RATE_PRICE_FIELDS = (
+    "rate_type",
+    "carrier_id",
+    "carrier_code",
+    "carrier_nickname",
+    "carrier_friendly_name",
+    "service_type",
+    "service_code",
+    "package_type",
+    "shipping_amount",
+    "insurance_amount",
+    "confirmation_amount",
+    "other_amount",
+    "tax_amount",
+    "zone",
+    "delivery_days",
+    "estimated_delivery_date",
+    "carrier_delivery_days",
+    "guaranteed_service",
+    "trackable",
+    "validation_status",
+    "warning_messages",
+    "error_messages",
+)
+
+
+def price_quote(resp: dict) -> dict:
+    """
+    The part of a POST /rates response that may be cached and shared
+    between shipments: the price fields of every rate, without rate_id,
+    shipment_id or the quoted addresses. Rates read from the cache can
+    therefore only be compared, never bought.
+    """
+    rate_response = resp.get("rate_response") or {}
+    return {
+        "rate_response": {
+            "status": rate_response.get("status"),
+            "rates": [
+                {field: rate[field] for field in RATE_PRICE_FIELDS if field in rate}
+                for rate in rate_response.get("rates") or []
+            ],
+        }
+    }
+
+
+def is_cacheable(resp: dict) -> bool:
+    """
+    Whether a POST /rates response is a complete quote that may be shared:
+    it has rates, and neither it nor a carrier reported errors. A failed,
+    partial or empty quote is asked for again next time.
+    """
+    rate_response = resp.get("rate_response") or {}
+    return (
+        rate_response.get("status") == "completed"
+        and not rate_response.get("errors")
+        and bool(rate_response.get("rates"))
+    )
+
+
+class MemoryRateCache:
+    """
+    An in-process LRU cache whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int = RATE_CACHE_MAXSIZE, ttl: int = RATE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisRateCache:
+    """
+    A rate cache shared by every worker through Redis. Entries expire after
+    `ttl` seconds; LRU eviction is left to the server, which should run with
+    `maxmemory-policy allkeys-lru` (or `volatile-lru`).
+    """
+
+    def __init__(self, client, ttl: int = RATE_CACHE_TTL, prefix: str = "rates:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs):
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key: str) -> Optional[dict]:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: dict):
+        self.client.setex(self.prefix + key, self.ttl, json.dumps(value))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+def rate_cache_from_env():
+    """
+    Returns a RedisRateCache when REDIS_URL is set, otherwise an in-process
+    MemoryRateCache.
+    """
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        return RedisRateCache.from_url(redis_url)
+    return MemoryRateCache()
@@ -0,0 +1,213 @@
+import dataclasses
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from csv_shipper.concurrency import ShipEngineExecutor
+from csv_shipper.csv_reader import batched
+from csv_shipper.models import Order, RateOptions, ShipFromAddress
+from csv_shipper.se_errors import ShipEngineError
+
+CHEAPEST = "cheapest"
+FASTEST = "fastest"
+
+_AMOUNT_FIELDS = (
+    "shipping_amount",
+    "insurance_amount",
+    "confirmation_amount",
+    "other_amount",
+)
+
+
+@dataclass
+class ShoppingRules:
+    """
+    How a rate is picked for each shipment.
+
+    Args:
+        strategy (str): "cheapest" sorts by total price then transit days,
+            "fastest" sorts by transit days then total price.
+        max_delivery_days (int): Ignore rates slower than this.
+        max_amount (float): Ignore rates that cost more than this.
+        service_codes (List[str]): Only consider these services.
+    """
+
+    strategy: str = CHEAPEST
+    max_delivery_days: Optional[int] = None
+    max_amount: Optional[float] = None
+    service_codes: Optional[List[str]] = None
+
+    def __post_init__(self):
+        if self.strategy not in (CHEAPEST, FASTEST):
+            raise ValueError(f"strategy must be one of {(CHEAPEST, FASTEST)}")
+
+
+def rate_total(rate: dict) -> float:
+    return sum((rate.get(field) or {}).get("amount", 0) for field in _AMOUNT_FIELDS)
+
+
+def pick_rate(rates: Iterable[dict], rules: ShoppingRules) -> Optional[dict]:
+    """Returns the best rate under `rules`, or None when none qualifies."""
+    candidates = []
+    for rate in rates:
+        if rate.get("validation_status") == "invalid" or rate.get("error_messages"):
+            continue
+        if rules.service_codes and rate.get("service_code") not in rules.service_codes:
+            continue
+
+        total = rate_total(rate)
+        days = rate.get("delivery_days")
+        if rules.max_amount is not None and total > rules.max_amount:
+            continue
+        if rules.max_delivery_days is not None and (
+            days is None or days > rules.max_delivery_days
+        ):
+            continue
+
+        days = days if days is not None else float("inf")
+        key = (total, days) if rules.strategy == CHEAPEST else (days, total)
+        candidates.append((key, rate))
+
+    if not candidates:
+        return None
+    return min(candidates, key=lambda candidate: candidate[0])[1]
+
+
+class RateShopper:
+    """
+    Quotes every shipment of a batch against several carriers at once and
+    buys the label for the rate the rules pick.
+
+    Each (shipment, carrier) pair is its own POST /rates call on the shared
+    executor, so a batch is decided in roughly the time of its slowest quote
+    instead of one round trip per shipment and carrier. The winning labels
+    are then bought in parallel through get_label_by_id. When a winner was
+    answered by the client's rate cache, its carrier and service are quoted
+    once more for the order's own shipment before buying.
+
+    Args:
+        se (ShipEngine): The client used for rates and labels.
+        rules (ShoppingRules): How to choose between rates.
+        executor (ShipEngineExecutor): The bounded worker pool to fan out on.
+        batch_size (int): Shipments decided together.
+        store (ShipmentStore): When given, every quote is persisted to it.
+    """
+
+    def __init__(
+            self,
+            se,
+            rules: ShoppingRules = None,
+            executor: ShipEngineExecutor = None,
+            batch_size: int = 50,
+            store=None,
+    ):
+        self.se = se
+        self.rules = rules or ShoppingRules()
+        self.executor = executor or ShipEngineExecutor()
+        self.batch_size = batch_size
+        self.store = store
+
+    def _quotes(self, ship_from_address, orders: List[Order], rate_opt: RateOptions):
+        requests = [
+            (order, dataclasses.replace(rate_opt, carrier_ids=[carrier_id]))
+            for order in orders
+            for carrier_id in rate_opt.carrier_ids
+        ]
+
+        def quote(request):
+            order, options = request
+            return self.se.get_rates_for_shipment(
+                order.ship_to, ship_from_address, order.packages, options
+            )
+
+        rates = {id(order): [] for order in orders}
+        errors = {id(order): [] for order in orders}
+        for (order, _), resp in zip(requests, self.executor.map(quote, requests)):
+            if isinstance(resp, ShipEngineError):
+                errors[id(order)].extend(resp.messages)
+            else:
+                rates[id(order)].extend(resp["rate_response"].get("rates") or [])
+        if self.store is not None:
+            for quotes in rates.values():
+                # Cached quotes carry no rate_id, only fresh ones are stored.
+                self.store.add_rates(rate for rate in quotes if rate.get("rate_id"))
+        return rates, errors
+
+    def _requote(
+            self,
+            ship_from_address: ShipFromAddress,
+            orders: List[Order],
+            chosen: List[Optional[dict]],
+            rate_opt: RateOptions,
+            errors: dict,
+    ) -> List[Optional[dict]]:
+        """
+        Replaces winners that came from the rate cache with a fresh quote of
+        the same carrier and service for the order's own shipment. Cached
+        rates are only prices, buying needs a rate_id of this shipment.
+        """
+        stale = [
+            (index, order, rate)
+            for index, (order, rate) in enumerate(zip(orders, chosen))
+            if rate is not None and not rate.get("rate_id")
+        ]
+        if not stale:
+            return chosen
+
+        def quote(item):
+            _, order, rate = item
+            options = dataclasses.replace(
+                rate_opt, carrier_ids=[rate["carrier_id"]], service_codes=[rate["service_code"]]
+            )
+            return self.se.get_rates_for_shipment(
+                order.ship_to, ship_from_address, order.packages, options, use_cache=False
+            )
+
+        chosen = list(chosen)
+        for (index, order, rate), resp in zip(stale, self.executor.map(quote, stale)):
+            if isinstance(resp, ShipEngineError):
+                errors[id(order)].extend(resp.messages)
+                chosen[index] = None
+                continue
+            fresh = [
+                candidate
+                for candidate in resp["rate_response"].get("rates") or []
+                if candidate.get("service_code") == rate["service_code"]
+            ]
+            if self.store is not None:
+                self.store.add_rates(fresh)
+            chosen[index] = pick_rate(fresh, self.rules)
+            if chosen[index] is None:
+                errors[id(order)].append(f"{rate['service_code']} is no longer available")
+        return chosen
+
+    def shop(
+            self,
+            ship_from_address: ShipFromAddress,
+            orders: Iterable[Order],
+            rate_opt: RateOptions,
+    ) -> Iterator[Tuple[Order, Optional[dict], object]]:
+        """
+        Args:
+            ship_from_address (ShipFromAddress): The origin for every order.
+            orders (Iterable[Order]): The orders to ship.
+            rate_opt (RateOptions): The carrier_ids and service_codes to
+                shop across.
+
+        Returns:
+            A generator of (order, chosen rate, label response) tuples in
+            input order. When no rate qualifies the rate is None and the
+            label response is the list of quote errors.
+        """
+        for batch in batched(orders, self.batch_size):
+            rates, errors = self._quotes(ship_from_address, batch, rate_opt)
+            chosen = [pick_rate(rates[id(order)], self.rules) for order in batch]
+            chosen = self._requote(ship_from_address, batch, chosen, rate_opt, errors)
+
+            purchases = [rate["rate_id"] for rate in chosen if rate is not None]
+            labels = iter(self.executor.map(self.se.get_label_by_id, purchases))
+
+            for order, rate in zip(batch, chosen):
+                if rate is None:
+                    yield order, None, errors[id(order)] or ["No rate matched the rules"]
+                else:
+                    yield order, rate, next(labels)
@@ -0,0 +1,184 @@
+import os
+import time
+from typing import List
+
+import httpx
+
+from csv_shipper.models import (
+    AdvancedOptions,
+    CustomsOptions,
+    Package,
+    RateOptions,
+    ShipFromAddress,
+    ShipToAddress,
+)
+from csv_shipper.se_client import ShipEngineBase, log_response
+from csv_shipper.se_errors import (
+    ShipEngineConnectionError,
+    ShipEngineResponseError,
+    ShipEngineTimeoutError,
+    body_from_response,
+    error_from_response,
+)
+from csv_shipper.se_metrics import ApiMetrics, api_metrics
+from csv_shipper.se_retry import CircuitBreaker, endpoint_key
+from csv_shipper.se_transport import DEFAULT_CONFIG, TransportConfig
+
+try:
+    import h2  # noqa: F401  (only needed to negotiate HTTP/2)
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+MAX_CONNECTIONS = int(os.getenv("SHIPENGINE_ASYNC_MAX_CONNECTIONS", 100))
+KEEPALIVE_EXPIRY = float(os.getenv("SHIPENGINE_ASYNC_KEEPALIVE_EXPIRY", 30))
+
+
+class AsyncShipEngine(ShipEngineBase):
+    """
+    An asyncio twin of se_client.ShipEngine. All requests share one pooled
+    httpx.AsyncClient that keeps connections alive and speaks HTTP/2 when the
+    `h2` package is installed, so thousands of calls can be in flight on a
+    single event loop.
+
+    Usage:
+        async with AsyncShipEngine() as se:
+            labels = await asyncio.gather(*(se.create_label(...) for ...))
+    """
+
+    def __init__(
+            self,
+            *args,
+            client: httpx.AsyncClient = None,
+            transport_config: TransportConfig = DEFAULT_CONFIG,
+            breaker: CircuitBreaker = None,
+            metrics: ApiMetrics = api_metrics,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics
+        self.client = client or httpx.AsyncClient(
+                base_url=self._BASE_URL,
+                headers={"API-Key": self.api_key or ""},
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(
+                        transport_config.read_timeout,
+                        connect=transport_config.connect_timeout,
+                ),
+                limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=transport_config.pool_maxsize,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def request(self, method: str, endpoint: str, *args, **kwargs):
+        """Raises the same ShipEngineError subclasses as ShipEngine.request."""
+        trial = self.breaker.before(method, endpoint)
+        try:
+            return await self._attempt(method, endpoint, *args, **kwargs)
+        finally:
+            if trial:
+                self.breaker.release(method, endpoint)
+
+    async def _attempt(self, method: str, endpoint: str, *args, **kwargs):
+        key = endpoint_key(method, endpoint)
+        self.metrics.start(key)
+        started = time.perf_counter()
+        try:
+            resp = await self.client.request(method, endpoint.strip("/"), *args, **kwargs)
+        except httpx.TimeoutException as e:
+            error = ShipEngineTimeoutError(
+                    str(e),
+                    method=method,
+                    endpoint=endpoint,
+                    sent=not isinstance(e, (httpx.ConnectTimeout, httpx.PoolTimeout)),
+            )
+        except httpx.TransportError as e:
+            error = ShipEngineConnectionError(
+                    str(e),
+                    method=method,
+                    endpoint=endpoint,
+                    sent=not isinstance(e, httpx.ConnectError),
+            )
+        else:
+            self.metrics.finish(
+                    key,
+                    str(resp.status_code),
+                    time.perf_counter() - started,
+                    bytes_out=len(resp.request.content),
+                    bytes_in=len(resp.content),
+            )
+            if resp.status_code >= 400:
+                error = error_from_response(method, endpoint, resp)
+            else:
+                try:
+                    body = body_from_response(method, endpoint, resp)
+                except ShipEngineResponseError as e:
+                    error = e
+                else:
+                    log_response(method, endpoint, resp.status_code, body)
+                    self.breaker.success(method, endpoint)
+                    return body
+
+        if error.status_code is None:
+            self.metrics.finish(key, type(error).__name__, time.perf_counter() - started)
+        log_response(method, endpoint, error.status_code, error.messages)
+        self.breaker.failure(error)
+        raise error
+
+    async def get(self, endpoint, *args, **kwargs):
+        return await self.request("GET", endpoint, *args, **kwargs)
+
+    async def post(self, endpoint, *args, **kwargs):
+        return await self.request("POST", endpoint, *args, **kwargs)
+
+    async def delete(self, endpoint, *args, **kwargs):
+        return await self.request("DELETE", endpoint, *args, **kwargs)
+
+    async def create_shipment(
+            self,
+            ship_to_address: ShipToAddress,
+            ship_from_address: ShipFromAddress,
+            packages: List[Package],
+            customs: CustomsOptions = None,
+            advanced_opt: AdvancedOptions = None
+    ):
+        shipment = self.shipment_template(ship_from_address).payload(
+                ship_to_address, packages, customs=customs, advanced_options=advanced_opt
+        )
+        request = { "shipments": [shipment] }
+        return await self.post("shipments", json=request)
+
+    async def get_rates(self, shipment_id: str, rate_opt: RateOptions):
+        return await self.post(
+                "rates", json=self._rates_payload(shipment_id, rate_opt)
+        )
+
+    async def get_label_by_id(self, rate_id: str):
+        return await self.post(f"/labels/rates/{rate_id}")
+
+    async def create_label(
+            self,
+            ship_to_address: ShipToAddress,
+            ship_from_address: ShipFromAddress,
+            packages: List[Package],
+            customs: CustomsOptions = None,
+            advanced_opt: AdvancedOptions = None,
+    ):
+        shipment = self.shipment_template(ship_from_address).payload(
+                ship_to_address, packages, customs=customs, advanced_options=advanced_opt
+        )
+        request = { "shipment": shipment }
+        return await self.post("labels", json=request)
@@ -1,79 +1,267 @@
-import dataclasses
 import datetime
-import json
 import logging
 import os
-import pprint as p
-from typing import List
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-import requests
 from dotenv import load_dotenv
-from requests import HTTPError
-from requests.auth import AuthBase
+import requests
+from urllib3.exceptions import NewConnectionError
 
+from csv_shipper.csv_reader import batched
 from csv_shipper.models import (
     ShipFromAddress,
     ShipToAddress,
     Package,
-    PackageWeight,
-    PackageDimensions,
     CustomsOptions,
-    Shipment,
     AdvancedOptions,
     RateOptions,
+    Order,
 )
+from csv_shipper.rate_cache import is_cacheable, price_quote, rate_cache_key
+from csv_shipper.se_errors import (
+    ShipEngineConnectionError,
+    ShipEngineError,
+    ShipEngineResponseError,
+    ShipEngineTimeoutError,
+    body_from_response,
+    error_from_response,
+)
+from csv_shipper.se_metrics import ApiMetrics, api_metrics
+from csv_shipper.se_retry import CircuitBreaker, RetryPolicy, endpoint_key
+from csv_shipper.serializers import to_payload
+from csv_shipper.shipment_template import ShipmentTemplate
+from csv_shipper.se_transport import DEFAULT_CONFIG, TransportConfig, get_session
 
 load_dotenv()
 
-logging.basicConfig(level=logging.DEBUG)
+log = logging.getLogger(__name__)
+
+# Longest string logged as is, label responses can embed base64 documents.
+LOG_FIELD_LIMIT = 200
 
 dt = datetime.datetime.now()
 
 
-class ShipEngineAuth(AuthBase):
-    def __init__(self, api_key):
-        self.api_key = api_key
+def _truncate(value):
+    if isinstance(value, str) and len(value) > LOG_FIELD_LIMIT:
+        return f"{value[:LOG_FIELD_LIMIT]}... ({len(value)} chars)"
+    if isinstance(value, dict):
+        return {key: _truncate(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_truncate(item) for item in value]
+    return value
+
 
-    def __call__(self, request):
-        request.headers["API-Key"] = self.api_key
-        return request
+def log_response(method: str, endpoint: str, status_code: int, body):
+    """
+    Debug logs a response. The message is only built when debug logging is
+    on, and long strings are shortened.
+    """
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("%s %s -> %s %s", method, endpoint, status_code, _truncate(body))
 
 
-class ShipEngine:
-    _BASE_URL = "https://api.shipengine.com/v1/"
+class ShipEngineBase:
+    """
+    Payload building shared by the synchronous and asyncio ShipEngine clients.
+    """
+
+    # Overridden to point at csv_shipper.simulator for load tests.
+    _BASE_URL = os.getenv("SHIPENGINE_BASE_URL", "https://api.shipengine.com/v1/")
     _CURRENT_DATE = dt.strftime("%m/%d/%Y")
 
     def __init__(
             self,
             api_key: str = os.getenv("SHIPENGINE_API_KEY"),
             carrier_id: str = os.getenv("UPS_CARRIER-ID"),
+            shipment_batch_size: int = int(os.getenv("SHIPMENT_BATCH_SIZE", 100)),
+            service_code: str = os.getenv("SERVICE_CODE", "ups_next_day_air"),
     ):
         self.api_key = api_key
         self.carrier_id = carrier_id
-        self.session = requests.Session()
+        self.shipment_batch_size = shipment_batch_size
+        self.service_code = service_code
+        self._template = None
+
+    def shipment_template(self, ship_from_address: ShipFromAddress) -> ShipmentTemplate:
+        """
+        The ShipmentTemplate of this client's carrier and service for
+        `ship_from_address`. It is built on first use and kept for as long as
+        the same address object is passed in, i.e. for every row of a run.
+        """
+        template = self._template
+        if template is None or template.ship_from is not ship_from_address:
+            template = self._template = ShipmentTemplate(
+                    self.carrier_id, self.service_code, ship_from_address, self._CURRENT_DATE
+            )
+        return template
+
+    def _shipments_payload(self, ship_from_address, orders: List[Order]) -> dict:
+        template = self.shipment_template(ship_from_address)
+        return {
+            "shipments": [
+                template.payload(
+                        order.ship_to,
+                        order.packages,
+                        external_order_id=order.external_order_id,
+                        validate_address="no_validation"
+                        if order.address_validated
+                        else "validate_and_clean",
+                )
+                for order in orders
+            ]
+        }
+
+    @staticmethod
+    def _split_shipment_results(orders: List[Order], resp):
+        if isinstance(resp, ShipEngineError):
+            # The whole request failed, every order in it shares the error.
+            for order in orders:
+                yield order, None, resp.messages
+            return
+
+        shipments = resp.get("shipments") or []
+        for order, shipment in zip(orders, _match_shipments(orders, shipments)):
+            if shipment is None:
+                yield order, None, [
+                    f"ShipEngine returned {len(shipments)} shipments for {len(orders)} "
+                    f"orders and none for row {order.row_number}"
+                ]
+                continue
+            errors = [err["message"] for err in shipment.get("errors") or []]
+            yield order, shipment, errors
+
+    @staticmethod
+    def _rates_payload(shipment_id: str, rate_opt: RateOptions) -> dict:
+        return {
+            "shipment_id":  shipment_id,
+            "rate_options": to_payload(rate_opt),
+        }
+
+
+def _match_shipments(orders: List[Order], shipments: List[dict]) -> List[Optional[dict]]:
+    """
+    The shipment ShipEngine returned for each order, None for the orders it
+    returned none for. ShipEngine answers in the order the shipments were
+    sent, so positions are trusted as long as every order got a shipment
+    and the external_order_ids agree. Otherwise only a shipment carrying
+    the order's external_order_id is its own.
+    """
+    if len(shipments) == len(orders) and all(
+        order.external_order_id is None
+        or shipment.get("external_order_id") == order.external_order_id
+        for order, shipment in zip(orders, shipments)
+    ):
+        return shipments
+
+    by_order_id = {
+        shipment["external_order_id"]: shipment
+        for shipment in shipments
+        if shipment.get("external_order_id")
+    }
+    return [
+        by_order_id.get(order.external_order_id) if order.external_order_id else None
+        for order in orders
+    ]
+
+
+def _connection_error(method: str, endpoint: str, exc: requests.RequestException):
+    """Wraps a requests timeout or connection failure in a ShipEngineError."""
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    sent = not (
+        isinstance(exc, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+    )
+    error_class = (
+        ShipEngineTimeoutError if isinstance(exc, requests.Timeout) else ShipEngineConnectionError
+    )
+    return error_class(str(exc), method=method, endpoint=endpoint, sent=sent)
+
+
+class ShipEngine(ShipEngineBase):
+    """
+    The synchronous ShipEngine client. Failed calls raise a ShipEngineError
+    subclass, see csv_shipper.se_errors.
+
+    Args:
+        transport_config (TransportConfig): Timeouts and connection pooling.
+        rate_cache: Optional MemoryRateCache or RedisRateCache for quotes.
+        breaker (CircuitBreaker): Fails calls to an endpoint fast while it
+            is down, one per client by default.
+        retry_policy (RetryPolicy): Retries failed calls inside request().
+            Off by default, ShipEngineExecutor retries on its own so the
+            retries share its rate limiter.
+        metrics (ApiMetrics): Where latency, status and byte counts of every
+            call are recorded, the process-wide api_metrics by default.
+    """
+
+    def __init__(
+            self,
+            *args,
+            transport_config: TransportConfig = DEFAULT_CONFIG,
+            rate_cache=None,
+            breaker: CircuitBreaker = None,
+            retry_policy: RetryPolicy = None,
+            metrics: ApiMetrics = api_metrics,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.transport_config = transport_config
+        self.rate_cache = rate_cache
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_policy = retry_policy
+        self.metrics = metrics
+        # Shared per API key, the API-Key header is already set on the session.
+        self.session = get_session(self.api_key, transport_config)
 
     def request(self, method: str, endpoint: str, *args, **kwargs):
-        kwargs["auth"] = ShipEngineAuth(self.api_key)
+        if self.retry_policy is not None:
+            return self.retry_policy.call(self._send, method, endpoint, *args, **kwargs)
+        return self._send(method, endpoint, *args, **kwargs)
 
+    def _send(self, method: str, endpoint: str, *args, **kwargs):
+        kwargs.setdefault("timeout", self.transport_config.timeout)
+        trial = self.breaker.before(method, endpoint)
+        try:
+            return self._attempt(method, endpoint, *args, **kwargs)
+        finally:
+            if trial:
+                self.breaker.release(method, endpoint)
+
+    def _attempt(self, method: str, endpoint: str, *args, **kwargs):
+        key = endpoint_key(method, endpoint)
+        self.metrics.start(key)
+        started = time.perf_counter()
         try:
             resp = self.session.request(
                     method, self._BASE_URL + endpoint.strip("/"), *args, **kwargs
             )
-            resp.raise_for_status()
-            logging.debug(json.dumps(resp.json(), indent=4))  # logs the response from ShipEngineAuth
-            return resp.json()
-        except HTTPError as e:
-            error_obj = [err["message"] for err in e.response.json()["errors"]]
-            logging.debug(
-                    f"Request Failed: {resp.status_code} | e: {e}\n\n ERROR: {json.dumps(error_obj, indent=4)}\n"
+        except requests.RequestException as e:
+            error = _connection_error(method, endpoint, e)
+            self.metrics.finish(key, type(error).__name__, time.perf_counter() - started)
+        else:
+            self.metrics.finish(
+                    key,
+                    str(resp.status_code),
+                    time.perf_counter() - started,
+                    bytes_out=len(resp.request.body or b""),
+                    bytes_in=len(resp.content),
             )
-            return e, error_obj
-        # The below will run after testing the above
-        # resp = self.session.request(
-        #     method, self._BASE_URL + endpoint.strip("/"), *args, **kwargs
-        # )
-        # resp.raise_for_status()
-        # return resp.json()
+            if resp.status_code >= 400:
+                error = error_from_response(method, endpoint, resp)
+            else:
+                try:
+                    body = body_from_response(method, endpoint, resp)
+                except ShipEngineResponseError as e:
+                    error = e
+                else:
+                    log_response(method, endpoint, resp.status_code, body)
+                    self.breaker.success(method, endpoint)
+                    return body
+
+        log_response(method, endpoint, error.status_code, error.messages)
+        self.breaker.failure(error)
+        raise error
 
     def get(self, endpoint, *args, **kwargs):
         return self.request("GET", endpoint, *args, **kwargs)
@@ -94,47 +282,105 @@ class ShipEngine:
             packages: List[Package],
             customs: CustomsOptions = None,
             advanced_opt: AdvancedOptions = None
-            # shipments: List[Shipment]
     ):
-        shipment = Shipment(
-                carrier_id=self.carrier_id,
-                service_code="ups_next_day_air",
-                validate_address="validate_and_clean",
-                external_shipment_id=None,
-                external_order_id=None,
-                items=None,
-                ship_date=self._CURRENT_DATE,
-                ship_to=dataclasses.asdict(ship_to_address),
-                ship_from=dataclasses.asdict(ship_from_address),
-                warehouse_id=None,
-                return_to=None,
-                confirmation="delivery",
-                customs=customs,
-                advanced_options=advanced_opt,
-                insurance_provider="none",
-                packages=[dataclasses.asdict(package) for package in packages],
+        shipment = self.shipment_template(ship_from_address).payload(
+                ship_to_address, packages, customs=customs, advanced_options=advanced_opt
         )
+        request = { "shipments": [shipment] }
+        return self.post("shipments", json=request)
 
-        if advanced_opt is not None:
-            shipment.advanced_options = dataclasses.asdict(advanced_opt)
+    def create_shipments(
+            self,
+            ship_from_address: ShipFromAddress,
+            orders: Iterable[Order],
+            batch_size: int = None,
+            address_validator=None,
+    ) -> Iterator[Tuple[Order, Optional[dict], List[str]]]:
+        """
+        Creates shipments in bulk, packing up to `batch_size` of them into
+        each POST /shipments call.
 
-        if customs is not None:
-            shipment.customs = dataclasses.asdict(customs)
+        Args:
+            ship_from_address (ShipFromAddress): The origin for every order.
+            orders (Iterable[Order]): The orders to create shipments for.
+            batch_size (int): Shipments per request, defaults to the value
+                given to the constructor.
+            address_validator (AddressValidator): Optional pre-stage that
+                validates each unique recipient once, so verified orders
+                skip ShipEngine's inline validation.
 
-        # request = {"shipments": [dataclasses.asdict(shipment) for shipment in shipments]}
-        request = { "shipments": [dataclasses.asdict(shipment)] }
-        return self.post("shipments", json=request)
+        Returns:
+            A generator of (order, shipment, errors) tuples in input order.
+            `shipment` is None when the whole request failed, or ShipEngine
+            returned no shipment for the order.
+        """
+        for chunk in batched(orders, batch_size or self.shipment_batch_size):
+            if address_validator is not None:
+                chunk = address_validator.prepare(chunk)
+            try:
+                resp = self.post(
+                        "shipments", json=self._shipments_payload(ship_from_address, chunk)
+                )
+            except ShipEngineError as e:
+                resp = e
+            yield from self._split_shipment_results(chunk, resp)
+
+    def validate_addresses(self, addresses: List[ShipToAddress]):
+        return self.post(
+                "addresses/validate",
+                json=[to_payload(address) for address in addresses],
+        )
 
     def get_rates(self, shipment_id: str, rate_opt: RateOptions):
-        request = {
-            "shipment_id":  shipment_id,
-            "rate_options": dataclasses.asdict(rate_opt),
-        }
-        return self.post("rates", json=request)
+        return self.post("rates", json=self._rates_payload(shipment_id, rate_opt))
+
+    def get_rates_for_shipment(
+            self,
+            ship_to_address: ShipToAddress,
+            ship_from_address: ShipFromAddress,
+            packages: List[Package],
+            rate_opt: RateOptions,
+            use_cache: bool = True,
+    ):
+        """
+        Quotes rates for a shipment that has not been created yet. When the
+        client has a rate_cache, identical quotes (see rate_cache_key) are
+        answered from the cache instead of POST /rates.
+
+        The cache only holds price data (see price_quote) of complete
+        quotes (see is_cacheable), so cached rates have no rate_id and
+        cannot be bought. Pass use_cache=False for a quote of this very
+        shipment whose rates can be.
+        """
+        key = None
+        if self.rate_cache is not None:
+            key = rate_cache_key(ship_from_address, ship_to_address, packages, rate_opt)
+            cached = self.rate_cache.get(key) if use_cache else None
+            if cached is not None:
+                return cached
+
+        shipment = self.shipment_template(ship_from_address).payload(ship_to_address, packages)
+        # The carriers and services to quote come from the rate options.
+        shipment.pop("carrier_id", None)
+        shipment.pop("service_code", None)
+        resp = self.post(
+                "rates",
+                json={
+                    "shipment":     shipment,
+                    "rate_options": to_payload(rate_opt),
+                },
+        )
+
+        if key is not None and is_cacheable(resp):
+            self.rate_cache.set(key, price_quote(resp))
+        return resp
 
     def get_label_by_id(self, rate_id: str):
         return self.post(f"/labels/rates/{rate_id}")
 
+    def track_label(self, label_id: str):
+        return self.get(f"labels/{label_id}/track")
+
     def create_label(
             self,
             ship_to_address: ShipToAddress,
@@ -143,89 +389,8 @@ class ShipEngine:
             customs: CustomsOptions = None,
             advanced_opt: AdvancedOptions = None,
     ):
-
-        shipment = Shipment(
-                carrier_id=self.carrier_id,
-                service_code="ups_next_day_air",
-                validate_address="validate_and_clean",
-                external_shipment_id=None,
-                external_order_id=None,
-                items=None,
-                ship_date=self._CURRENT_DATE,
-                ship_to=dataclasses.asdict(ship_to_address),
-                ship_from=dataclasses.asdict(ship_from_address),
-                warehouse_id=None,
-                return_to=None,
-                confirmation="delivery",
-                customs=customs,
-                advanced_options=advanced_opt,
-                insurance_provider="none",
-                packages=[dataclasses.asdict(package) for package in packages],
+        shipment = self.shipment_template(ship_from_address).payload(
+                ship_to_address, packages, customs=customs, advanced_options=advanced_opt
         )
-
-        if advanced_opt is not None:
-            shipment.advanced_options = dataclasses.asdict(advanced_opt)
-
-        if customs is not None:
-            shipment.customs = dataclasses.asdict(customs)
-
-        request = { "shipment": dataclasses.asdict(shipment) }
+        request = { "shipment": shipment }
         return self.post("labels", json=request)
-
-
-# user_ship_from = ShipFromAddress(
-#         name="Monkey D. Luffy",
-#         phone="1-654-987-3124",
-#         company_name="The Grand Line",
-#         address_line1="3800 N Lamar Blvd",
-#         address_line2="Ste 220",
-#         address_line3=None,
-#         city_locality="Austin",
-#         state_province="TX",
-#         postal_code="78756",
-#         country_code="US",
-#         address_residential_indicator="no"
-# )
-#
-# curative_ship_to = ShipToAddress(
-#         name="Kasey Cantu",
-#         phone="1-789-456-1234",
-#         company_name="ShipEngine",
-#         address_line1="4009 Marathon Blvd",
-#         address_line2="Suite 100",
-#         address_line3=None,
-#         city_locality="Austin",
-#         state_province="TX",
-#         postal_code="78756",
-#         country_code="US",
-#         address_residential_indicator="no"
-# )
-#
-# weight = PackageWeight(
-#         value=2.5,
-#         unit="pound"
-# )
-#
-# dims = PackageDimensions(
-#         unit="inch",
-#         length=12.5,
-#         width=12.5,
-#         height=12.5
-# )
-#
-# package_1 = Package(
-#         weight=dataclasses.asdict(weight),
-#         dimensions=dataclasses.asdict(dims)
-# )
-#
-# # se = ShipEngine(api_key=os.getenv("SHIPENGINE_API_KEY"), carrier_id=os.getenv("UPS_CARRIER-ID"))
-#
-# se = ShipEngine()
-#
-# r = se.create_label(ship_to_address=curative_ship_to,
-#                     ship_from_address=user_ship_from,
-#                     packages=[package_1])
-#
-# # print(r["label_id"])
-# # p.pprint(r["shipments"][0]["shipment_id"])
-# # p.pprint(r)
@@ -0,0 +1,202 @@
+import datetime
+from email.utils import parsedate_to_datetime
+from typing import List, Optional
+
+
+def retry_after_seconds(resp) -> Optional[float]:
+    """
+    Reads the Retry-After header of a response, which may either be a number
+    of seconds or an HTTP date.
+    """
+    value = resp.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = datetime.datetime.now(retry_at.tzinfo)
+    return max((retry_at - now).total_seconds(), 0.0)
+
+
+class ShipEngineError(Exception):
+    """
+    A failed ShipEngine call.
+
+    Args:
+        message (str): What went wrong.
+        method (str): The HTTP method of the call.
+        endpoint (str): The endpoint that was called.
+        status_code (int): The HTTP status, None when no response arrived.
+        request_id (str): ShipEngine's id for the request, quote it to
+            support.
+        errors (List[dict]): The `errors` of ShipEngine's error body, each
+            with error_source, error_type, error_code and message.
+    """
+
+    #: Whether trying the same call again can succeed.
+    retryable = False
+
+    def __init__(
+            self,
+            message: str,
+            method: str = None,
+            endpoint: str = None,
+            status_code: int = None,
+            request_id: str = None,
+            errors: List[dict] = None,
+    ):
+        super().__init__(message)
+        self.message = message
+        self.method = method
+        self.endpoint = endpoint
+        self.status_code = status_code
+        self.request_id = request_id
+        self.errors = errors or []
+
+    @property
+    def messages(self) -> List[str]:
+        return [err.get("message") or str(err) for err in self.errors] or [self.message]
+
+    @property
+    def error_codes(self) -> List[str]:
+        return [err["error_code"] for err in self.errors if err.get("error_code")]
+
+    @property
+    def request_sent(self) -> bool:
+        """False only when the call surely never reached ShipEngine."""
+        return True
+
+    def __str__(self):
+        status = f" {self.status_code}" if self.status_code else ""
+        request_id = f" (request_id {self.request_id})" if self.request_id else ""
+        return f"{self.method} {self.endpoint}{status}: {'; '.join(self.messages)}{request_id}"
+
+
+class ShipEngineRequestError(ShipEngineError):
+    """A 4xx the request itself is to blame for, retrying will not help."""
+
+
+class ShipEngineAuthError(ShipEngineRequestError):
+    """401 or 403, the API key is missing, wrong or lacks permission."""
+
+
+class ShipEngineRateLimitError(ShipEngineError):
+    """429, ShipEngine rejected the call before processing it."""
+
+    retryable = True
+
+    def __init__(self, *args, retry_after: Optional[float] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_after = retry_after
+
+    @property
+    def request_sent(self) -> bool:
+        return False
+
+
+class ShipEngineServerError(ShipEngineError):
+    """A 5xx, usually transient."""
+
+    retryable = True
+
+
+class ShipEngineConnectionError(ShipEngineError):
+    """No response arrived, the connection failed or was dropped."""
+
+    retryable = True
+
+    def __init__(self, *args, sent: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sent = sent
+
+    @property
+    def request_sent(self) -> bool:
+        return self._sent
+
+
+class ShipEngineTimeoutError(ShipEngineConnectionError):
+    """Connecting, or waiting for the response, took too long."""
+
+
+class ShipEngineResponseError(ShipEngineError):
+    """
+    A response below 400 whose body is not JSON. ShipEngine did process the
+    call, so repeating it could act twice, it is not retried.
+    """
+
+
+class CircuitOpenError(ShipEngineError):
+    """
+    The endpoint failed too often recently, so the call was not even sent.
+    Retrying before the breaker's reset timeout only fails again.
+    """
+
+    @property
+    def request_sent(self) -> bool:
+        return False
+
+
+def _error_class(status_code: int):
+    if status_code == 429:
+        return ShipEngineRateLimitError
+    if status_code in (401, 403):
+        return ShipEngineAuthError
+    if status_code >= 500:
+        return ShipEngineServerError
+    return ShipEngineRequestError
+
+
+def error_from_response(method: str, endpoint: str, resp) -> ShipEngineError:
+    """
+    Builds the typed error for a failed `requests` or `httpx` response.
+    Bodies that are not ShipEngine's JSON error format, e.g. an HTML page
+    from a proxy, still produce an error carrying the status and a snippet.
+    """
+    try:
+        body = resp.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        body = {}
+
+    errors = [err for err in body.get("errors") or [] if isinstance(err, dict)]
+    if errors:
+        message = "; ".join(err.get("message", "") for err in errors)
+    else:
+        message = f"HTTP {resp.status_code}: {resp.text[:200]}"
+
+    kwargs = dict(
+        method=method,
+        endpoint=endpoint,
+        status_code=resp.status_code,
+        request_id=body.get("request_id"),
+        errors=errors,
+    )
+    error_class = _error_class(resp.status_code)
+    if error_class is ShipEngineRateLimitError:
+        kwargs["retry_after"] = retry_after_seconds(resp)
+    return error_class(message, **kwargs)
+
+
+def body_from_response(method: str, endpoint: str, resp) -> dict:
+    """
+    Decodes the JSON body of a successful `requests` or `httpx` response.
+    An empty body, e.g. of a 204, is {}. Raises ShipEngineResponseError for
+    a body that is not JSON.
+    """
+    if not resp.content:
+        return {}
+    try:
+        return resp.json()
+    except ValueError:
+        raise ShipEngineResponseError(
+                f"HTTP {resp.status_code}: response is not JSON: {resp.text[:200]}",
+                method=method,
+                endpoint=endpoint,
+                status_code=resp.status_code,
+        ) from None
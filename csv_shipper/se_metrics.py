@@ -0,0 +1,349 @@
+import json
+import os
+import threading
+from collections import Counter
+from typing import Iterable, List
+
+from csv_shipper.se_retry import RetryMetrics, retry_metrics
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_KEY = "csv_shipper:metrics:{}"
+METRICS_TTL = int(os.getenv("METRICS_TTL", 24 * 60 * 60))
+# Cumulative counters of every process, never expires so Prometheus never
+# sees a counter reset.
+METRICS_TOTALS_KEY = "csv_shipper:metrics:totals"
+
+
+class EndpointStats:
+    __slots__ = (
+        "status",
+        "buckets",
+        "sum",
+        "count",
+        "bytes_out",
+        "bytes_in",
+        "in_flight",
+        "max_in_flight",
+    )
+
+    def __init__(self):
+        self.status = Counter()
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "status": dict(self.status),
+            "buckets": list(self.buckets),
+            "sum": self.sum,
+            "count": self.count,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+        }
+
+
+class ApiMetrics(RetryMetrics):
+    """
+    Latency histograms, status counts, bytes in/out and in-flight calls
+    per ShipEngine endpoint, as recorded by the clients' request(). Also
+    takes the retry and circuit breaker events of se_retry, so a single
+    instance can watch a whole run.
+
+    snapshot() returns plain JSON-able dicts, which is how the numbers of
+    worker processes reach the web app's /metrics and the run summary.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._endpoints = {}
+
+    def _stats(self, endpoint: str) -> EndpointStats:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = EndpointStats()
+        return stats
+
+    def start(self, endpoint: str):
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+
+    def finish(
+            self,
+            endpoint: str,
+            status: str,
+            seconds: float,
+            bytes_out: int = 0,
+            bytes_in: int = 0,
+    ):
+        bucket = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound),
+            len(LATENCY_BUCKETS),
+        )
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.in_flight -= 1
+            stats.status[status] += 1
+            stats.buckets[bucket] += 1
+            stats.sum += seconds
+            stats.count += 1
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "endpoints": {
+                    endpoint: stats.to_dict() for endpoint, stats in self._endpoints.items()
+                },
+                "events": [[*key, count] for key, count in self._counts.items()],
+            }
+
+
+api_metrics = ApiMetrics()
+
+
+def local_snapshot() -> dict:
+    """This process's default metrics, with the default retry counters."""
+    snapshot = api_metrics.snapshot()
+    snapshot["events"].extend(
+        [*key, count] for key, count in retry_metrics.snapshot().items()
+    )
+    return snapshot
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    endpoints = {}
+    events = Counter()
+    for snapshot in snapshots:
+        for endpoint, stats in snapshot.get("endpoints", {}).items():
+            merged = endpoints.get(endpoint)
+            if merged is None:
+                endpoints[endpoint] = json.loads(json.dumps(stats))
+                continue
+            for status, count in stats["status"].items():
+                merged["status"][status] = merged["status"].get(status, 0) + count
+            merged["buckets"] = [a + b for a, b in zip(merged["buckets"], stats["buckets"])]
+            for field in ("sum", "count", "bytes_out", "bytes_in", "in_flight"):
+                merged[field] += stats[field]
+            merged["max_in_flight"] = max(merged["max_in_flight"], stats["max_in_flight"])
+        for event, endpoint, reason, count in snapshot.get("events", []):
+            events[(event, endpoint, reason)] += count
+    return {
+        "endpoints": endpoints,
+        "events": [[*key, count] for key, count in events.items()],
+    }
+
+
+def _quantile(stats: dict, q: float):
+    """The upper bound of the bucket holding the q-quantile, None past 30s."""
+    target = q * stats["count"]
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS, stats["buckets"]):
+        seen += count
+        if seen >= target:
+            return bound
+    return None
+
+
+def summarize(snapshot: dict) -> List[dict]:
+    """Per-endpoint totals of a run, slowest endpoint first."""
+    summary = []
+    for endpoint, stats in snapshot.get("endpoints", {}).items():
+        if not stats["count"]:
+            continue
+        errors = sum(
+            count for status, count in stats["status"].items() if not status.startswith(("2", "3"))
+        )
+        p50, p95 = _quantile(stats, 0.5), _quantile(stats, 0.95)
+        summary.append(
+            {
+                "endpoint": endpoint,
+                "calls": stats["count"],
+                "errors": errors,
+                "mean_ms": round(stats["sum"] / stats["count"] * 1000, 1),
+                "p50_ms_le": p50 * 1000 if p50 is not None else None,
+                "p95_ms_le": p95 * 1000 if p95 is not None else None,
+                "bytes_out": stats["bytes_out"],
+                "bytes_in": stats["bytes_in"],
+                "max_in_flight": stats["max_in_flight"],
+            }
+        )
+    summary.sort(key=lambda row: row["mean_ms"], reverse=True)
+    retries = Counter()
+    for event, endpoint, _, count in snapshot.get("events", []):
+        if event == "retry":
+            retries[endpoint] += count
+    for row in summary:
+        row["retries"] = retries.get(row["endpoint"], 0)
+    return summary
+
+
+def _counters(snapshot: dict) -> dict:
+    """The counters of a snapshot, flattened to {json field: value}."""
+    counters = {}
+    for endpoint, stats in snapshot.get("endpoints", {}).items():
+        for status, count in stats["status"].items():
+            counters[json.dumps(["status", endpoint, status])] = count
+        for bucket, count in enumerate(stats["buckets"]):
+            counters[json.dumps(["bucket", endpoint, bucket])] = count
+        for field in ("sum", "count", "bytes_out", "bytes_in"):
+            counters[json.dumps([field, endpoint])] = stats[field]
+    for event, endpoint, reason, count in snapshot.get("events", []):
+        counters[json.dumps(["event", event, endpoint, reason])] = count
+    return counters
+
+
+def _add_totals(pipe, snapshot: dict, previous: dict = None):
+    """Adds what `snapshot` counted since `previous` to the totals hash."""
+    before = _counters(previous or {})
+    for field, value in _counters(snapshot).items():
+        delta = value - before.get(field, 0)
+        if not delta:
+            continue
+        if isinstance(delta, float):
+            pipe.hincrbyfloat(METRICS_TOTALS_KEY, field, delta)
+        else:
+            pipe.hincrby(METRICS_TOTALS_KEY, field, delta)
+
+
+def publish(client, name: str, snapshot: dict, previous: dict = None):
+    """
+    Shares a process's snapshot through Redis: as is under `name` for the
+    run summary, and what it counted since the `previous` published
+    snapshot is added to the totals /metrics renders.
+    """
+    pipe = client.pipeline()
+    pipe.set(METRICS_KEY.format(name), json.dumps(snapshot), ex=METRICS_TTL)
+    _add_totals(pipe, snapshot, previous)
+    pipe.execute()
+
+
+_local_lock = threading.Lock()
+_local_published = None
+
+
+def publish_local(client):
+    """Adds what this process counted since its last call to the totals."""
+    global _local_published
+    with _local_lock:
+        snapshot = local_snapshot()
+        pipe = client.pipeline()
+        _add_totals(pipe, snapshot, _local_published)
+        pipe.execute()
+        _local_published = snapshot
+
+
+def totals(client) -> dict:
+    """
+    The cumulative counters of every process as one snapshot. Gauges are
+    not kept, in_flight and max_in_flight are always 0.
+    """
+    endpoints = {}
+    events = []
+    for field, value in client.hgetall(METRICS_TOTALS_KEY).items():
+        kind, *key = json.loads(field)
+        if kind == "event":
+            events.append([*key, int(value)])
+            continue
+        stats = endpoints.get(key[0])
+        if stats is None:
+            stats = endpoints[key[0]] = EndpointStats().to_dict()
+        if kind == "status":
+            stats["status"][key[1]] = int(value)
+        elif kind == "bucket":
+            stats["buckets"][key[1]] = int(value)
+        elif kind == "sum":
+            stats["sum"] = float(value)
+        else:
+            stats[kind] = int(value)
+    return {"endpoints": endpoints, "events": events}
+
+
+def collect(client, names: Iterable[str]) -> List[dict]:
+    """The published snapshots of `names`, those that expired are left out."""
+    keys = [METRICS_KEY.format(name) for name in names]
+    snapshots = []
+    for value in client.mget(keys) if keys else []:
+        if value is not None:
+            snapshots.append(json.loads(value))
+    return snapshots
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(snapshot: dict) -> str:
+    """Renders a snapshot in the Prometheus text exposition format."""
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    endpoints = sorted(snapshot.get("endpoints", {}).items())
+
+    metric("shipengine_requests_total", "counter", "ShipEngine API calls by endpoint and status.")
+    for endpoint, stats in endpoints:
+        for status, count in sorted(stats["status"].items()):
+            lines.append(
+                f'shipengine_requests_total{{endpoint="{_label(endpoint)}",'
+                f'status="{_label(status)}"}} {count}'
+            )
+
+    metric(
+        "shipengine_request_duration_seconds",
+        "histogram",
+        "ShipEngine API call latency by endpoint.",
+    )
+    for endpoint, stats in endpoints:
+        label = _label(endpoint)
+        cumulative = 0
+        for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), stats["buckets"]):
+            cumulative += count
+            lines.append(
+                f'shipengine_request_duration_seconds_bucket{{endpoint="{label}",'
+                f'le="{bound}"}} {cumulative}'
+            )
+        lines.append(
+            f'shipengine_request_duration_seconds_sum{{endpoint="{label}"}} {stats["sum"]}'
+        )
+        lines.append(
+            f'shipengine_request_duration_seconds_count{{endpoint="{label}"}} {stats["count"]}'
+        )
+
+    metric("shipengine_bytes_total", "counter", "Request and response body bytes by endpoint.")
+    for endpoint, stats in endpoints:
+        for direction in ("out", "in"):
+            lines.append(
+                f'shipengine_bytes_total{{endpoint="{_label(endpoint)}",'
+                f'direction="{direction}"}} {stats[f"bytes_{direction}"]}'
+            )
+
+    metric("shipengine_in_flight_requests", "gauge", "ShipEngine API calls in flight.")
+    for endpoint, stats in endpoints:
+        lines.append(
+            f'shipengine_in_flight_requests{{endpoint="{_label(endpoint)}"}} {stats["in_flight"]}'
+        )
+
+    metric(
+        "shipengine_retry_events_total",
+        "counter",
+        "Retries, give-ups and circuit breaker events by endpoint.",
+    )
+    for event, endpoint, reason, count in sorted(snapshot.get("events", [])):
+        lines.append(
+            f'shipengine_retry_events_total{{event="{_label(event)}",'
+            f'endpoint="{_label(endpoint)}",reason="{_label(reason)}"}} {count}'
+        )
+    return "\n".join(lines) + "\n"
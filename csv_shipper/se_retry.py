@@ -0,0 +1,201 @@
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable
+
+from csv_shipper.se_errors import (
+    CircuitOpenError,
+    ShipEngineError,
+    ShipEngineRateLimitError,
+)
+
+DEFAULT_MAX_RETRIES = int(os.getenv("SHIPENGINE_MAX_RETRIES", 5))
+RETRY_BASE_DELAY = float(os.getenv("SHIPENGINE_RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("SHIPENGINE_RETRY_MAX_DELAY", 30))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("SHIPENGINE_BREAKER_FAILURES", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("SHIPENGINE_BREAKER_RESET_TIMEOUT", 30))
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+_ID_SEGMENT = re.compile(r"^(se-\w+|\d+)$")
+
+
+def endpoint_key(method: str, endpoint: str) -> str:
+    """
+    Groups calls by route, e.g. "GET labels/{id}/track", so every label
+    shares one breaker and one set of counters.
+    """
+    segments = (
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in endpoint.strip("/").split("/")
+    )
+    return f"{method} {'/'.join(segments)}"
+
+
+class RetryMetrics:
+    """Thread-safe counters of calls, retries and give-ups per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def incr(self, event: str, endpoint: str = "", reason: str = ""):
+        with self._lock:
+            self._counts[(event, endpoint, reason)] += 1
+
+    def snapshot(self) -> dict:
+        """{(event, endpoint, reason): count}, e.g. ("retry", "POST labels", "429")."""
+        with self._lock:
+            return dict(self._counts)
+
+
+retry_metrics = RetryMetrics()
+
+
+def _reason(error: ShipEngineError) -> str:
+    if error.status_code is not None:
+        return str(error.status_code)
+    return type(error).__name__
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed ShipEngine call is tried again:
+    exponential backoff with full jitter, capped at `max_delay`, or the
+    Retry-After of a 429.
+
+    Only retryable errors are retried (429, 5xx, connection errors and
+    timeouts). Calls that may have reached ShipEngine are only repeated for
+    idempotent methods, so a POST /labels that timed out is never sent
+    twice and no label is bought twice.
+
+    Args:
+        max_retries (int): Retries after the first attempt.
+        base_delay (float): Backoff of the first retry, in seconds.
+        max_delay (float): Longest backoff between two attempts.
+        metrics (RetryMetrics): Where retries and give-ups are counted.
+    """
+
+    def __init__(
+            self,
+            max_retries: int = DEFAULT_MAX_RETRIES,
+            base_delay: float = RETRY_BASE_DELAY,
+            max_delay: float = RETRY_MAX_DELAY,
+            metrics: RetryMetrics = retry_metrics,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = metrics
+
+    def should_retry(self, error: ShipEngineError, attempt: int) -> bool:
+        if attempt >= self.max_retries or not error.retryable:
+            return False
+        return not error.request_sent or (error.method or "").upper() in IDEMPOTENT_METHODS
+
+    def delay(self, error: ShipEngineError, attempt: int) -> float:
+        if isinstance(error, ShipEngineRateLimitError) and error.retry_after is not None:
+            return error.retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def record(self, error: ShipEngineError, retried: bool):
+        key = endpoint_key(error.method or "", error.endpoint or "")
+        self.metrics.incr("retry" if retried else "give_up", key, _reason(error))
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Calls `fn` until it succeeds or the policy gives up, then raises."""
+        attempt = 0
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except ShipEngineError as e:
+                retry = self.should_retry(e, attempt)
+                self.record(e, retry)
+                if not retry:
+                    raise
+                time.sleep(self.delay(e, attempt))
+                attempt += 1
+
+
+class CircuitBreaker:
+    """
+    One breaker per endpoint. After `failure_threshold` consecutive
+    retryable failures an endpoint is open and calls to it fail at once
+    with CircuitOpenError for `reset_timeout` seconds. Then a single trial
+    call is let through, its success closes the breaker again.
+
+    Any response below 500, a 400 or a 429 included, shows ShipEngine is up
+    and counts as a success. Whatever the outcome, a finished trial call
+    always frees the trial slot, so the breaker never stays stuck open.
+    """
+
+    def __init__(
+            self,
+            failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+            reset_timeout: float = BREAKER_RESET_TIMEOUT,
+            metrics: RetryMetrics = retry_metrics,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._failures = Counter()
+        self._opened_at = {}
+        self._trial = set()
+
+    def before(self, method: str, endpoint: str) -> bool:
+        """
+        Raises CircuitOpenError when `endpoint` is open. Returns True when
+        the call is the trial call, the caller must then `release` it once
+        the call ended, however it ended.
+        """
+        key = endpoint_key(method, endpoint)
+        with self._lock:
+            opened_at = self._opened_at.get(key)
+            if opened_at is None:
+                return False
+            if time.monotonic() - opened_at >= self.reset_timeout and key not in self._trial:
+                self._trial.add(key)
+                return True
+        self.metrics.incr("short_circuit", key)
+        raise CircuitOpenError(
+            f"Circuit open after {self.failure_threshold} consecutive failures",
+            method=method,
+            endpoint=endpoint,
+        )
+
+    def release(self, method: str, endpoint: str):
+        """
+        Frees the trial slot of `endpoint`. A no-op after `success` or
+        `failure`, it matters when the trial call raised something else.
+        """
+        with self._lock:
+            self._trial.discard(endpoint_key(method, endpoint))
+
+    def success(self, method: str, endpoint: str):
+        key = endpoint_key(method, endpoint)
+        with self._lock:
+            self._failures.pop(key, None)
+            self._opened_at.pop(key, None)
+            self._trial.discard(key)
+
+    def failure(self, error: ShipEngineError):
+        if error.status_code is not None and error.status_code < 500:
+            # A 4xx, 429 included, is an answer, so ShipEngine is up. 429s
+            # are throttling, not an outage, the rate limiter handles them.
+            self.success(error.method, error.endpoint)
+            return
+        key = endpoint_key(error.method, error.endpoint)
+        with self._lock:
+            trial = key in self._trial
+            self._trial.discard(key)
+            if not error.retryable:
+                return
+            self._failures[key] += 1
+            if trial or self._failures[key] >= self.failure_threshold:
+                if key not in self._opened_at or trial:
+                    self.metrics.incr("circuit_open", key)
+                self._opened_at[key] = time.monotonic()
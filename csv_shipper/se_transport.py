@@ -0,0 +1,103 @@
+import os
+import socket
+import threading
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    pool_connections: int = int(os.getenv("SHIPENGINE_POOL_CONNECTIONS", 4))
+    pool_maxsize: int = int(os.getenv("SHIPENGINE_POOL_MAXSIZE", 32))
+    pool_block: bool = os.getenv("SHIPENGINE_POOL_BLOCK", "true").lower() == "true"
+    tcp_keepalive: bool = True
+    keepalive_idle: int = int(os.getenv("SHIPENGINE_KEEPALIVE_IDLE", 60))
+    keepalive_interval: int = int(os.getenv("SHIPENGINE_KEEPALIVE_INTERVAL", 15))
+    keepalive_count: int = int(os.getenv("SHIPENGINE_KEEPALIVE_COUNT", 4))
+    connect_timeout: float = float(os.getenv("SHIPENGINE_CONNECT_TIMEOUT", 5))
+    read_timeout: float = float(os.getenv("SHIPENGINE_TIMEOUT", 30))
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return self.connect_timeout, self.read_timeout
+
+    def socket_options(self):
+        options = list(HTTPConnection.default_socket_options)
+        if not self.tcp_keepalive:
+            return options
+
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        # The fine grained knobs are not available on every platform.
+        for name, value in (
+            ("TCP_KEEPIDLE", self.keepalive_idle),
+            ("TCP_KEEPINTVL", self.keepalive_interval),
+            ("TCP_KEEPCNT", self.keepalive_count),
+        ):
+            if hasattr(socket, name):
+                options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+        return options
+
+
+DEFAULT_CONFIG = TransportConfig()
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """An HTTPAdapter whose pooled sockets have TCP keep-alive enabled."""
+
+    def __init__(self, config: TransportConfig = DEFAULT_CONFIG):
+        self.transport_config = config
+        super().__init__(
+            pool_connections=config.pool_connections,
+            pool_maxsize=config.pool_maxsize,
+            pool_block=config.pool_block,
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = self.transport_config.socket_options()
+        return super().init_poolmanager(*args, **kwargs)
+
+
+_sessions: Dict[Tuple[str, TransportConfig], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(api_key: str, config: TransportConfig = DEFAULT_CONFIG):
+    """
+    Returns the process-wide requests.Session for an API key, creating it on
+    first use. Every ShipEngine instance for the same key shares its
+    connection pool, so TLS connections to api.shipengine.com are reused
+    instead of being renegotiated per instance.
+
+    Args:
+        api_key (str): The ShipEngine API key, set once as a session header.
+        config (TransportConfig): Pool size, blocking and keep-alive settings.
+
+    Returns:
+        A shared requests.Session.
+    """
+    key = (api_key, config)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            session.headers["API-Key"] = api_key or ""
+            session.mount("https://", KeepAliveHTTPAdapter(config))
+            session.mount("http://", KeepAliveHTTPAdapter(config))
+            _sessions[key] = session
+        return session
+
+
+def close_sessions():
+    """Closes every shared session, e.g. at the end of a batch job."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
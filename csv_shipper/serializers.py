@@ -0,0 +1,45 @@
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, Tuple
+
+_FIELD_NAMES: Dict[type, Tuple[str, ...]] = {}
+
+
+def _field_names(cls: type) -> Tuple[str, ...]:
+    names = _FIELD_NAMES.get(cls)
+    if names is None:
+        names = _FIELD_NAMES[cls] = tuple(f.name for f in fields(cls))
+    return names
+
+
+def to_payload(obj: Any) -> Any:
+    """
+    Turns the payload dataclasses from csv_shipper.models into plain JSON
+    types for the ShipEngine API.
+
+    Unlike dataclasses.asdict this does not deepcopy leaf values and it
+    drops fields that are None, which ShipEngine treats the same as absent.
+    Field names are looked up once per class and cached.
+
+    Args:
+        obj: A dataclass instance, or a list/dict/scalar containing them.
+
+    Returns:
+        A dict, list or scalar ready to be JSON encoded.
+    """
+    cls = type(obj)
+    if cls in (str, int, float, bool) or obj is None:
+        return obj
+    if cls is list or cls is tuple:
+        return [to_payload(item) for item in obj]
+    if cls is dict:
+        return {
+            key: to_payload(value) for key, value in obj.items() if value is not None
+        }
+    if is_dataclass(obj):
+        payload = {}
+        for name in _field_names(cls):
+            value = getattr(obj, name)
+            if value is not None:
+                payload[name] = to_payload(value)
+        return payload
+    return obj
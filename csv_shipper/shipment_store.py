@@ -0,0 +1,217 @@
+import csv
+import io
+import json
+import os
+from typing import Iterable, List
+
+from csv_shipper import db_session
+from csv_shipper.models import (
+    LabelRecord,
+    Order,
+    PackageRecord,
+    RateRecord,
+    ShipmentRecord,
+    dialect_insert,
+)
+from csv_shipper.rate_shopping import rate_total
+from csv_shipper.se_errors import ShipEngineError
+from csv_shipper.serializers import to_payload
+
+STORE_FLUSH_EVERY = int(os.getenv("STORE_FLUSH_EVERY", 1000))
+
+LABEL_PURCHASED = "label_purchased"
+FAILED = "failed"
+
+_COPY_NULL = "\\N"
+
+
+def _copy_value(value):
+    if value is None:
+        return _COPY_NULL
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def copy_rows(table, rows: List[dict], conflict_column: str = None):
+    """
+    Appends rows with Postgres COPY ... FROM STDIN, the fastest way into a
+    table, streamed from an in-memory CSV buffer. Columns missing from the
+    rows keep their server defaults. Other databases and drivers fall back
+    to a single executemany INSERT.
+
+    With `conflict_column`, a unique column, rows whose value is already in
+    the table or repeats within `rows` are skipped instead of failing the
+    whole write. COPY has no ON CONFLICT, so the rows are copied into a
+    temporary table first and moved over with INSERT ... ON CONFLICT DO
+    NOTHING.
+    """
+    if not rows:
+        return
+    dialect = db_session.connection().dialect
+    if (dialect.name, dialect.driver) != ("postgresql", "psycopg2"):
+        stmt = table.insert()
+        if conflict_column is not None:
+            stmt = dialect_insert(table).on_conflict_do_nothing(
+                index_elements=[table.c[conflict_column]]
+            )
+        db_session.execute(stmt, rows)
+        return
+
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    columns = ", ".join(columns)
+
+    target = table.name if conflict_column is None else f"_copy_{table.name}"
+    cursor = db_session.connection().connection.cursor()
+    try:
+        if conflict_column is not None:
+            cursor.execute(
+                f"CREATE TEMP TABLE {target} AS SELECT {columns} FROM {table.name} WITH NO DATA"
+            )
+        cursor.copy_expert(
+            f"COPY {target} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')",
+            buffer,
+        )
+        if conflict_column is not None:
+            cursor.execute(
+                f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {target} "
+                f"ON CONFLICT ({conflict_column}) DO NOTHING"
+            )
+            cursor.execute(f"DROP TABLE {target}")
+    finally:
+        cursor.close()
+
+
+def _amount(money: dict):
+    return (money or {}).get("amount")
+
+
+class ShipmentStore:
+    """
+    Buffers the shipments, packages, labels and rates of a run and writes
+    each table with one COPY (or one executemany INSERT) per flush, instead
+    of an ORM object and a commit per row.
+
+    Every label attempt is its own shipments row, so a row that failed and
+    was retried by a restarted run shows up once per attempt. A shipment,
+    label or rate whose ShipEngine id is already stored, e.g. a rate quoted
+    twice, is skipped rather than failing the flush.
+
+    Args:
+        run_id (int): The ShipmentRun the records belong to.
+        user_id (int): The owner of the run.
+        flush_every (int): How many shipments are buffered per flush.
+    """
+
+    def __init__(self, run_id: int, user_id: int, flush_every: int = STORE_FLUSH_EVERY):
+        self.run_id = run_id
+        self.user_id = user_id
+        self.flush_every = flush_every
+        self._shipments = []
+        self._packages = []
+        self._labels = []
+        self._rates = []
+
+    def add_label(self, order: Order, resp):
+        """Buffers the shipment, its packages and its label for `order`."""
+        shipment = {
+            "run_id": self.run_id,
+            "user_id": self.user_id,
+            "row_number": order.row_number,
+            "external_order_id": order.external_order_id,
+            "ship_to": to_payload(order.ship_to),
+        }
+        if isinstance(resp, ShipEngineError):
+            shipment.update(
+                shipment_id=None,
+                status=FAILED,
+                carrier_id=None,
+                service_code=None,
+                error=str(resp),
+            )
+            self._shipments.append(shipment)
+        else:
+            shipment_id = resp["shipment_id"]
+            shipment.update(
+                shipment_id=shipment_id,
+                status=LABEL_PURCHASED,
+                carrier_id=resp.get("carrier_id"),
+                service_code=resp.get("service_code"),
+                error=None,
+            )
+            self._shipments.append(shipment)
+            self._packages.extend(
+                self._package_row(shipment_id, index, package)
+                for index, package in enumerate(resp.get("packages") or [])
+            )
+            self._labels.append(self._label_row(order, resp))
+
+        if len(self._shipments) >= self.flush_every:
+            self.flush()
+
+    def add_rates(self, rates: Iterable[dict]):
+        """Buffers rate quotes, e.g. the rate_response of a rate call."""
+        self._rates.extend(
+            {
+                "rate_id": rate["rate_id"],
+                "shipment_id": rate["shipment_id"],
+                "user_id": self.user_id,
+                "carrier_id": rate.get("carrier_id"),
+                "service_code": rate.get("service_code"),
+                "total_amount": rate_total(rate),
+                "currency": (rate.get("shipping_amount") or {}).get("currency"),
+                "delivery_days": rate.get("delivery_days"),
+            }
+            for rate in rates
+        )
+        if len(self._rates) >= self.flush_every:
+            self.flush()
+
+    @staticmethod
+    def _package_row(shipment_id: str, index: int, package: dict) -> dict:
+        weight = package.get("weight") or {}
+        dimensions = package.get("dimensions") or {}
+        return {
+            "shipment_id": shipment_id,
+            "package_index": index,
+            "weight_value": weight.get("value"),
+            "weight_unit": weight.get("unit"),
+            "length": dimensions.get("length"),
+            "width": dimensions.get("width"),
+            "height": dimensions.get("height"),
+            "dimension_unit": dimensions.get("unit"),
+            "tracking_number": package.get("tracking_number"),
+        }
+
+    def _label_row(self, order: Order, resp: dict) -> dict:
+        cost = resp.get("shipment_cost") or {}
+        return {
+            "label_id": resp["label_id"],
+            "shipment_id": resp["shipment_id"],
+            "run_id": self.run_id,
+            "user_id": self.user_id,
+            "external_order_id": order.external_order_id,
+            "status": resp.get("status") or "completed",
+            "tracking_number": resp.get("tracking_number"),
+            "carrier_code": resp.get("carrier_code"),
+            "service_code": resp.get("service_code"),
+            "shipment_cost": _amount(cost),
+            "currency": cost.get("currency"),
+            "label_url": (resp.get("label_download") or {}).get("href"),
+        }
+
+    def flush(self):
+        """Writes everything buffered in one transaction."""
+        if not (self._shipments or self._rates):
+            return
+        copy_rows(ShipmentRecord.__table__, self._shipments, conflict_column="shipment_id")
+        copy_rows(PackageRecord.__table__, self._packages)
+        copy_rows(LabelRecord.__table__, self._labels, conflict_column="label_id")
+        copy_rows(RateRecord.__table__, self._rates, conflict_column="rate_id")
+        db_session.commit()
+        self._shipments, self._packages, self._labels, self._rates = [], [], [], []
@@ -0,0 +1,88 @@
+from typing import List
+
+from csv_shipper.models import (
+    CONFIRMATION_OPTIONS,
+    AdvancedOptions,
+    CustomsOptions,
+    Package,
+    ShipFromAddress,
+    ShipToAddress,
+    check_choice,
+)
+from csv_shipper.serializers import to_payload
+
+
+class ShipmentTemplate:
+    """
+    The part of a shipment payload that every row of a run shares: carrier,
+    service, ship date, confirmation, insurance and the ship_from address.
+    It is validated and serialized once, payload() then only serializes a
+    row's ship_to and packages and merges them in.
+
+        template = ShipmentTemplate("se-123456", "ups_ground", ship_from, "10/18/2026")
+        payloads = [template.payload(order.ship_to, order.packages) for order in orders]
+
+    The payloads share the template's nested dicts, e.g. ship_from, so treat
+    them as read-only.
+
+    Args:
+        carrier_id (str): The carrier every label is bought from.
+        service_code (str): The carrier service of every label.
+        ship_from (ShipFromAddress): The origin of every shipment.
+        ship_date (str): The date the shipments are handed over.
+        confirmation (str): Delivery confirmation, see CONFIRMATION_OPTIONS.
+        insurance_provider (str): "none", "shipsurance", "carrier" etc.
+        customs (CustomsOptions): Default customs of every shipment.
+        advanced_options (AdvancedOptions): Default advanced options.
+    """
+
+    def __init__(
+            self,
+            carrier_id: str,
+            service_code: str,
+            ship_from: ShipFromAddress,
+            ship_date: str,
+            confirmation: str = "delivery",
+            insurance_provider: str = "none",
+            customs: CustomsOptions = None,
+            advanced_options: AdvancedOptions = None,
+    ):
+        check_choice("confirmation", confirmation, CONFIRMATION_OPTIONS)
+        self.ship_from = ship_from
+        self._base = to_payload(
+            {
+                "carrier_id": carrier_id,
+                "service_code": service_code,
+                "ship_date": ship_date,
+                "ship_from": ship_from,
+                "confirmation": confirmation,
+                "customs": customs,
+                "advanced_options": advanced_options,
+                "insurance_provider": insurance_provider,
+            }
+        )
+
+    def payload(
+            self,
+            ship_to: ShipToAddress,
+            packages: List[Package],
+            external_order_id: str = None,
+            validate_address: str = "validate_and_clean",
+            customs: CustomsOptions = None,
+            advanced_options: AdvancedOptions = None,
+    ) -> dict:
+        """
+        The JSON payload of one shipment. `customs` and `advanced_options`
+        replace the template's defaults for this shipment only.
+        """
+        payload = self._base.copy()
+        payload["validate_address"] = validate_address
+        payload["ship_to"] = to_payload(ship_to)
+        payload["packages"] = to_payload(packages)
+        if external_order_id is not None:
+            payload["external_order_id"] = external_order_id
+        if customs is not None:
+            payload["customs"] = to_payload(customs)
+        if advanced_options is not None:
+            payload["advanced_options"] = to_payload(advanced_options)
+        return payload
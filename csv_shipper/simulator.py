@@ -0,0 +1,339 @@
+"""
+A local stand-in for the ShipEngine API, for load tests that must not buy
+postage. It answers POST /v1/shipments, /v1/rates, /v1/labels and
+/v1/labels/rates/{rate_id} with responses shaped like
+shipment_object_reference.json, after a configurable delay, and fails a
+configurable share of calls with 500s and 429s.
+
+Point a client at it with SHIPENGINE_BASE_URL, e.g.
+
+    SIMULATOR_LATENCY_MS=80 SIMULATOR_RATE_LIMIT=20 python -m csv_shipper.simulator
+    SHIPENGINE_BASE_URL=http://127.0.0.1:8089/v1/ python -m csv_shipper.jobs.worker
+
+The simulator keeps no state: rate ids are made up per quote and any
+se- prefixed id can be bought.
+"""
+import copy
+import datetime
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+SIMULATOR_HOST = os.getenv("SIMULATOR_HOST", "127.0.0.1")
+SIMULATOR_PORT = int(os.getenv("SIMULATOR_PORT", 8089))
+REFERENCE_PATH = os.getenv(
+    "SIMULATOR_REFERENCE",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "shipment_object_reference.json"),
+)
+
+# Services quoted by POST /rates: (service_code, service_type, delivery_days, amount).
+SIMULATED_SERVICES = (
+    ("usps_first_class_mail", "USPS First Class Mail", 3, 3.85),
+    ("usps_priority_mail", "USPS Priority Mail", 2, 7.95),
+    ("ups_ground", "UPS Ground", 5, 9.37),
+    ("ups_next_day_air", "UPS Next Day Air", 1, 31.20),
+)
+
+_LABEL_RATE_PATH = re.compile(r"^labels/rates/(?P<rate_id>[^/]+)$")
+
+
+@dataclass(frozen=True)
+class SimulatorConfig:
+    """
+    How the simulator behaves.
+
+    Args:
+        latency_ms (float): Delay before every response.
+        latency_jitter_ms (float): Up to this much is added to the delay,
+            uniformly at random.
+        error_rate (float): Share of calls answered with a 500.
+        throttle_rate (float): Share of calls answered with a 429 at random,
+            on top of the ones rate_limit rejects.
+        rate_limit (float): Calls accepted per second, the rest get a 429
+            with Retry-After. 0 disables the limit.
+    """
+
+    latency_ms: float = float(os.getenv("SIMULATOR_LATENCY_MS", 50))
+    latency_jitter_ms: float = float(os.getenv("SIMULATOR_LATENCY_JITTER_MS", 20))
+    error_rate: float = float(os.getenv("SIMULATOR_ERROR_RATE", 0))
+    throttle_rate: float = float(os.getenv("SIMULATOR_THROTTLE_RATE", 0))
+    rate_limit: float = float(os.getenv("SIMULATOR_RATE_LIMIT", 0))
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _amount(value: float) -> dict:
+    return {"currency": "usd", "amount": value}
+
+
+def _error(error_code: str, message: str) -> dict:
+    """An error body in ShipEngine's format."""
+    return {
+        "request_id": str(uuid.uuid4()),
+        "errors": [
+            {
+                "error_source": "shipengine",
+                "error_type": "system",
+                "error_code": error_code,
+                "message": message,
+            }
+        ],
+    }
+
+
+class ShipEngineSimulator:
+    """
+    Builds the simulated responses. Kept apart from the HTTP handler so the
+    server threads only share the id counter and the rate limit window.
+
+    Args:
+        config (SimulatorConfig): Latency, error and throttling settings.
+        reference (dict): A label request as in
+            shipment_object_reference.json, the template of every response.
+    """
+
+    def __init__(self, config: SimulatorConfig = SimulatorConfig(), reference: dict = None):
+        if reference is None:
+            with open(REFERENCE_PATH) as f:
+                reference = json.load(f)
+        self.config = config
+        self.reference = reference
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._window = 0
+        self._window_calls = 0
+
+    def _id(self) -> str:
+        return f"se-{next(self._ids)}"
+
+    def _throttled(self) -> Optional[float]:
+        """Seconds until the caller may try again, None when it may go on."""
+        if self.config.throttle_rate and random.random() < self.config.throttle_rate:
+            return 1.0
+        if not self.config.rate_limit:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            window = int(now)
+            if window != self._window:
+                self._window, self._window_calls = window, 0
+            self._window_calls += 1
+            if self._window_calls <= self.config.rate_limit:
+                return None
+        return window + 1 - now
+
+    def handle(self, method: str, path: str, body: Optional[dict]) -> Tuple[int, dict, dict]:
+        """Returns (status, body, headers) for a call to /v1/`path`."""
+        retry_after = self._throttled()
+        if retry_after is not None:
+            return (
+                429,
+                _error("rate_limit_exceeded", "You have exceeded the rate limit."),
+                {"Retry-After": str(math.ceil(retry_after))},
+            )
+        if self.config.error_rate and random.random() < self.config.error_rate:
+            return 500, _error("unspecified", "Simulated server error."), {}
+
+        body = body or {}
+        match = _LABEL_RATE_PATH.match(path)
+        if method == "POST" and match:
+            rate_id = match.group("rate_id")
+            if not rate_id.startswith("se-"):
+                return 404, _error("not_found", f"Rate {rate_id} not found."), {}
+            return 200, self._label(body, {}, rate_id=rate_id), {}
+        if method == "POST" and path == "shipments":
+            shipments = [self._shipment(shipment) for shipment in body.get("shipments") or []]
+            return 200, {"has_errors": False, "shipments": shipments}, {}
+        if method == "POST" and path == "rates":
+            return 200, self._rates(body), {}
+        if method == "POST" and path == "labels":
+            return 200, self._label(body, body.get("shipment") or {}), {}
+        return 404, _error("not_found", f"No route for {method} /v1/{path}."), {}
+
+    def _shipment(self, requested: dict) -> dict:
+        shipment = copy.deepcopy(self.reference["shipment"])
+        shipment.update((key, value) for key, value in requested.items() if value is not None)
+        now = _now()
+        shipment.update(
+            shipment_id=self._id(),
+            shipment_status="pending",
+            created_at=now,
+            modified_at=now,
+            errors=[],
+        )
+        return shipment
+
+    def _rates(self, body: dict) -> dict:
+        if body.get("shipment_id"):
+            shipment = copy.deepcopy(self.reference["shipment"])
+            shipment["shipment_id"] = body["shipment_id"]
+        else:
+            shipment = self._shipment(body.get("shipment") or {})
+        shipment_id = shipment["shipment_id"]
+
+        rates = []
+        for service_code, service_type, days, amount in SIMULATED_SERVICES:
+            rates.append(
+                {
+                    "rate_id": self._id(),
+                    "rate_type": "shipment",
+                    "carrier_id": shipment.get("carrier_id"),
+                    "shipment_id": shipment_id,
+                    "shipping_amount": _amount(amount),
+                    "insurance_amount": _amount(0),
+                    "confirmation_amount": _amount(0),
+                    "other_amount": _amount(0),
+                    "delivery_days": days,
+                    "guaranteed_service": False,
+                    "carrier_delivery_days": str(days),
+                    "service_type": service_type,
+                    "service_code": service_code,
+                    "trackable": True,
+                    "carrier_code": service_code.split("_", 1)[0],
+                    "validation_status": "valid",
+                    "warning_messages": [],
+                    "error_messages": [],
+                }
+            )
+        shipment["rate_response"] = {
+            "rate_request_id": self._id(),
+            "shipment_id": shipment_id,
+            "created_at": _now(),
+            "status": "completed",
+            "errors": [],
+            "rates": rates,
+        }
+        return shipment
+
+    def _label(self, body: dict, requested: dict, rate_id: str = None) -> dict:
+        shipment = copy.deepcopy(self.reference["shipment"])
+        shipment.update((key, value) for key, value in requested.items() if value is not None)
+        label = {key: value for key, value in self.reference.items() if key != "shipment"}
+        label.update((key, value) for key, value in body.items() if key != "shipment")
+
+        label_id = self._id()
+        tracking_number = f"1Z{uuid.uuid4().hex[:16].upper()}"
+        href = f"https://api.shipengine.com/v1/downloads/10/{label_id}/label-{label_id}"
+        packages = []
+        for index, package in enumerate(shipment.get("packages") or []):
+            package = dict(package, package_id=index + 1, tracking_number=tracking_number)
+            packages.append(package)
+        label.update(
+            label_id=label_id,
+            status="completed",
+            shipment_id=self._id(),
+            ship_date=_now(),
+            created_at=_now(),
+            shipment_cost=_amount(SIMULATED_SERVICES[0][3]),
+            insurance_cost=_amount(0),
+            tracking_number=tracking_number,
+            is_international=shipment["ship_to"].get("country_code")
+            != shipment["ship_from"].get("country_code"),
+            batch_id="",
+            carrier_id=shipment.get("carrier_id"),
+            service_code=shipment.get("service_code"),
+            carrier_code=(shipment.get("service_code") or "").split("_", 1)[0],
+            package_code=packages[0].get("package_code") if packages else None,
+            voided=False,
+            voided_at=None,
+            trackable=True,
+            tracking_status="in_transit",
+            label_download={
+                "href": f"{href}.pdf",
+                "pdf": f"{href}.pdf",
+                "png": f"{href}.png",
+                "zpl": f"{href}.zpl",
+            },
+            form_download=None,
+            insurance_claim=None,
+            packages=packages,
+        )
+        if rate_id is not None:
+            label["rate_id"] = rate_id
+        return label
+
+
+def _handler(simulator: ShipEngineSimulator):
+    config = simulator.config
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _respond(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length) if length else b""
+            path = self.path.split("?", 1)[0]
+            if not path.startswith("/v1/"):
+                status, body, headers = 404, _error("not_found", "Unknown API version."), {}
+            else:
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    status, body, headers = 400, _error("invalid_body", "Invalid JSON."), {}
+                else:
+                    status, body, headers = simulator.handle(self.command, path[4:].strip("/"), body)
+
+            time.sleep((config.latency_ms + random.uniform(0, config.latency_jitter_ms)) / 1000)
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_simulator(
+        config: SimulatorConfig = SimulatorConfig(),
+        host: str = SIMULATOR_HOST,
+        port: int = 0,
+) -> ThreadingHTTPServer:
+    """
+    Serves the simulator from a daemon thread, e.g. inside a benchmark.
+    Port 0 picks a free port, read it back from `server.server_port`.
+    """
+    server = ThreadingHTTPServer((host, port), _handler(ShipEngineSimulator(config)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    config = SimulatorConfig()
+    server = ThreadingHTTPServer(
+        (SIMULATOR_HOST, SIMULATOR_PORT), _handler(ShipEngineSimulator(config))
+    )
+    server.daemon_threads = True
+    logging.info(f"ShipEngine simulator on http://{SIMULATOR_HOST}:{SIMULATOR_PORT}/v1/ {config}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,4 +8,30 @@ document.addEventListener('DOMContentLoaded', () => {
       notification.parentNode.removeChild(notification);
     });
   });
-});
\ No newline at end of file
+});
+
+document.addEventListener('DOMContentLoaded', () => {
+  const $job = document.getElementById('job-progress');
+  if (!$job) {
+    return;
+  }
+
+  const poll = () => {
+    fetch($job.dataset.statusUrl)
+      .then((resp) => resp.json())
+      .then((job) => {
+        $job.querySelector('.job-status').textContent = job.status;
+        $job.querySelector('.job-done').textContent = job.done;
+        $job.querySelector('.job-failed').textContent = job.failed;
+        $job.querySelector('.job-skipped').textContent = job.skipped;
+        $job.querySelector('.job-total').textContent = job.total;
+        $job.querySelector('progress').value = job.total ? ((job.done + job.failed + job.skipped) / job.total) * 100 : 0;
+
+        if (job.status !== 'finished' && job.status !== 'failed') {
+          setTimeout(poll, 2000);
+        }
+      });
+  };
+
+  poll();
+});
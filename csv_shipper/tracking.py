@@ -0,0 +1,208 @@
+import datetime
+import logging
+import os
+import time
+from typing import Iterable, List, Optional
+
+from sqlalchemy import bindparam, case, func
+
+from csv_shipper import db_session
+from csv_shipper.concurrency import ShipEngineExecutor
+from csv_shipper.models import TrackedLabel, dialect_insert
+from csv_shipper.se_errors import ShipEngineError
+
+TRACKING_STALE_AFTER = int(os.getenv("TRACKING_STALE_AFTER", 4 * 60 * 60))
+TRACKING_BATCH_SIZE = int(os.getenv("TRACKING_BATCH_SIZE", 200))
+TRACKING_REFRESH_INTERVAL = int(os.getenv("TRACKING_REFRESH_INTERVAL", 60))
+
+# ShipEngine status codes after which a label never changes again.
+TERMINAL_STATUS_CODES = frozenset(("DE", "SP"))
+
+# Lower refreshes first: shipments with a problem or on the move matter more
+# than ones that have not been picked up yet.
+STATUS_PRIORITY = {"EX": 0, "AT": 1, "IT": 2, "AC": 3, "NY": 4, "UN": 5}
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _status_fields(info: dict) -> dict:
+    status_code = info.get("status_code") or "UN"
+    return {
+        "_status_code": status_code,
+        "_status_description": info.get("status_description"),
+        "_carrier_status_description": info.get("carrier_status_description"),
+        "_estimated_delivery_at": _parse_datetime(info.get("estimated_delivery_date")),
+        "_is_terminal": status_code in TERMINAL_STATUS_CODES,
+    }
+
+
+def _bulk_update(match_column: str, rows: List[dict]):
+    if not rows:
+        return
+    table = TrackedLabel.__table__
+    db_session.execute(
+        table.update()
+        .where(table.c[match_column] == bindparam("_match"))
+        .values(
+            status_code=bindparam("_status_code"),
+            status_description=bindparam("_status_description"),
+            carrier_status_description=bindparam("_carrier_status_description"),
+            estimated_delivery_at=bindparam("_estimated_delivery_at"),
+            is_terminal=bindparam("_is_terminal"),
+            last_checked_at=func.now(),
+        ),
+        rows,
+    )
+    db_session.commit()
+
+
+def track_labels(user_id: int, labels: Iterable[dict]):
+    """Starts tracking freshly purchased labels, in a single insert."""
+    rows = [
+        {
+            "user_id": user_id,
+            "label_id": label["label_id"],
+            "tracking_number": label.get("tracking_number"),
+            "carrier_code": label.get("carrier_code"),
+            "status_code": "UN",
+            "is_terminal": False,
+        }
+        for label in labels
+        if label.get("label_id")
+    ]
+    if not rows:
+        return
+    table = TrackedLabel.__table__
+    db_session.execute(
+        dialect_insert(table).on_conflict_do_nothing(index_elements=[table.c.label_id]),
+        rows,
+    )
+    db_session.commit()
+
+
+def handle_webhook_events(events: List[dict]):
+    """
+    WebhookConsumer handler: applies API_TRACK events to the tracked labels
+    by tracking number, so pushed updates never cost an API call.
+    """
+    rows = []
+    for event in events:
+        if event.get("resource_type") != "API_TRACK":
+            continue
+        data = event["payload"].get("data") or {}
+        if data.get("tracking_number"):
+            rows.append({"_match": data["tracking_number"], **_status_fields(data)})
+    _bulk_update("tracking_number", rows)
+
+
+def status_summary(user_id: int) -> dict:
+    """Label counts per status code, answered from the user/status index."""
+    rows = (
+        db_session.query(TrackedLabel.status_code, func.count(TrackedLabel.id))
+        .filter(TrackedLabel.user_id == user_id)
+        .group_by(TrackedLabel.status_code)
+    )
+    return dict(rows)
+
+
+class TrackingRefresher:
+    """
+    Polls ShipEngine only for labels that are stale and not yet delivered.
+    Labels never checked go first, then by STATUS_PRIORITY, then the ones
+    checked longest ago, `batch_size` at a time over the shared executor.
+
+    Args:
+        se (ShipEngine): The client used for the tracking calls, a new one
+            by default.
+        executor (ShipEngineExecutor): The bounded worker pool.
+        stale_after (int): Seconds after which a label is polled again.
+        batch_size (int): Labels refreshed per round.
+    """
+
+    def __init__(
+            self,
+            se=None,
+            executor: ShipEngineExecutor = None,
+            stale_after: int = TRACKING_STALE_AFTER,
+            batch_size: int = TRACKING_BATCH_SIZE,
+    ):
+        if se is None:
+            # Imported here, so the webhook consumer can use the handlers of
+            # this module without loading the API client.
+            from csv_shipper.se_client import ShipEngine
+
+            se = ShipEngine()
+        self.se = se
+        self.executor = executor or ShipEngineExecutor()
+        self.stale_after = datetime.timedelta(seconds=stale_after)
+        self.batch_size = batch_size
+
+    def due(self) -> List[str]:
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - self.stale_after
+        priority = case(STATUS_PRIORITY, value=TrackedLabel.status_code, else_=6)
+        rows = (
+            db_session.query(TrackedLabel.label_id)
+            .filter(
+                TrackedLabel.is_terminal.is_(False),
+                (TrackedLabel.last_checked_at.is_(None))
+                | (TrackedLabel.last_checked_at < cutoff),
+            )
+            .order_by(
+                TrackedLabel.last_checked_at.isnot(None),
+                priority,
+                TrackedLabel.last_checked_at,
+            )
+            .limit(self.batch_size)
+        )
+        return [label_id for label_id, in rows]
+
+    def refresh_once(self) -> int:
+        """Refreshes one prioritized batch and returns its size."""
+        label_ids = self.due()
+        rows, failed = [], []
+        for label_id, info in zip(label_ids, self.executor.map(self.se.track_label, label_ids)):
+            if isinstance(info, ShipEngineError):
+                logging.warning(f"Tracking {label_id} failed: {info}")
+                failed.append(label_id)
+            else:
+                rows.append({"_match": label_id, **_status_fields(info)})
+        _bulk_update("label_id", rows)
+        if failed:
+            # Still bump last_checked_at so a broken label cannot starve the
+            # rest of the queue.
+            db_session.query(TrackedLabel).filter(
+                TrackedLabel.label_id.in_(failed)
+            ).update({TrackedLabel.last_checked_at: func.now()}, synchronize_session=False)
+            db_session.commit()
+        return len(label_ids)
+
+    def run_forever(self, interval: int = TRACKING_REFRESH_INTERVAL):
+        while True:
+            try:
+                refreshed = self.refresh_once()
+            except Exception:
+                logging.exception("Tracking refresh failed")
+                db_session.rollback()
+                refreshed = 0
+            if refreshed < self.batch_size:
+                time.sleep(interval)
+
+
+def main():
+    from csv_shipper import create_app
+
+    logging.basicConfig(level=logging.INFO)
+    create_app()
+    logging.info("Tracking refresher started")
+    TrackingRefresher().run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileAllowed, FileRequired
 from flask_login import current_user
-from wtforms import StringField, PasswordField, SubmitField, BooleanField
+from wtforms import StringField, PasswordField, SubmitField, BooleanField, SelectField
 from wtforms.fields.html5 import EmailField
 from wtforms.validators import (
     InputRequired,
@@ -121,3 +122,23 @@ class ResetPasswordForm(FlaskForm):
         ],
     )
     submit = SubmitField("Reset Password")
+
+
+class CSVUploadForm(FlaskForm):
+    """
+    A form to upload a CSV file of orders and choose the ship from address
+    used for every label in it. The choices of `ship_from` are filled in by
+    the view with the current user's saved addresses.
+    """
+
+    csv_file = FileField(
+        "Orders CSV",
+        validators=[FileRequired(), FileAllowed(["csv"], "CSV files only")],
+        description=(
+            "Rows with an external_order_id are shipped once: the same order id, "
+            "recipient and packages are skipped in this and every later upload. "
+            "Rows without one are always shipped, even when they repeat another row."
+        ),
+    )
+    ship_from = SelectField("Ship From", coerce=int)
+    upload = SubmitField("Ship It")
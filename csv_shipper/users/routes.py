@@ -1,15 +1,32 @@
-from flask import render_template, flash, redirect, url_for, request, Blueprint
+import dataclasses
+import os
+import uuid
+
+from flask import (
+    render_template,
+    flash,
+    redirect,
+    url_for,
+    request,
+    Blueprint,
+    current_app,
+    jsonify,
+    abort,
+)
 from flask_login import login_user, current_user, logout_user, login_required
 from markupsafe import escape
 
 from csv_shipper import bcrypt, db_session
-from csv_shipper.models import User, db_add
+from csv_shipper.jobs.queue import JobQueue, get_redis
+from csv_shipper.models import User, ShippingAddress, ShipmentRun, db_add
+from csv_shipper.tracking import status_summary
 from csv_shipper.users.utils import send_reset_email
 from csv_shipper.users.forms import (
     SignUpForm,
     LoginForm,
     RequestResetForm,
     ResetPasswordForm,
+    CSVUploadForm,
 )
 
 users = Blueprint("users", __name__)
@@ -72,7 +89,54 @@ def logout():
 @users.route("/dashboard", methods=["GET", "POST"])
 @login_required
 def dashboard():
-    return render_template("dashboard.html", title="CSV_Shipper Dashboard")
+    form = CSVUploadForm()
+    addresses = ShippingAddress.query.filter_by(user_id=current_user.id).all()
+    form.ship_from.choices = [(address.id, address.description) for address in addresses]
+
+    job_id = request.args.get("job_id")
+    if form.validate_on_submit():
+        ship_from = next(a for a in addresses if a.id == form.ship_from.data)
+
+        # Workers read the file from the shared upload folder, the request
+        # only stores it and enqueues the job.
+        os.makedirs(current_app.config["UPLOAD_FOLDER"], exist_ok=True)
+        csv_path = os.path.join(
+            current_app.config["UPLOAD_FOLDER"], f"{uuid.uuid4().hex}.csv"
+        )
+        form.csv_file.data.save(csv_path)
+
+        job_id = uuid.uuid4().hex
+        run = ShipmentRun(user_id=current_user.id, job_id=job_id, csv_path=csv_path)
+        db_add(run)
+
+        queue = JobQueue(get_redis(current_app.config["REDIS_URL"]))
+        queue.enqueue(
+            current_user.id,
+            run.id,
+            csv_path,
+            dataclasses.asdict(ship_from.to_ship_from()),
+            job_id=job_id,
+        )
+        flash("Your CSV file is queued for shipping.", "primary")
+        return redirect(url_for("users.dashboard", job_id=job_id))
+
+    return render_template(
+        "dashboard.html",
+        title="CSV_Shipper Dashboard",
+        form=form,
+        job_id=job_id,
+        tracking=status_summary(current_user.id),
+    )
+
+
+@users.route("/jobs/<string:job_id>/status", methods=["GET"])
+@login_required
+def job_status(job_id):
+    queue = JobQueue(get_redis(current_app.config["REDIS_URL"]))
+    status = queue.status(job_id)
+    if status is None or status["user_id"] != current_user.id:
+        abort(404)
+    return jsonify(status)
 
 
 @users.route("/reset_password", methods=["GET", "POST"])
@@ -0,0 +1,106 @@
+import csv
+from dataclasses import dataclass
+from typing import IO, Any, Dict, Iterable, List, Union
+
+from csv_shipper.csv_reader import normalize_choice, open_csv
+from csv_shipper.models import DIMENSION_UNITS, RESIDENTIAL_INDICATORS, WEIGHT_UNITS
+
+# The enum-like CSV columns and the values each may hold once their aliases
+# are resolved (see csv_reader.CHOICE_ALIASES). Blank optional columns are
+# allowed and checked by row_to_order instead.
+CSV_CHOICE_COLUMNS: Dict[str, frozenset] = {
+    "address_residential_indicator": RESIDENTIAL_INDICATORS,
+    "weight_unit": WEIGHT_UNITS,
+    "dimension_unit": DIMENSION_UNITS | {""},
+}
+
+
+@dataclass
+class RowError:
+    row_number: int
+    field: str
+    value: Any
+    message: str
+
+
+class ValidationErrors(ValueError):
+    """Raised with every RowError of a file instead of only the first one."""
+
+    def __init__(self, errors: List[RowError]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid value(s) in the CSV file")
+
+
+def validate_column(
+        field: str, values: Iterable, choices: frozenset, start: int = 1
+) -> List[RowError]:
+    """
+    Checks a whole column against a set of allowed values in one pass.
+
+    Args:
+        field (str): The column name, used in the error messages.
+        values (Iterable): The column values in row order.
+        choices (frozenset): The allowed values.
+        start (int): The row number of the first value.
+
+    Returns:
+        A RowError for every value that is not allowed, empty when the
+        column is valid.
+    """
+    return [
+        RowError(row_number, field, value, f"{field} must be one of {sorted(choices)}")
+        for row_number, value in enumerate(values, start=start)
+        if value not in choices
+    ]
+
+
+def validate_rows(
+        rows: Iterable[dict],
+        columns: Dict[str, frozenset] = None,
+        start: int = 1,
+) -> List[RowError]:
+    """
+    Checks every enum-like column of a batch of csv.DictReader rows.
+
+    Returns:
+        All RowErrors of the batch, ordered by row number.
+    """
+    columns = columns or CSV_CHOICE_COLUMNS
+    errors = []
+    for row_number, row in enumerate(rows, start=start):
+        for field, choices in columns.items():
+            value = normalize_choice(field, row.get(field))
+            if value not in choices:
+                errors.append(
+                    RowError(
+                        row_number,
+                        field,
+                        value,
+                        f"{field} must be one of {sorted(choices - {''})}",
+                    )
+                )
+    return errors
+
+
+def validate_csv(csv_file: Union[str, IO], raise_errors: bool = True) -> List[RowError]:
+    """
+    Pre-flights a whole CSV file, streaming it once and collecting every
+    invalid value instead of stopping at the first bad row.
+
+    Args:
+        csv_file (str | IO): A path to a CSV file or an open file-like object.
+        raise_errors (bool): Raise ValidationErrors when anything is invalid.
+
+    Returns:
+        The list of RowErrors, empty when the file is valid.
+    """
+    stream = open_csv(csv_file)
+    try:
+        errors = validate_rows(csv.DictReader(stream))
+    finally:
+        if isinstance(csv_file, str):
+            stream.close()
+
+    if errors and raise_errors:
+        raise ValidationErrors(errors)
+    return errors
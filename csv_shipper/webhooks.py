@@ -0,0 +1,287 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from csv_shipper import db_session
+from csv_shipper.hashing import compare_hash
+from csv_shipper.models import WebhookEvent, dialect_insert
+from csv_shipper.tracking import handle_webhook_events
+
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 50000))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 500))
+WEBHOOK_FLUSH_INTERVAL = float(os.getenv("WEBHOOK_FLUSH_INTERVAL", 0.5))
+# How long a stopping process may spend writing out acknowledged events.
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 30))
+# A batch that fails is retried event by event, an event that still fails
+# this often is written to the dead letter file instead of blocking the rest.
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 5))
+WEBHOOK_DEAD_LETTER_PATH = os.getenv(
+    "WEBHOOK_DEAD_LETTER_PATH", "/tmp/csv_shipper_webhook_dead_letters.jsonl"
+)
+RECENT_EVENT_IDS = 100000
+POLL_INTERVAL = 0.1
+
+
+def verify(headers, config) -> bool:
+    """
+    ShipEngine does not sign webhooks, but it sends back the custom headers
+    the webhook was registered with. When WEBHOOK_SECRET is configured the
+    request must carry it in WEBHOOK_SECRET_HEADER.
+    """
+    secret = config.get("WEBHOOK_SECRET")
+    if not secret:
+        return True
+    return compare_hash(headers.get(config["WEBHOOK_SECRET_HEADER"], ""), secret)
+
+
+def event_id(body: bytes) -> str:
+    """
+    ShipEngine payloads carry no event id, redeliveries are byte for byte
+    identical though, so the body hash serves as one.
+    """
+    return hashlib.sha256(body).hexdigest()
+
+
+def _column_value(column, value):
+    """Fits an optional payload value into a String column."""
+    if value is None:
+        return None
+    return str(value)[: column.type.length]
+
+
+def _transient(error: Exception) -> bool:
+    """Whether `error` is the database being away rather than a bad event."""
+    return isinstance(error, (OperationalError, InterfaceError)) or (
+        isinstance(error, DBAPIError) and error.connection_invalidated
+    )
+
+
+class WebhookConsumer:
+    """
+    Absorbs webhook bursts off the request path. The view only puts events
+    on a bounded in-memory queue; a background thread drains it, dedups by
+    event id and writes whole batches with one INSERT ... ON CONFLICT DO
+    NOTHING.
+
+    Handlers registered with add_handler are called with every deduped
+    batch of events after it was stored.
+
+    Queued events were already acknowledged to ShipEngine, so close() must
+    run before the process exits, e.g. when uwsgi recycles a worker after
+    max-requests. get_consumer registers it with atexit.
+
+    A batch that fails for any reason but a lost database connection is
+    retried event by event, so one bad payload does not hold back the
+    events batched with it. An event that fails `max_attempts` times is
+    appended to `dead_letter_path` as a JSON line and dropped.
+
+    Args:
+        app (Flask): The app whose database the events are written to.
+        batch_size (int): Most events per insert.
+        flush_interval (float): Longest an event waits for a full batch.
+        maxsize (int): Most events queued before submit() refuses more.
+        max_attempts (int): Failures before an event is dead-lettered.
+        dead_letter_path (str): Where dead-lettered events are appended.
+    """
+
+    def __init__(
+            self,
+            app,
+            batch_size: int = WEBHOOK_BATCH_SIZE,
+            flush_interval: float = WEBHOOK_FLUSH_INTERVAL,
+            maxsize: int = WEBHOOK_QUEUE_SIZE,
+            max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+            dead_letter_path: str = WEBHOOK_DEAD_LETTER_PATH,
+    ):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path
+        self._attempts = {}
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.handlers: List[Callable[[List[dict]], None]] = []
+        self._recent = OrderedDict()
+        self._stopping = threading.Event()
+        self._submit_lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="webhook-consumer", daemon=True
+        )
+        self._thread.start()
+
+    def add_handler(self, handler: Callable[[List[dict]], None]):
+        self.handlers.append(handler)
+
+    def submit(self, body: bytes, payload: dict) -> bool:
+        """Queues an event, False when the queue is full or closing."""
+        table = WebhookEvent.__table__
+        event = {
+            "event_id": event_id(body),
+            "resource_type": _column_value(table.c.resource_type, payload.get("resource_type")),
+            "resource_url": _column_value(table.c.resource_url, payload.get("resource_url")),
+            "payload": payload,
+        }
+        # Checked under the lock so close() never misses a late event.
+        with self._submit_lock:
+            if self._stopping.is_set():
+                return False
+            try:
+                self.queue.put_nowait(event)
+            except queue.Full:
+                return False
+        return True
+
+    def _drain(self) -> List[dict]:
+        # Waits are sliced by POLL_INTERVAL so close() is noticed promptly
+        # even with a long flush interval.
+        try:
+            batch = [self.queue.get(timeout=min(self.flush_interval, POLL_INTERVAL))]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=min(timeout, POLL_INTERVAL)))
+            except queue.Empty:
+                if self._stopping.is_set():
+                    break
+        return batch
+
+    def _dedup(self, batch: List[dict]) -> List[dict]:
+        events = []
+        for event in batch:
+            if event["event_id"] in self._recent:
+                continue
+            self._recent[event["event_id"]] = None
+            events.append(event)
+        while len(self._recent) > RECENT_EVENT_IDS:
+            self._recent.popitem(last=False)
+        return events
+
+    def _store(self, events: List[dict]):
+        table = WebhookEvent.__table__
+        stmt = dialect_insert(table).on_conflict_do_nothing(
+            index_elements=[table.c.event_id]
+        )
+        db_session.execute(stmt, events)
+        db_session.commit()
+
+    def _try_store(self, events: List[dict]) -> Optional[Exception]:
+        """Stores events and runs the handlers, returns the error if any."""
+        try:
+            with self.app.app_context():
+                self._store(events)
+                for handler in self.handlers:
+                    handler(events)
+        except Exception as e:
+            logging.exception(f"Failed to store {len(events)} webhook event(s)")
+            with self.app.app_context():
+                db_session.rollback()
+            return e
+        for event in events:
+            self._attempts.pop(event["event_id"], None)
+        return None
+
+    def _flush(self, events: List[dict]):
+        error = self._try_store(events)
+        if error is None:
+            return
+        if _transient(error):
+            self._requeue(events)
+            return
+
+        failed = [(events[0], error)] if len(events) == 1 else []
+        if len(events) > 1:
+            for event in events:
+                error = self._try_store([event])
+                if error is not None:
+                    failed.append((event, error))
+
+        retry = []
+        for event, error in failed:
+            if _transient(error):
+                retry.append(event)
+                continue
+            attempts = self._attempts.get(event["event_id"], 0) + 1
+            if attempts >= self.max_attempts:
+                self._dead_letter(event, error)
+            else:
+                self._attempts[event["event_id"]] = attempts
+                retry.append(event)
+        if retry:
+            self._requeue(retry)
+
+    def _requeue(self, events: List[dict]):
+        # Put the events back so a database blip does not lose events that
+        # were already acknowledged. While closing this goes on until
+        # close() gives up waiting.
+        time.sleep(self.flush_interval)
+        for event in events:
+            self._recent.pop(event["event_id"], None)
+            try:
+                self.queue.put_nowait(event)
+            except queue.Full:
+                logging.error(f"Dropped webhook event {event['event_id']}")
+
+    def _dead_letter(self, event: dict, error: Exception):
+        self._attempts.pop(event["event_id"], None)
+        logging.error(
+            f"Webhook event {event['event_id']} failed {self.max_attempts} times, "
+            f"dead-lettered to {self.dead_letter_path}: {error}"
+        )
+        try:
+            with open(self.dead_letter_path, "a") as f:
+                f.write(json.dumps(dict(event, error=str(error)), default=str) + "\n")
+        except OSError:
+            logging.exception(f"Dropped webhook event {event['event_id']}")
+
+    def _run(self):
+        while not (self._stopping.is_set() and self.queue.empty()):
+            events = self._dedup(self._drain())
+            if events:
+                self._flush(events)
+
+    def close(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT) -> bool:
+        """
+        Stops taking events and waits until the queued ones are stored.
+
+        Returns:
+            False when events were still queued after `timeout` seconds.
+        """
+        with self._submit_lock:
+            self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logging.error(f"{self.queue.qsize()} webhook event(s) not stored on shutdown")
+            return False
+        return True
+
+
+_consumer_lock = threading.Lock()
+
+
+def get_consumer(app) -> WebhookConsumer:
+    """Returns the app's consumer, starting it on first use."""
+    consumer = app.extensions.get("webhook_consumer")
+    if consumer is not None:
+        return consumer
+    with _consumer_lock:
+        consumer = app.extensions.get("webhook_consumer")
+        if consumer is None:
+            consumer = app.extensions["webhook_consumer"] = WebhookConsumer(app)
+            consumer.add_handler(handle_webhook_events)
+            # uwsgi runs atexit handlers when it recycles or stops a worker.
+            atexit.register(consumer.close)
+        return consumer
@@ -0,0 +1,116 @@
+"""Shared fixtures for tests that need the Flask app and a database."""
+import unittest
+
+from csv_shipper import create_app, db, db_session
+from csv_shipper.config import Config
+from csv_shipper.csv_reader import ADDRESS_COLUMNS
+from csv_shipper.models import Order, Package, PackageWeight, ShipmentRun, ShipToAddress, User
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SECRET_KEY = "test"
+    WTF_CSRF_ENABLED = False
+    REDIS_URL = "redis://localhost:6379/15"
+
+
+_app = None
+
+
+def get_app():
+    """The app is created once per process, create_app pushes its context."""
+    global _app
+    if _app is None:
+        _app = create_app(TestConfig)
+    return _app
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Runs every test against a fresh in-memory sqlite database."""
+
+    def setUp(self):
+        self.app = get_app()
+        db.drop_all()
+        db.create_all()
+
+    def tearDown(self):
+        db_session.remove()
+
+    def make_user(self, n: int = 1) -> User:
+        user = User(
+            first_name="Monkey",
+            last_name="Luffy",
+            email=f"luffy{n}@example.com",
+            username=f"luffy{n}",
+            pw_hash=f"hash{n}",
+        )
+        db_session.add(user)
+        db_session.commit()
+        return user
+
+    def make_run(self, user: User) -> ShipmentRun:
+        run = ShipmentRun(user_id=user.id, status="running", csv_path="/tmp/orders.csv")
+        db_session.add(run)
+        db_session.commit()
+        return run
+
+
+def make_order(
+        row_number: int, name: str = "Kasey Cantu", external_order_id: str = None, **address
+) -> Order:
+    fields = dict(
+        name=name,
+        phone="1-789-456-1234",
+        company_name=None,
+        address_line1="4009 Marathon Blvd",
+        address_line2=None,
+        address_line3=None,
+        city_locality="Austin",
+        state_province="TX",
+        postal_code="78756",
+        country_code="US",
+        address_residential_indicator="no",
+    )
+    fields.update(address)
+    return Order(
+        row_number=row_number,
+        external_order_id=external_order_id,
+        ship_to=ShipToAddress(**fields),
+        packages=[Package(weight=PackageWeight(value=2.5, unit="pound"), dimensions=None)],
+    )
+
+
+CSV_COLUMNS = ADDRESS_COLUMNS + (
+    "weight_value",
+    "weight_unit",
+    "dimension_unit",
+    "length",
+    "width",
+    "height",
+)
+
+
+def make_row(**values) -> dict:
+    """A raw CSV row as csv.DictReader yields it, with `values` swapped in."""
+    row = dict(
+        name="Kasey Cantu",
+        phone="1-789-456-1234",
+        company_name="ShipEngine",
+        address_line1="4009 Marathon Blvd",
+        address_line2="",
+        address_line3="",
+        city_locality="Austin",
+        state_province="TX",
+        postal_code="78756",
+        country_code="US",
+        address_residential_indicator="no",
+        weight_value="2.5",
+        weight_unit="pound",
+        dimension_unit="",
+        length="",
+        width="",
+        height="",
+    )
+    row.update(values)
+    return row
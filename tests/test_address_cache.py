@@ -0,0 +1,124 @@
+import dataclasses
+import datetime
+import unittest
+
+from csv_shipper import db_session
+from csv_shipper.address_cache import AddressValidator, address_key, normalize_address
+from csv_shipper.models import ValidatedAddress
+from csv_shipper.se_errors import ShipEngineServerError
+
+from support import DatabaseTestCase, make_order
+
+MATCHED = {
+    "address_line1": "4009 MARATHON BLVD",
+    "address_line2": None,
+    "address_line3": None,
+    "city_locality": "AUSTIN",
+    "state_province": "TX",
+    "postal_code": "78756-3420",
+    "country_code": "US",
+    "address_residential_indicator": "no",
+}
+
+
+class FakeShipEngine:
+    """Answers POST /addresses/validate, or fails while `down` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.down = False
+        self.before_answer = None
+
+    def validate_addresses(self, addresses):
+        self.calls.append(addresses)
+        if self.down:
+            raise ShipEngineServerError(
+                "Bad gateway", method="POST", endpoint="addresses/validate", status_code=502
+            )
+        if self.before_answer is not None:
+            self.before_answer()
+        return [{"status": "verified", "matched_address": MATCHED} for _ in addresses]
+
+
+class AddressKeyTest(unittest.TestCase):
+    def test_trivial_spelling_differences_share_a_key(self):
+        a = make_order(1).ship_to
+        b = dataclasses.replace(
+            a, name="Someone Else", address_line1=" 4009  Marathon Blvd ", state_province="tx"
+        )
+        self.assertEqual(address_key(normalize_address(a)), address_key(normalize_address(b)))
+        c = dataclasses.replace(a, address_line1="4011 Marathon Blvd")
+        self.assertNotEqual(address_key(normalize_address(a)), address_key(normalize_address(c)))
+
+
+class AddressValidatorTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.se = FakeShipEngine()
+        self.validator = AddressValidator(self.se, ttl=60)
+
+    def key(self, order) -> str:
+        return address_key(normalize_address(order.ship_to))
+
+    def expire(self, order):
+        row = ValidatedAddress.query.filter_by(address_hash=self.key(order)).one()
+        row.validated_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+        db_session.commit()
+
+    def test_recipients_are_validated_once_and_cached(self):
+        orders = [make_order(1, "Ann"), make_order(2, "Bob")]
+        prepared = self.validator.prepare(orders)
+
+        self.assertEqual(len(self.se.calls), 1)
+        self.assertEqual(len(self.se.calls[0]), 1)
+        for order in prepared:
+            self.assertTrue(order.address_validated)
+            self.assertEqual(order.ship_to.postal_code, "78756-3420")
+        self.assertEqual([order.ship_to.name for order in prepared], ["Ann", "Bob"])
+
+        self.validator.prepare([make_order(3, "Cy")])
+        self.assertEqual(len(self.se.calls), 1)
+        self.assertEqual(ValidatedAddress.query.count(), 1)
+
+    def test_expired_rows_are_validated_again(self):
+        order = make_order(1)
+        self.validator.prepare([order])
+        self.expire(order)
+
+        self.assertTrue(self.validator.prepare([order])[0].address_validated)
+        self.assertEqual(len(self.se.calls), 2)
+        self.assertEqual(ValidatedAddress.query.count(), 1)
+
+    def test_expired_rows_are_not_trusted_while_the_api_fails(self):
+        order = make_order(1)
+        self.validator.prepare([order])
+        self.expire(order)
+        self.se.down = True
+
+        self.assertEqual(self.validator.validate({self.key(order): order.ship_to}), {})
+        prepared = self.validator.prepare([order])[0]
+        self.assertFalse(prepared.address_validated)
+        self.assertEqual(prepared.ship_to, order.ship_to)
+
+    def test_concurrent_insert_of_the_same_address_is_not_an_error(self):
+        order = make_order(1)
+
+        def other_worker():
+            db_session.add(
+                ValidatedAddress(
+                    address_hash=self.key(order),
+                    status="unverified",
+                    matched_address=None,
+                    validated_at=datetime.datetime.now(datetime.timezone.utc),
+                )
+            )
+            db_session.commit()
+
+        self.se.before_answer = other_worker
+        self.assertTrue(self.validator.prepare([order])[0].address_validated)
+        row = ValidatedAddress.query.one()
+        self.assertEqual(row.status, "verified")
+
+
+if __name__ == "__main__":
+    unittest.main()
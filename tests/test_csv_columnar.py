@@ -0,0 +1,132 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from csv_shipper.csv_columnar import (
+    merge_rejects,
+    normalize_chunk,
+    read_orders_columnar,
+    reject_reasons,
+)
+from csv_shipper.csv_reader import row_to_order
+from csv_shipper.validation import validate_rows
+
+from support import CSV_COLUMNS, make_row
+
+
+def write_csv(path: str, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+class AliasPolicyTest(unittest.TestCase):
+    ALIASES = dict(
+        weight_unit="lbs",
+        address_residential_indicator="Y",
+        dimension_unit="in",
+        length="10",
+        width="5",
+        height="2",
+    )
+
+    def test_row_to_order_accepts_aliases(self):
+        order = row_to_order(1, make_row(**self.ALIASES))
+        self.assertEqual(order.packages[0].weight.unit, "pound")
+        self.assertEqual(order.packages[0].dimensions.unit, "inch")
+        self.assertEqual(order.ship_to.address_residential_indicator, "yes")
+
+    def test_validation_accepts_aliases(self):
+        self.assertEqual(validate_rows([make_row(**self.ALIASES)]), [])
+        errors = validate_rows([make_row(weight_unit="stone")])
+        self.assertEqual([error.field for error in errors], ["weight_unit"])
+
+    def test_columnar_accepts_aliases(self):
+        stream = io.StringIO()
+        writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerow(make_row(**self.ALIASES))
+        stream.seek(0)
+        order, = read_orders_columnar(stream)
+        self.assertEqual(order.packages[0].weight.unit, "pound")
+        self.assertEqual(order.packages[0].dimensions.unit, "inch")
+        self.assertEqual(order.ship_to.address_residential_indicator, "yes")
+
+
+class PostalCodeTest(unittest.TestCase):
+    def check(self, *postal_codes, country_code="US"):
+        chunk = pd.DataFrame(
+            [make_row(postal_code=code, country_code=country_code) for code in postal_codes],
+            dtype=str,
+        )
+        chunk = normalize_chunk(chunk)
+        return list(chunk["postal_code"]), list(reject_reasons(chunk))
+
+    def test_short_and_nine_digit_zips_are_formatted(self):
+        codes, reasons = self.check("2134", "021340000", " 78756 ")
+        self.assertEqual(codes, ["02134", "02134-0000", "78756"])
+        self.assertEqual(reasons, ["", "", ""])
+
+    def test_blank_and_non_numeric_zips_are_rejected(self):
+        codes, reasons = self.check("", "   ", "ABCDE", "7875A")
+        self.assertNotIn("00000", codes)
+        for reason in reasons:
+            self.assertIn("invalid US postal_code", reason)
+        self.assertIn("postal_code is required", reasons[0])
+
+    def test_other_countries_are_left_alone(self):
+        codes, reasons = self.check("k1a 0b1", country_code="CA")
+        self.assertEqual(codes, ["K1A 0B1"])
+        self.assertEqual(reasons, [""])
+
+
+class ShardedRejectsTest(unittest.TestCase):
+    def test_shards_split_rows_and_rejects_merge_in_row_order(self):
+        rows = [make_row(name=f"Customer {n}") for n in range(1, 7)]
+        rows[1]["weight_unit"] = "stone"  # row 2, shard 0
+        rows[2]["weight_value"] = "0"  # row 3, shard 1
+        rows[4]["country_code"] = "USA"  # row 5, shard 1
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "orders.csv")
+            write_csv(path, rows)
+
+            shard_paths, valid, rejected = [], {}, {}
+            for shard in range(2):
+                shard_path = os.path.join(tmp, f"orders.rejects.{shard}.csv")
+                shard_paths.append(shard_path)
+                orders = read_orders_columnar(
+                    path,
+                    rejects_path=shard_path,
+                    shard=shard,
+                    shards=2,
+                    on_reject=lambda n, reason: rejected.setdefault(n, reason),
+                )
+                valid[shard] = [order.row_number for order in orders]
+
+            self.assertEqual(valid, {0: [4, 6], 1: [1]})
+            self.assertEqual(sorted(rejected), [2, 3, 5])
+            self.assertIn("invalid weight_unit", rejected[2])
+
+            rejects_path = os.path.join(tmp, "orders.rejects.csv")
+            self.assertEqual(merge_rejects(shard_paths, rejects_path), rejects_path)
+            with open(rejects_path, newline="") as f:
+                merged = list(csv.DictReader(f))
+            self.assertEqual([row["row_number"] for row in merged], ["2", "3", "5"])
+            self.assertTrue(all(row["reject_reason"] for row in merged))
+            self.assertFalse(any(os.path.exists(p) for p in shard_paths))
+
+    def test_no_rejects_means_no_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rejects_path = os.path.join(tmp, "orders.rejects.csv")
+            self.assertIsNone(merge_rejects([os.path.join(tmp, "missing.csv")], rejects_path))
+            self.assertFalse(os.path.exists(rejects_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
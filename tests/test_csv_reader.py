@@ -0,0 +1,73 @@
+import csv
+import io
+import unittest
+
+from csv_shipper.concurrency import ShipEngineExecutor, TokenBucket
+from csv_shipper.csv_reader import RowError, read_orders, ship_csv
+from csv_shipper.se_errors import ShipEngineError, ShipEngineRequestError
+
+from support import CSV_COLUMNS, make_row
+
+
+def csv_stream(rows) -> io.StringIO:
+    stream = io.StringIO()
+    writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    stream.seek(0)
+    return stream
+
+
+class FailingShipEngine:
+    """Rejects every label for a recipient named "Bad"."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create_label(self, ship_to_address, ship_from_address, packages):
+        self.calls += 1
+        if ship_to_address.name == "Bad":
+            raise ShipEngineRequestError(
+                "Invalid address", method="POST", endpoint="labels", status_code=400
+            )
+        return {"label_id": f"se-{ship_to_address.name}"}
+
+
+class ShipCsvTest(unittest.TestCase):
+    ROWS = [
+        make_row(name="Ann"),
+        make_row(name="Bad"),
+        make_row(name="Heavy", weight_value="a lot"),
+        make_row(name="Bob"),
+        make_row(name="Odd", weight_unit="stone"),
+    ]
+
+    def check(self, results, se):
+        self.assertEqual([row.row_number for row, _ in results], [1, 2, 3, 4, 5])
+        self.assertEqual(results[0][1], {"label_id": "se-Ann"})
+        self.assertIsInstance(results[1][1], ShipEngineError)
+        self.assertIsInstance(results[2][0], RowError)
+        self.assertIsInstance(results[2][1], ValueError)
+        self.assertEqual(results[3][1], {"label_id": "se-Bob"})
+        self.assertIsInstance(results[4][0], RowError)
+        self.assertIn("stone", str(results[4][1]))
+        self.assertEqual(se.calls, 3)
+
+    def test_bad_rows_do_not_stop_the_file(self):
+        se = FailingShipEngine()
+        results = list(ship_csv(se, csv_stream(self.ROWS), ship_from_address=None, batch_size=2))
+        self.check(results, se)
+
+    def test_bad_rows_do_not_stop_the_executor(self):
+        se = FailingShipEngine()
+        executor = ShipEngineExecutor(max_workers=2, rate_limiter=TokenBucket(rate=1e6))
+        results = list(ship_csv(se, csv_stream(self.ROWS), None, executor=executor))
+        self.check(results, se)
+
+    def test_read_orders_is_strict(self):
+        with self.assertRaises(ValueError):
+            list(read_orders(csv_stream([make_row(weight_value="a lot")])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import base64
+
+from flask_login import FlaskLoginClient
+
+from csv_shipper import db_session, login_manager
+from csv_shipper.models import PackageRecord, ShipmentRecord
+
+from support import DatabaseTestCase
+
+
+def global_id(type_name: str, pk: int) -> str:
+    return base64.b64encode(f"{type_name}:{pk}".encode()).decode()
+
+
+class GraphQLAccessTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app.test_client_class = FlaskLoginClient
+        self.addCleanup(setattr, self.app, "test_client_class", None)
+        # FlaskLoginClient does not set the session identifier "strong"
+        # protection checks.
+        self.addCleanup(
+            setattr, login_manager, "session_protection", login_manager.session_protection
+        )
+        login_manager.session_protection = None
+
+        self.users = [self.make_user(1), self.make_user(2)]
+        self.runs = []
+        for user in self.users:
+            run = self.make_run(user)
+            self.runs.append(run)
+            shipment_id = f"se-{user.id}"
+            db_session.add(
+                ShipmentRecord(
+                    run_id=run.id,
+                    user_id=user.id,
+                    row_number=1,
+                    shipment_id=shipment_id,
+                    status="labeled",
+                    ship_to={"name": user.username},
+                )
+            )
+            db_session.add(
+                PackageRecord(
+                    shipment_id=shipment_id, package_index=0, weight_value=1, weight_unit="pound"
+                )
+            )
+        db_session.commit()
+
+    def query(self, query: str, user=None) -> dict:
+        client = self.app.test_client(user=user)
+        # A fresh app context, so flask.g does not carry the user over.
+        with self.app.app_context():
+            resp = client.post("/graphql", json={"query": query})
+        self.assertEqual(resp.status_code, 200, resp.get_data(as_text=True))
+        return resp.get_json()
+
+    def test_login_is_required(self):
+        resp = self.app.test_client().post(
+            "/graphql", json={"query": "{ allUsers { edges { node { id } } } }"}
+        )
+        self.assertEqual(resp.status_code, 302)
+
+    def test_connections_only_list_own_rows(self):
+        user = self.users[0]
+        data = self.query(
+            """{
+                allUsers { edges { node { username } } }
+                allShipmentRuns { edges { node { userId } } }
+                allShipments { edges { node { shipmentId packages { shipmentId } } } }
+            }""",
+            user=user,
+        )["data"]
+
+        self.assertEqual([e["node"]["username"] for e in data["allUsers"]["edges"]], ["luffy1"])
+        self.assertEqual([e["node"]["userId"] for e in data["allShipmentRuns"]["edges"]], [user.id])
+        shipments = [e["node"] for e in data["allShipments"]["edges"]]
+        self.assertEqual([shipment["shipmentId"] for shipment in shipments], ["se-1"])
+        self.assertEqual(shipments[0]["packages"], [{"shipmentId": "se-1"}])
+
+    def test_node_lookup_of_another_users_row_is_empty(self):
+        own, other = self.runs
+        query = '{ node(id: "%s") { id } }'
+
+        data = self.query(query % global_id("ShipmentRun", own.id), user=self.users[0])
+        self.assertIsNotNone(data["data"]["node"])
+        data = self.query(query % global_id("ShipmentRun", other.id), user=self.users[0])
+        self.assertIsNone(data["data"]["node"])
+        data = self.query(query % global_id("Package", 2), user=self.users[0])
+        self.assertIsNone(data["data"]["node"])
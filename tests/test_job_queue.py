@@ -0,0 +1,79 @@
+import unittest
+
+import fakeredis
+
+from csv_shipper.jobs.queue import JOB_KEY, JOB_RESULTS_KEY, JOB_TTL, JobQueue
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = JobQueue(fakeredis.FakeRedis(decode_responses=True))
+
+    def enqueue(self, **kwargs) -> str:
+        return self.queue.enqueue(1, 7, "/tmp/orders.csv", {"name": "Luffy"}, **kwargs)
+
+    def test_enqueue_then_dequeue_in_fifo_order(self):
+        first, second = self.enqueue(), self.enqueue()
+        self.assertEqual(self.queue.dequeue(timeout=1), first)
+        self.assertEqual(self.queue.dequeue(timeout=1), second)
+        self.assertIsNone(self.queue.dequeue(timeout=1))
+
+    def test_new_job_status(self):
+        job_id = self.enqueue(job_id="abc")
+        self.assertEqual(
+            self.queue.status(job_id),
+            {
+                "job_id": "abc",
+                "user_id": 1,
+                "status": "queued",
+                "total": 0,
+                "done": 0,
+                "failed": 0,
+                "skipped": 0,
+                "api_summary": None,
+            },
+        )
+        job = self.queue.get(job_id)
+        self.assertEqual(job["run_id"], "7")
+        self.assertEqual(job["csv_path"], "/tmp/orders.csv")
+        self.assertLessEqual(self.queue.client.ttl(JOB_KEY.format(job_id)), JOB_TTL)
+
+    def test_unknown_job(self):
+        self.assertIsNone(self.queue.get("missing"))
+        self.assertIsNone(self.queue.status("missing"))
+
+    def test_record_counts_and_stores_results(self):
+        job_id = self.enqueue()
+        self.queue.record(
+            job_id,
+            [{"row_number": 1, "label_id": "se-1"}, {"row_number": 2, "errors": ["bad"]}],
+            failed=1,
+        )
+        self.queue.record(job_id, [{"row_number": 3, "label_id": "se-3"}], failed=0)
+
+        self.queue.record(
+            job_id, [{"row_number": 4, "skipped": "already shipped"}], failed=0, skipped=1
+        )
+
+        status = self.queue.status(job_id)
+        self.assertEqual((status["done"], status["failed"], status["skipped"]), (2, 1, 1))
+        self.assertEqual([r["row_number"] for r in self.queue.results(job_id)], [1, 2, 3, 4])
+        self.assertEqual(self.queue.results(job_id, 1, 1), [{"row_number": 2, "errors": ["bad"]}])
+        self.assertGreater(self.queue.client.ttl(JOB_RESULTS_KEY.format(job_id)), 0)
+
+    def test_set_status_and_requeue(self):
+        job_id = self.enqueue()
+        self.assertEqual(self.queue.dequeue(timeout=1), job_id)
+        self.queue.set_status(job_id, "failed", api_summary='[{"endpoint": "POST labels"}]')
+        self.assertEqual(self.queue.status(job_id)["api_summary"], [{"endpoint": "POST labels"}])
+
+        self.queue.record(job_id, [{"row_number": 1, "label_id": "se-1"}], failed=0)
+        self.queue.requeue(job_id)
+        status = self.queue.status(job_id)
+        self.assertEqual((status["status"], status["done"]), ("queued", 0))
+        self.assertEqual(self.queue.results(job_id), [])
+        self.assertEqual(self.queue.dequeue(timeout=1), job_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from pypdf import PdfReader, PdfWriter
+
+from csv_shipper.label_documents import (
+    build_print_files,
+    download_label,
+    download_labels,
+    label_url,
+)
+
+
+def blank_pdf(pages: int = 1) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=288, height=432)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+class LabelHandler(BaseHTTPRequestHandler):
+    """Serves /labels/<id>.pdf and .zpl, /missing and a /truncated body."""
+
+    protocol_version = "HTTP/1.1"
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(self.path)
+        if self.path == "/truncated":
+            self.send_response(200)
+            self.send_header("Content-Length", "1000000")
+            self.end_headers()
+            self.wfile.write(b"^XA" * 100)
+            self.close_connection = True
+            return
+        if not self.path.startswith("/labels/"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        label_id, ext = os.path.basename(self.path).rsplit(".", 1)
+        data = blank_pdf() if ext == "pdf" else f"^XA^FD{label_id}^FS^XZ\n".encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class LabelDocumentsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), LabelHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+        LabelHandler.requests_seen = []
+
+    def label(self, label_id: str) -> dict:
+        href = f"{self.base_url}/labels/{label_id}"
+        return {
+            "label_id": label_id,
+            "label_format": "pdf",
+            "label_download": {
+                "href": f"{href}.pdf",
+                "pdf": f"{href}.pdf",
+                "png": f"{href}.png",
+                "zpl": f"{href}.zpl",
+            },
+        }
+
+    def test_label_url(self):
+        label = self.label("se-1")
+        self.assertTrue(label_url(label, "zpl").endswith("se-1.zpl"))
+
+        href_only = {"label_id": "se-1", "label_format": "pdf", "label_download": {"href": "x.pdf"}}
+        self.assertEqual(label_url(href_only, "pdf"), "x.pdf")
+        with self.assertRaises(ValueError):
+            label_url(href_only, "zpl")
+        with self.assertRaises(ValueError):
+            label_url({"label_id": "se-1"}, "pdf")
+
+    def test_download_is_not_repeated(self):
+        path = os.path.join(self.dir, "se-1.zpl")
+        url = label_url(self.label("se-1"), "zpl")
+        download_label(self.session, url, path)
+        download_label(self.session, url, path)
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"^XA^FDse-1^FS^XZ\n")
+        self.assertEqual(len(LabelHandler.requests_seen), 1)
+
+    def test_failed_download_leaves_no_part_file(self):
+        for url in (f"{self.base_url}/missing", f"{self.base_url}/truncated"):
+            path = os.path.join(self.dir, "label.zpl")
+            with self.assertRaises(requests.RequestException):
+                download_label(self.session, url, path)
+            self.assertEqual(os.listdir(self.dir), [])
+
+    def test_download_labels_keeps_input_order(self):
+        labels = [self.label(f"se-{n}") for n in range(10)]
+        results = list(download_labels(self.session, labels, self.dir, "zpl", max_workers=3))
+
+        self.assertEqual([label["label_id"] for label, _ in results], [f"se-{n}" for n in range(10)])
+        for label, path in results:
+            self.assertEqual(path, os.path.join(self.dir, f"{label['label_id']}.zpl"))
+
+    def test_one_bad_label_does_not_stop_the_others(self):
+        no_zpl = {"label_id": "se-x", "label_format": "pdf", "label_download": {"href": "x.pdf"}}
+        missing = {"label_id": "se-y", "label_download": {"zpl": f"{self.base_url}/missing"}}
+        labels = [self.label("se-0"), no_zpl, missing, self.label("se-1")]
+        results = list(download_labels(self.session, labels, self.dir, "zpl", max_workers=2))
+
+        self.assertEqual([label["label_id"] for label, _ in results], ["se-0", "se-x", "se-y", "se-1"])
+        self.assertIsInstance(results[1][1], ValueError)
+        self.assertIsInstance(results[2][1], requests.HTTPError)
+        self.assertEqual(results[3][1], os.path.join(self.dir, "se-1.zpl"))
+
+    def test_print_files_skip_failed_labels(self):
+        labels = [self.label("se-0"), {"label_id": "se-x"}, self.label("se-1")]
+        failed = []
+        paths = list(
+            build_print_files(
+                self.session,
+                labels,
+                self.dir,
+                "zpl",
+                labels_per_file=2,
+                on_error=lambda label, error: failed.append(label["label_id"]),
+            )
+        )
+
+        self.assertEqual(failed, ["se-x"])
+        self.assertEqual(len(paths), 1)
+        with open(paths[0], "rb") as f:
+            self.assertEqual(f.read(), b"^XA^FDse-0^FS^XZ\n^XA^FDse-1^FS^XZ\n")
+
+    def test_zpl_print_files_are_concatenated(self):
+        labels = [self.label(f"se-{n}") for n in range(5)]
+        paths = list(build_print_files(self.session, labels, self.dir, "zpl", labels_per_file=2))
+
+        self.assertEqual(
+            [os.path.basename(path) for path in paths],
+            ["print_batch_0001.zpl", "print_batch_0002.zpl", "print_batch_0003.zpl"],
+        )
+        with open(paths[0], "rb") as f:
+            self.assertEqual(f.read(), b"^XA^FDse-0^FS^XZ\n^XA^FDse-1^FS^XZ\n")
+        self.assertFalse([name for name in os.listdir(self.dir) if name.endswith(".part")])
+
+    def test_pdf_print_files_are_merged_page_by_page(self):
+        labels = [self.label(f"se-{n}") for n in range(3)]
+        paths = list(build_print_files(self.session, labels, self.dir, "pdf", labels_per_file=2))
+
+        self.assertEqual([len(PdfReader(path).pages) for path in paths], [2, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
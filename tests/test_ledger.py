@@ -0,0 +1,145 @@
+import unittest
+
+from csv_shipper.ledger import COMPLETED, FAILED, IN_FLIGHT, RunLedger
+from csv_shipper.models import LedgerEntry
+from csv_shipper.se_errors import (
+    CircuitOpenError,
+    ShipEngineRateLimitError,
+    ShipEngineRequestError,
+    ShipEngineServerError,
+    ShipEngineTimeoutError,
+)
+
+from support import DatabaseTestCase, make_order
+
+
+def statuses():
+    return {entry.row_number: entry.status for entry in LedgerEntry.query.all()}
+
+
+class RunLedgerClaimTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.run = self.make_run(self.user)
+        self.ledger = RunLedger(self.run.id, self.user.id)
+
+    def test_claims_new_rows_once(self):
+        orders = [make_order(1, "Ann"), make_order(2, "Bob")]
+        self.assertEqual(self.ledger.claim(orders), orders)
+        self.assertEqual(statuses(), {1: IN_FLIGHT, 2: IN_FLIGHT})
+
+        # Still in flight, e.g. the previous attempt died mid-batch.
+        again = RunLedger(self.run.id, self.user.id)
+        self.assertEqual(again.claim([make_order(1, "Ann"), make_order(2, "Bob")]), [])
+        self.assertEqual([e.row_number for e in again.unresolved()], [1, 2])
+
+    def test_duplicate_rows_in_one_batch_are_claimed_once(self):
+        first, duplicate = make_order(1, "Ann", "A-1"), make_order(2, "Ann", "A-1")
+        other = make_order(3, "Bob", "B-1")
+        self.assertEqual(self.ledger.claim([first, duplicate, other]), [first, other])
+        self.assertEqual(LedgerEntry.query.count(), 2)
+
+    def test_repeat_orders_without_an_order_id_are_all_claimed(self):
+        orders = [make_order(1, "Ann"), make_order(2, "Ann")]
+        self.assertEqual(self.ledger.claim(orders), orders)
+
+        # The next upload with the same customer and box ships again.
+        later = RunLedger(self.make_run(self.user).id, self.user.id)
+        self.assertEqual(len(later.claim([make_order(1, "Ann")])), 1)
+
+        # A restart of the same run does not.
+        restart = RunLedger(self.run.id, self.user.id)
+        self.assertEqual(restart.claim([make_order(1, "Ann"), make_order(2, "Ann")]), [])
+
+    def test_completed_rows_are_never_claimed_again(self):
+        order = make_order(1, "Ann", "A-1")
+        self.ledger.claim([order])
+        self.ledger.record(order, {"label_id": "se-1"})
+        self.ledger.flush()
+        self.assertEqual(statuses(), {1: COMPLETED})
+
+        # Another shard, or a concurrent run of the same user.
+        other_run = self.make_run(self.user)
+        other = RunLedger(other_run.id, self.user.id)
+        self.assertEqual(other.claim([make_order(5, "Ann", "A-1")]), [])
+        entry = LedgerEntry.query.one()
+        self.assertEqual((entry.run_id, entry.status, entry.label_id), (self.run.id, COMPLETED, "se-1"))
+
+    def test_failed_rows_are_claimed_by_the_next_attempt(self):
+        order = make_order(1, "Ann", "A-1")
+        self.ledger.claim([order])
+        error = ShipEngineRequestError("Invalid address", method="POST", endpoint="labels", status_code=400)
+        self.ledger.record(order, error)
+        self.ledger.flush()
+        self.assertEqual(statuses(), {1: FAILED})
+
+        retry_run = self.make_run(self.user)
+        retry = RunLedger(retry_run.id, self.user.id)
+        self.assertEqual([o.row_number for o in retry.claim([make_order(1, "Ann", "A-1")])], [1])
+        entry = LedgerEntry.query.one()
+        self.assertEqual((entry.run_id, entry.status, entry.error), (retry_run.id, IN_FLIGHT, None))
+
+    def test_possibly_bought_labels_stay_in_flight(self):
+        outcomes = {
+            1: ShipEngineServerError("Bad gateway", method="POST", endpoint="labels", status_code=502),
+            2: ShipEngineTimeoutError("Read timed out", method="POST", endpoint="labels"),
+            3: ShipEngineRateLimitError("Slow down", method="POST", endpoint="labels", status_code=429),
+            4: CircuitOpenError("Circuit open", method="POST", endpoint="labels"),
+            5: ShipEngineRequestError("Invalid", method="POST", endpoint="labels", status_code=400),
+        }
+        orders = {n: make_order(n, f"Customer {n}") for n in outcomes}
+        self.ledger.claim(list(orders.values()))
+        for n, error in outcomes.items():
+            self.ledger.record(orders[n], error)
+        self.ledger.flush()
+
+        self.assertEqual(
+            statuses(), {1: IN_FLIGHT, 2: IN_FLIGHT, 3: FAILED, 4: FAILED, 5: FAILED}
+        )
+        unresolved = self.ledger.unresolved()
+        self.assertEqual([entry.row_number for entry in unresolved], [1, 2])
+        self.assertIn("Bad gateway", unresolved[0].error)
+
+        # Nothing that might have been bought is claimed by a restart.
+        retry = RunLedger(self.run.id, self.user.id)
+        claimed = retry.claim([make_order(n, f"Customer {n}") for n in outcomes])
+        self.assertEqual([order.row_number for order in claimed], [3, 4, 5])
+
+    def test_skipped_rows_are_reported_with_a_reason(self):
+        shipped, in_flight = make_order(1, "Ann", "A-1"), make_order(2, "Bob", "B-1")
+        self.ledger.claim([shipped, in_flight])
+        self.ledger.record(shipped, {"label_id": "se-1"})
+        self.ledger.flush()
+
+        skipped = {}
+        restart = RunLedger(self.run.id, self.user.id)
+        batch = [
+            make_order(1, "Ann", "A-1"),
+            make_order(2, "Bob", "B-1"),
+            make_order(3, "Cy", "C-1"),
+            make_order(4, "Cy", "C-1"),
+        ]
+        claimed = restart.claim(
+            batch, on_skip=lambda order, reason: skipped.setdefault(order.row_number, reason)
+        )
+
+        self.assertEqual([order.row_number for order in claimed], [3])
+        self.assertEqual(
+            skipped,
+            {
+                1: "already shipped",
+                2: "in flight in another attempt, check it against ShipEngine",
+                4: "duplicate of row 3",
+            },
+        )
+
+    def test_users_do_not_share_keys(self):
+        other_user = self.make_user(2)
+        other = RunLedger(self.make_run(other_user).id, other_user.id)
+        self.ledger.claim([make_order(1, "Ann", "A-1")])
+        self.assertEqual(len(other.claim([make_order(1, "Ann", "A-1")])), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import dataclasses
+import unittest
+from unittest import mock
+
+from csv_shipper.models import Package, PackageWeight, RateOptions, ShipFromAddress
+from csv_shipper.rate_cache import MemoryRateCache, is_cacheable, rate_cache_key
+from csv_shipper.se_client import ShipEngine
+
+from support import make_order
+
+SHIP_FROM = ShipFromAddress(
+    name="Monkey D. Luffy",
+    phone="1-654-987-3124",
+    company_name="The Grand Line",
+    address_line1="3800 N Lamar Blvd",
+    address_line2=None,
+    address_line3=None,
+    city_locality="Austin",
+    state_province="TX",
+    postal_code="78756",
+    country_code="US",
+    address_residential_indicator="no",
+)
+RATE_OPT = RateOptions(
+    carrier_ids=["se-28529731"],
+    package_types=[],
+    service_codes=[],
+    calculate_tax_amount=False,
+    preferred_currency="usd",
+)
+
+
+def quote(status="completed", rates=({"rate_id": "se-r1", "shipping_amount": {"amount": 9.5}},), errors=()):
+    return {"rate_response": {"status": status, "errors": list(errors), "rates": list(rates)}}
+
+
+def key(order, ship_from=SHIP_FROM, rate_opt=RATE_OPT):
+    return rate_cache_key(ship_from, order.ship_to, order.packages, rate_opt)
+
+
+class MemoryRateCacheTest(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = MemoryRateCache(maxsize=2)
+        cache.set("a", {"n": 1})
+        cache.set("b", {"n": 2})
+        cache.get("a")
+        cache.set("c", {"n": 3})
+
+        self.assertEqual(cache.get("a"), {"n": 1})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), {"n": 3})
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = MemoryRateCache(ttl=60)
+        with mock.patch("csv_shipper.rate_cache.time.monotonic", return_value=1000.0):
+            cache.set("a", {"n": 1})
+        with mock.patch("csv_shipper.rate_cache.time.monotonic", return_value=1060.0):
+            self.assertEqual(cache.get("a"), {"n": 1})
+        with mock.patch("csv_shipper.rate_cache.time.monotonic", return_value=1060.5):
+            self.assertIsNone(cache.get("a"))
+
+
+class RateCacheKeyTest(unittest.TestCase):
+    def test_recipient_name_street_and_zip4_do_not_change_the_key(self):
+        ann = make_order(1, "Ann", address_line1="4009 Marathon Blvd", postal_code="78756-1234")
+        bob = make_order(2, "Bob", address_line1="999 Other St", postal_code=" 78756 ")
+        self.assertEqual(key(ann), key(bob))
+
+    def test_price_relevant_fields_change_the_key(self):
+        order = make_order(1)
+        heavier = make_order(1)
+        heavier.packages = [Package(weight=PackageWeight(value=3.5, unit="pound"), dimensions=None)]
+        others = [
+            make_order(1, postal_code="10001"),
+            make_order(1, address_residential_indicator="yes"),
+            make_order(1, country_code="CA"),
+            heavier,
+        ]
+        self.assertEqual(len({key(order), *(key(other) for other in others)}), 1 + len(others))
+        self.assertNotEqual(key(order), key(order, rate_opt=dataclasses.replace(RATE_OPT, calculate_tax_amount=True)))
+
+
+class CachedQuotesTest(unittest.TestCase):
+    def test_only_complete_quotes_with_rates_are_cacheable(self):
+        self.assertTrue(is_cacheable(quote()))
+        self.assertFalse(is_cacheable(quote(rates=())))
+        self.assertFalse(is_cacheable(quote(status="partial")))
+        self.assertFalse(is_cacheable(quote(status="error", rates=(), errors=[{"message": "Bad"}])))
+        self.assertFalse(is_cacheable({}))
+
+    def test_failed_quote_is_not_cached(self):
+        responses = [quote(status="error", rates=(), errors=[{"message": "Bad"}]), quote()]
+        se = ShipEngine(api_key="TEST", rate_cache=MemoryRateCache())
+        order = make_order(1)
+        with mock.patch.object(ShipEngine, "post", side_effect=lambda *args, **kwargs: responses.pop(0)) as post:
+            for _ in range(3):
+                se.get_rates_for_shipment(order.ship_to, SHIP_FROM, order.packages, RATE_OPT)
+
+        self.assertEqual(post.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+from csv_shipper.concurrency import ShipEngineExecutor, TokenBucket
+from csv_shipper.models import RateOptions, ShipFromAddress
+from csv_shipper.rate_cache import MemoryRateCache
+from csv_shipper.rate_shopping import RateShopper
+from csv_shipper.se_client import ShipEngine
+from csv_shipper.simulator import SimulatorConfig, start_simulator
+
+from support import make_order
+
+
+class RecordingShipEngine(ShipEngine):
+    """Remembers which recipient every quoted rate_id was quoted for."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.quoted_for = {}
+        self.rate_calls = 0
+
+    def post(self, endpoint, *args, **kwargs):
+        resp = super().post(endpoint, *args, **kwargs)
+        if endpoint == "rates":
+            self.rate_calls += 1
+            name = kwargs["json"]["shipment"]["ship_to"]["name"]
+            for rate in resp["rate_response"]["rates"]:
+                self.quoted_for[rate["rate_id"]] = name
+        return resp
+
+
+class RateShopperCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_simulator(
+            SimulatorConfig(
+                latency_ms=0, latency_jitter_ms=0, error_rate=0, throttle_rate=0, rate_limit=0
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.se = RecordingShipEngine(api_key="TEST_simulator", rate_cache=MemoryRateCache())
+        self.se._BASE_URL = f"http://127.0.0.1:{self.server.server_port}/v1/"
+        self.shopper = RateShopper(
+            self.se,
+            executor=ShipEngineExecutor(max_workers=1, rate_limiter=TokenBucket(rate=1e6)),
+            batch_size=1,
+        )
+        self.ship_from = ShipFromAddress(
+            name="Monkey D. Luffy",
+            phone="1-654-987-3124",
+            company_name="The Grand Line",
+            address_line1="3800 N Lamar Blvd",
+            address_line2=None,
+            address_line3=None,
+            city_locality="Austin",
+            state_province="TX",
+            postal_code="78756",
+            country_code="US",
+            address_residential_indicator="no",
+        )
+        self.rate_opt = RateOptions(
+            carrier_ids=["se-28529731"],
+            package_types=[],
+            service_codes=[],
+            calculate_tax_amount=False,
+            preferred_currency="usd",
+        )
+
+    def test_cached_quote_is_never_bought_for_another_order(self):
+        # Same postal code and package, so the second quote is a cache hit.
+        orders = [
+            make_order(1, "Ann", address_line1="4009 Marathon Blvd"),
+            make_order(2, "Bob", address_line1="999 Other St"),
+        ]
+        results = list(self.shopper.shop(self.ship_from, orders, self.rate_opt))
+
+        bought = [rate["rate_id"] for _, rate, _ in results]
+        self.assertEqual(len(set(bought)), 2)
+        for order, rate, label in results:
+            self.assertEqual(self.se.quoted_for[rate["rate_id"]], order.ship_to.name)
+            self.assertEqual(label["rate_id"], rate["rate_id"])
+        # One quote per order: the cache hit still saved Bob's carrier fan-out.
+        self.assertEqual(self.se.rate_calls, 2)
+
+    def test_cache_holds_no_ids_or_addresses(self):
+        order = make_order(1, "Ann")
+        self.se.get_rates_for_shipment(order.ship_to, self.ship_from, order.packages, self.rate_opt)
+        cached = self.se.get_rates_for_shipment(
+            order.ship_to, self.ship_from, order.packages, self.rate_opt
+        )
+        self.assertNotIn("shipment_id", cached)
+        self.assertNotIn("ship_to", cached)
+        for rate in cached["rate_response"]["rates"]:
+            self.assertNotIn("rate_id", rate)
+            self.assertNotIn("shipment_id", rate)
+            self.assertIn("shipping_amount", rate)
+
+
+if __name__ == "__main__":
+    unittest.main()
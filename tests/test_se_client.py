@@ -0,0 +1,140 @@
+import asyncio
+import time
+import unittest
+
+import httpx
+import requests
+
+from csv_shipper.se_async_client import AsyncShipEngine
+from csv_shipper.se_client import ShipEngine
+from csv_shipper.se_errors import ShipEngineResponseError, ShipEngineServerError
+from csv_shipper.se_metrics import ApiMetrics
+from csv_shipper.se_retry import CircuitBreaker, RetryMetrics
+
+from support import make_order
+
+
+def open_breaker(method="DELETE", endpoint="labels/se-1"):
+    """A breaker whose trial call for `endpoint` is due."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01, metrics=RetryMetrics())
+    breaker.failure(
+        ShipEngineServerError("Bad gateway", method=method, endpoint=endpoint, status_code=502)
+    )
+    time.sleep(0.02)
+    return breaker
+
+
+class FakeSession:
+    """Answers every request with `status` and `content`, or raises `error`."""
+
+    def __init__(self, status=200, content=b"{}", error=None):
+        self.status = status
+        self.content = content
+        self.error = error
+
+    def request(self, method, url, *args, **kwargs):
+        if self.error is not None:
+            raise self.error
+        resp = requests.Response()
+        resp.status_code = self.status
+        resp._content = self.content
+        resp.request = requests.Request(method, url).prepare()
+        return resp
+
+
+class ShipEngineResponseTest(unittest.TestCase):
+    def client(self, breaker=None, **session):
+        se = ShipEngine(api_key="TEST", breaker=breaker, metrics=ApiMetrics())
+        se.session = FakeSession(**session)
+        return se
+
+    def test_empty_body_is_an_empty_dict(self):
+        self.assertEqual(self.client(status=204, content=b"").delete("labels/se-1"), {})
+
+    def test_json_body(self):
+        self.assertEqual(self.client(content=b'{"label_id": "se-1"}').get("labels/se-1"), {"label_id": "se-1"})
+
+    def test_body_that_is_not_json_raises_a_typed_error(self):
+        with self.assertRaises(ShipEngineResponseError) as cm:
+            self.client(content=b"<html>maintenance</html>").delete("labels/se-1")
+        self.assertEqual(cm.exception.status_code, 200)
+        self.assertTrue(cm.exception.request_sent)
+        self.assertFalse(cm.exception.retryable)
+
+    def test_trial_with_a_bad_body_closes_the_breaker(self):
+        breaker = open_breaker()
+        with self.assertRaises(ShipEngineResponseError):
+            self.client(breaker, content=b"not json").delete("labels/se-1")
+        self.assertFalse(breaker.before("DELETE", "labels/se-1"))
+
+    def test_trial_that_raises_something_else_frees_the_trial_slot(self):
+        breaker = open_breaker()
+        with self.assertRaises(RuntimeError):
+            self.client(breaker, error=RuntimeError("boom")).delete("labels/se-1")
+        # Still open, but the next call is let through as the trial again.
+        self.assertTrue(breaker.before("DELETE", "labels/se-1"))
+
+
+class SplitShipmentResultsTest(unittest.TestCase):
+    def split(self, orders, shipments):
+        return list(ShipEngine._split_shipment_results(orders, {"shipments": shipments}))
+
+    def test_shipments_are_matched_by_position(self):
+        orders = [make_order(1), make_order(2)]
+        results = self.split(orders, [{"shipment_id": "se-1"}, {"shipment_id": "se-2", "errors": [{"message": "Bad"}]}])
+
+        self.assertEqual(
+            [(order.row_number, shipment["shipment_id"], errors) for order, shipment, errors in results],
+            [(1, "se-1", []), (2, "se-2", ["Bad"])],
+        )
+
+    def test_missing_shipments_fail_their_orders(self):
+        orders = [make_order(1, external_order_id="A"), make_order(2, external_order_id="B"), make_order(3)]
+        results = self.split(orders, [{"shipment_id": "se-2", "external_order_id": "B"}])
+
+        self.assertEqual([order.row_number for order, _, _ in results], [1, 2, 3])
+        self.assertEqual(results[1][1]["shipment_id"], "se-2")
+        for _, shipment, errors in (results[0], results[2]):
+            self.assertIsNone(shipment)
+            self.assertIn("1 shipments for 3 orders", errors[0])
+
+    def test_reordered_shipments_are_matched_by_external_order_id(self):
+        orders = [make_order(1, external_order_id="A"), make_order(2, external_order_id="B")]
+        results = self.split(
+            orders,
+            [{"shipment_id": "se-b", "external_order_id": "B"}, {"shipment_id": "se-a", "external_order_id": "A"}],
+        )
+
+        self.assertEqual([shipment["shipment_id"] for _, shipment, _ in results], ["se-a", "se-b"])
+
+
+class AsyncShipEngineResponseTest(unittest.TestCase):
+    def request(self, handler, breaker=None):
+        async def run():
+            client = httpx.AsyncClient(base_url="http://shipengine.test/v1/", transport=httpx.MockTransport(handler))
+            async with AsyncShipEngine(api_key="TEST", client=client, breaker=breaker, metrics=ApiMetrics()) as se:
+                return await se.delete("labels/se-1")
+
+        return asyncio.run(run())
+
+    def test_empty_body_is_an_empty_dict(self):
+        self.assertEqual(self.request(lambda request: httpx.Response(204)), {})
+
+    def test_body_that_is_not_json_raises_a_typed_error(self):
+        breaker = open_breaker()
+        with self.assertRaises(ShipEngineResponseError):
+            self.request(lambda request: httpx.Response(200, content=b"not json"), breaker)
+        self.assertFalse(breaker.before("DELETE", "labels/se-1"))
+
+    def test_trial_that_raises_something_else_frees_the_trial_slot(self):
+        def handler(request):
+            raise RuntimeError("boom")
+
+        breaker = open_breaker()
+        with self.assertRaises(RuntimeError):
+            self.request(handler, breaker)
+        self.assertTrue(breaker.before("DELETE", "labels/se-1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from unittest import mock
+
+import fakeredis
+from flask_login import FlaskLoginClient
+
+from csv_shipper import login_manager
+from csv_shipper.se_metrics import (
+    METRICS_KEY,
+    ApiMetrics,
+    collect,
+    publish,
+    publish_local,
+    render_prometheus,
+    totals,
+)
+
+from support import DatabaseTestCase
+
+
+class TotalsTest(unittest.TestCase):
+    def setUp(self):
+        self.client = fakeredis.FakeRedis(decode_responses=True)
+
+    def calls(self, metrics: ApiMetrics, n: int, status: str = "200"):
+        for _ in range(n):
+            metrics.start("POST labels")
+            metrics.finish("POST labels", status, 0.2, bytes_out=10, bytes_in=100)
+
+    def test_repeated_publishes_add_only_what_is_new(self):
+        metrics = ApiMetrics()
+        published = None
+        for _ in range(3):
+            self.calls(metrics, 2)
+            metrics.incr("retry", "POST labels", "502")
+            snapshot = metrics.snapshot()
+            publish(self.client, "job:0", snapshot, previous=published)
+            published = snapshot
+
+        stats = totals(self.client)["endpoints"]["POST labels"]
+        self.assertEqual(stats["status"], {"200": 6})
+        self.assertEqual(stats["count"], 6)
+        self.assertEqual(stats["bytes_in"], 600)
+        self.assertEqual(stats["buckets"][2], 6)
+        self.assertAlmostEqual(stats["sum"], 1.2)
+        self.assertEqual(totals(self.client)["events"], [["retry", "POST labels", "502", 3]])
+
+    def test_totals_outlive_the_job_snapshots(self):
+        for job in ("a:0", "b:0"):
+            metrics = ApiMetrics()
+            self.calls(metrics, 2, status="400")
+            publish(self.client, job, metrics.snapshot())
+        self.client.delete(METRICS_KEY.format("a:0"), METRICS_KEY.format("b:0"))
+
+        self.assertEqual(collect(self.client, ["a:0", "b:0"]), [])
+        self.assertEqual(totals(self.client)["endpoints"]["POST labels"]["status"], {"400": 4})
+
+    def test_local_calls_are_added_once(self):
+        metrics = ApiMetrics()
+        self.calls(metrics, 2)
+        with mock.patch("csv_shipper.se_metrics.api_metrics", metrics):
+            publish_local(self.client)
+            publish_local(self.client)
+            self.calls(metrics, 1)
+            publish_local(self.client)
+
+        self.assertEqual(totals(self.client)["endpoints"]["POST labels"]["count"], 3)
+        self.assertIn(
+            'shipengine_requests_total{endpoint="POST labels",status="200"} 3',
+            render_prometheus(totals(self.client)),
+        )
+
+
+class MetricsViewTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app.test_client_class = FlaskLoginClient
+        self.addCleanup(setattr, self.app, "test_client_class", None)
+        self.addCleanup(
+            setattr, login_manager, "session_protection", login_manager.session_protection
+        )
+        login_manager.session_protection = None
+
+    def test_login_is_required(self):
+        resp = self.app.test_client().get("/metrics")
+        self.assertEqual(resp.status_code, 302)
+
+    def test_renders_the_totals(self):
+        client = fakeredis.FakeRedis(decode_responses=True)
+        metrics = ApiMetrics()
+        metrics.start("GET labels/{id}/track")
+        metrics.finish("GET labels/{id}/track", "200", 0.1)
+        publish(client, "job:0", metrics.snapshot())
+
+        with mock.patch("csv_shipper.main.routes.get_redis", return_value=client):
+            with self.app.app_context():
+                resp = self.app.test_client(user=self.make_user(1)).get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(
+            'shipengine_requests_total{endpoint="GET labels/{id}/track",status="200"} 1',
+            resp.get_data(as_text=True),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
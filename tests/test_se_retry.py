@@ -0,0 +1,138 @@
+import time
+import unittest
+
+from csv_shipper.se_errors import (
+    CircuitOpenError,
+    ShipEngineConnectionError,
+    ShipEngineRateLimitError,
+    ShipEngineRequestError,
+    ShipEngineServerError,
+)
+from csv_shipper.se_retry import CircuitBreaker, RetryMetrics, RetryPolicy, endpoint_key
+
+
+def server_error(method="POST", endpoint="labels"):
+    return ShipEngineServerError("Bad gateway", method=method, endpoint=endpoint, status_code=502)
+
+
+class EndpointKeyTest(unittest.TestCase):
+    def test_ids_are_grouped(self):
+        self.assertEqual(endpoint_key("GET", "labels/se-123/track"), "GET labels/{id}/track")
+        self.assertEqual(endpoint_key("GET", "/batches/42/"), "GET batches/{id}")
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = RetryMetrics()
+        self.policy = RetryPolicy(max_retries=3, base_delay=0, max_delay=0, metrics=self.metrics)
+
+    def test_only_retryable_errors_are_retried(self):
+        self.assertTrue(self.policy.should_retry(server_error("GET"), 0))
+        self.assertFalse(self.policy.should_retry(server_error("GET"), 3))
+        self.assertFalse(
+            self.policy.should_retry(
+                ShipEngineRequestError("Invalid", method="GET", endpoint="labels", status_code=400), 0
+            )
+        )
+
+    def test_sent_posts_are_never_repeated(self):
+        self.assertFalse(self.policy.should_retry(server_error("POST"), 0))
+        self.assertFalse(
+            self.policy.should_retry(ShipEngineConnectionError("Reset", method="POST", sent=True), 0)
+        )
+        self.assertTrue(
+            self.policy.should_retry(ShipEngineConnectionError("Refused", method="POST", sent=False), 0)
+        )
+        self.assertTrue(
+            self.policy.should_retry(ShipEngineRateLimitError("Slow down", method="POST"), 0)
+        )
+
+    def test_delay(self):
+        policy = RetryPolicy(base_delay=1, max_delay=4)
+        self.assertEqual(policy.delay(ShipEngineRateLimitError("Slow down", retry_after=7), 0), 7)
+        for attempt in range(6):
+            self.assertLessEqual(policy.delay(server_error(), attempt), min(4, 2 ** attempt))
+
+    def test_call_retries_until_success_and_counts(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise server_error("GET", "labels/se-1")
+            return "ok"
+
+        self.assertEqual(self.policy.call(flaky), "ok")
+        self.assertEqual(self.metrics.snapshot(), {("retry", "GET labels/{id}", "502"): 2})
+
+    def test_call_gives_up(self):
+        def broken():
+            raise server_error("GET")
+
+        with self.assertRaises(ShipEngineServerError):
+            self.policy.call(broken)
+        self.assertEqual(self.metrics.snapshot()[("give_up", "GET labels", "502")], 1)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05, metrics=RetryMetrics())
+
+    def open(self):
+        for _ in range(2):
+            self.breaker.before("POST", "labels")
+            self.breaker.failure(server_error())
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before("POST", "labels")
+        time.sleep(0.06)
+
+    def test_opens_after_consecutive_failures_only(self):
+        self.breaker.failure(server_error())
+        self.breaker.success("POST", "labels")
+        self.breaker.failure(server_error())
+        self.breaker.before("POST", "labels")
+        self.breaker.success("POST", "labels")
+        self.open()
+
+    def test_other_endpoints_stay_closed(self):
+        self.open()
+        self.breaker.before("POST", "rates")
+
+    def test_one_trial_call_after_the_reset_timeout(self):
+        self.open()
+        self.breaker.before("POST", "labels")
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before("POST", "labels")
+
+        self.breaker.success("POST", "labels")
+        self.breaker.before("POST", "labels")
+        self.breaker.before("POST", "labels")
+
+    def test_failed_trial_reopens(self):
+        self.open()
+        self.breaker.before("POST", "labels")
+        self.breaker.failure(server_error())
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before("POST", "labels")
+
+    def test_4xx_and_429_trials_close_the_breaker(self):
+        for error in (
+            ShipEngineRequestError("Invalid", method="POST", endpoint="labels", status_code=400),
+            ShipEngineRateLimitError("Slow down", method="POST", endpoint="labels", status_code=429),
+        ):
+            self.open()
+            self.breaker.before("POST", "labels")
+            self.breaker.failure(error)
+            self.breaker.before("POST", "labels")
+            self.breaker.before("POST", "labels")
+
+    def test_non_retryable_trial_frees_the_trial_slot(self):
+        self.open()
+        self.breaker.before("POST", "labels")
+        # e.g. a response that could not be decoded
+        self.breaker.failure(ShipEngineRequestError("Undecodable", method="POST", endpoint="labels"))
+        self.breaker.before("POST", "labels")
+
+
+if __name__ == "__main__":
+    unittest.main()
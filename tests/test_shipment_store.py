@@ -0,0 +1,156 @@
+import unittest
+from unittest import mock
+
+from csv_shipper import db_session
+from csv_shipper.models import LabelRecord, PackageRecord, RateRecord, ShipmentRecord
+from csv_shipper.se_errors import ShipEngineRequestError
+from csv_shipper.shipment_store import ShipmentStore, copy_rows
+
+from support import DatabaseTestCase, make_order
+
+
+def label(n: int) -> dict:
+    return {
+        "label_id": f"se-label-{n}",
+        "shipment_id": f"se-ship-{n}",
+        "status": "completed",
+        "tracking_number": f"1Z{n:08d}",
+        "carrier_code": "ups",
+        "service_code": "ups_ground",
+        "shipment_cost": {"currency": "usd", "amount": 9.5},
+        "label_download": {"href": f"https://example.com/{n}.pdf"},
+        "packages": [{"weight": {"value": 2.5, "unit": "pound"}, "tracking_number": f"1Z{n:08d}"}],
+    }
+
+
+def rate(rate_id: str) -> dict:
+    return {
+        "rate_id": rate_id,
+        "shipment_id": "se-ship-1",
+        "carrier_id": "se-1",
+        "service_code": "ups_ground",
+        "shipping_amount": {"currency": "usd", "amount": 9.5},
+        "delivery_days": 3,
+    }
+
+
+class ShipmentStoreTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        user = self.make_user()
+        self.store = ShipmentStore(self.make_run(user).id, user.id)
+
+    def count(self, model) -> int:
+        return db_session.query(model).count()
+
+    def test_flush_writes_every_table(self):
+        self.store.add_label(make_order(1), label(1))
+        self.store.add_label(
+            make_order(2), ShipEngineRequestError("Invalid address", method="POST", endpoint="labels")
+        )
+        self.store.add_rates([rate("se-rate-1"), rate("se-rate-2")])
+        self.store.flush()
+
+        self.assertEqual(self.count(ShipmentRecord), 2)
+        self.assertEqual(self.count(PackageRecord), 1)
+        self.assertEqual(self.count(LabelRecord), 1)
+        self.assertEqual(self.count(RateRecord), 2)
+        failed = db_session.query(ShipmentRecord).filter_by(status="failed").one()
+        self.assertIsNone(failed.shipment_id)
+        self.assertIn("Invalid address", failed.error)
+
+    def test_duplicate_ids_are_skipped_not_fatal(self):
+        self.store.add_label(make_order(1), label(1))
+        self.store.add_rates([rate("se-rate-1"), rate("se-rate-1")])
+        self.store.flush()
+        self.store.add_label(make_order(1), label(1))
+        self.store.add_rates([rate("se-rate-1"), rate("se-rate-2")])
+        self.store.flush()
+
+        self.assertEqual(self.count(ShipmentRecord), 1)
+        self.assertEqual(self.count(LabelRecord), 1)
+        self.assertEqual(
+            sorted(rate_id for rate_id, in db_session.query(RateRecord.rate_id)),
+            ["se-rate-1", "se-rate-2"],
+        )
+
+    def test_flushes_every_flush_every_shipments(self):
+        store = ShipmentStore(self.store.run_id, self.store.user_id, flush_every=2)
+        for n in range(5):
+            store.add_label(make_order(n), label(n))
+        self.assertEqual(self.count(ShipmentRecord), 4)
+        store.flush()
+        self.assertEqual(self.count(ShipmentRecord), 5)
+
+
+class FakeCursor:
+    def __init__(self):
+        self.statements = []
+        self.copied = None
+
+    def execute(self, sql):
+        self.statements.append(sql)
+
+    def copy_expert(self, sql, buffer):
+        self.statements.append(sql)
+        self.copied = buffer.read()
+
+    def close(self):
+        pass
+
+
+class CopyRowsTest(unittest.TestCase):
+    """The psycopg2 COPY path, against a recording cursor."""
+
+    def copy(self, table, rows, **kwargs) -> FakeCursor:
+        cursor = FakeCursor()
+        connection = mock.Mock()
+        connection.dialect.name, connection.dialect.driver = "postgresql", "psycopg2"
+        connection.connection.cursor.return_value = cursor
+        with mock.patch("csv_shipper.shipment_store.db_session") as session:
+            session.connection.return_value = connection
+            copy_rows(table, rows, **kwargs)
+        return cursor
+
+    def test_rows_are_copied_as_csv(self):
+        rows = [
+            {"run_id": 1, "row_number": 1, "ship_to": {"name": "Ann"}, "error": None},
+            {"row_number": 2, "run_id": 1, "ship_to": {"name": "Bob, Jr."}, "error": "Bad"},
+        ]
+        cursor = self.copy(ShipmentRecord.__table__, rows)
+
+        self.assertEqual(
+            cursor.statements,
+            [
+                "COPY shipments (run_id, row_number, ship_to, error) "
+                "FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+            ],
+        )
+        self.assertEqual(
+            cursor.copied.splitlines(),
+            ['1,1,"{""name"":""Ann""}",\\N', '1,2,"{""name"":""Bob, Jr.""}",Bad'],
+        )
+
+    def test_conflicts_go_through_a_temporary_table(self):
+        cursor = self.copy(
+            RateRecord.__table__, [{"rate_id": "se-rate-1", "user_id": 1}], conflict_column="rate_id"
+        )
+
+        self.assertEqual(
+            cursor.statements,
+            [
+                "CREATE TEMP TABLE _copy_shipment_rates AS "
+                "SELECT rate_id, user_id FROM shipment_rates WITH NO DATA",
+                "COPY _copy_shipment_rates (rate_id, user_id) "
+                "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                "INSERT INTO shipment_rates (rate_id, user_id) "
+                "SELECT rate_id, user_id FROM _copy_shipment_rates "
+                "ON CONFLICT (rate_id) DO NOTHING",
+                "DROP TABLE _copy_shipment_rates",
+            ],
+        )
+        self.assertEqual(cursor.copied, "se-rate-1,1\r\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
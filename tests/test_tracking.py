@@ -0,0 +1,135 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from csv_shipper import db_session
+from csv_shipper.concurrency import ShipEngineExecutor, TokenBucket
+from csv_shipper.models import TrackedLabel
+from csv_shipper.se_errors import ShipEngineRequestError
+from csv_shipper.tracking import (
+    TrackingRefresher,
+    handle_webhook_events,
+    status_summary,
+    track_labels,
+)
+
+from support import DatabaseTestCase
+
+
+def label(n: int) -> dict:
+    return {"label_id": f"se-{n}", "tracking_number": f"1Z{n:04d}", "carrier_code": "ups"}
+
+
+def track_event(tracking_number: str, status_code: str, **data) -> dict:
+    data = dict(tracking_number=tracking_number, status_code=status_code, **data)
+    return {"resource_type": "API_TRACK", "payload": {"data": data}}
+
+
+class FakeShipEngine:
+    """Answers track_label with `statuses[label_id]`, or a 404 when missing."""
+
+    def __init__(self, statuses: dict):
+        self.statuses = statuses
+        self.tracked = []
+
+    def track_label(self, label_id: str):
+        self.tracked.append(label_id)
+        if label_id not in self.statuses:
+            raise ShipEngineRequestError(
+                "Label not found", method="GET", endpoint=f"labels/{label_id}/track", status_code=404
+            )
+        return {"status_code": self.statuses[label_id], "status_description": "Status"}
+
+
+class TrackingTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_id = self.make_user(1).id
+
+    def tracked(self, label_id: str) -> TrackedLabel:
+        return TrackedLabel.query.filter_by(label_id=label_id).one()
+
+    def test_track_labels_inserts_each_label_once(self):
+        track_labels(self.user_id, [label(1), label(2), {"tracking_number": "no label id"}])
+        track_labels(self.user_id, [label(2), label(3)])
+
+        self.assertEqual(
+            sorted(label_id for label_id, in db_session.query(TrackedLabel.label_id)),
+            ["se-1", "se-2", "se-3"],
+        )
+        tracked = self.tracked("se-1")
+        self.assertEqual((tracked.status_code, tracked.is_terminal), ("UN", False))
+        self.assertEqual(tracked.tracking_number, "1Z0001")
+
+    def test_webhook_events_update_labels_by_tracking_number(self):
+        track_labels(self.user_id, [label(1), label(2)])
+        handle_webhook_events(
+            [
+                track_event("1Z0001", "DE", status_description="Delivered"),
+                track_event("1Z0002", "IT", estimated_delivery_date="2026-10-20T12:00:00Z"),
+                {"resource_type": "ITEM_ORDERS_IMPORTED", "payload": {}},
+            ]
+        )
+
+        delivered, in_transit = self.tracked("se-1"), self.tracked("se-2")
+        self.assertEqual((delivered.status_code, delivered.is_terminal), ("DE", True))
+        self.assertEqual(delivered.status_description, "Delivered")
+        self.assertIsNotNone(delivered.last_checked_at)
+        self.assertEqual((in_transit.status_code, in_transit.is_terminal), ("IT", False))
+        self.assertEqual(in_transit.estimated_delivery_at.day, 20)
+
+    def test_status_summary_counts_only_the_users_labels(self):
+        other_user_id = self.make_user(2).id
+        track_labels(self.user_id, [label(1), label(2), label(3)])
+        track_labels(other_user_id, [label(4)])
+        handle_webhook_events([track_event("1Z0001", "DE")])
+
+        self.assertEqual(status_summary(self.user_id), {"DE": 1, "UN": 2})
+        self.assertEqual(status_summary(other_user_id), {"UN": 1})
+
+
+class TrackingRefresherTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_id = self.make_user(1).id
+        track_labels(self.user_id, [label(n) for n in range(1, 5)])
+        handle_webhook_events([track_event("1Z0001", "DE"), track_event("1Z0002", "EX")])
+        # Make the exception due again, as if it was checked long ago.
+        TrackedLabel.query.filter_by(label_id="se-2").update({TrackedLabel.last_checked_at: None})
+        db_session.commit()
+
+    def refresher(self, se) -> TrackingRefresher:
+        return TrackingRefresher(
+            se,
+            executor=ShipEngineExecutor(max_workers=1, rate_limiter=TokenBucket(rate=1e6)),
+            batch_size=10,
+        )
+
+    def test_due_skips_delivered_labels_and_puts_problems_first(self):
+        self.assertEqual(self.refresher(FakeShipEngine({})).due(), ["se-2", "se-3", "se-4"])
+
+    def test_refresh_once_updates_labels_and_bumps_failed_ones(self):
+        se = FakeShipEngine({"se-2": "DE", "se-3": "IT"})
+        self.assertEqual(self.refresher(se).refresh_once(), 3)
+
+        self.assertEqual(sorted(se.tracked), ["se-2", "se-3", "se-4"])
+        statuses = dict(db_session.query(TrackedLabel.label_id, TrackedLabel.status_code))
+        self.assertEqual(statuses, {"se-1": "DE", "se-2": "DE", "se-3": "IT", "se-4": "UN"})
+        # The failed label is not retried right away.
+        self.assertIsNotNone(TrackedLabel.query.filter_by(label_id="se-4").one().last_checked_at)
+        self.assertEqual(self.refresher(se).due(), [])
+
+
+class ImportTest(unittest.TestCase):
+    def test_webhooks_do_not_load_the_api_client(self):
+        code = (
+            "import sys, csv_shipper.webhooks; "
+            "sys.exit('csv_shipper.se_client' in sys.modules)"
+        )
+        repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(subprocess.run([sys.executable, "-c", code], cwd=repo).returncode, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from sqlalchemy.exc import IntegrityError
+
+from csv_shipper import db_session
+from csv_shipper.models import ShippingAddress, UnitOfWork, db_add, db_rm
+
+from support import DatabaseTestCase
+
+
+def address_row(user_id: int, description: str) -> dict:
+    return dict(
+        user_id=user_id,
+        description=description,
+        name="Kasey Cantu",
+        phone="1-789-456-1234",
+        company_name="ShipEngine",
+        address_line_1="4009 Marathon Blvd",
+        city_locality="Austin",
+        state_province="TX",
+        postal_code=78756,
+        country_code="US",
+        address_residential_indicator="no",
+    )
+
+
+class UnitOfWorkTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_id = self.make_user().id
+
+    def stored(self) -> list:
+        # A fresh session, so only committed rows are seen.
+        db_session.remove()
+        return sorted(description for description, in db_session.query(ShippingAddress.description))
+
+    def test_adds_and_mappings_are_committed_on_exit(self):
+        with UnitOfWork(flush_size=2) as uow:
+            uow.add_all(ShippingAddress(**address_row(self.user_id, f"a{n}")) for n in range(3))
+            uow.add_mappings(ShippingAddress, (address_row(self.user_id, f"m{n}") for n in range(3)))
+
+        self.assertEqual(self.stored(), ["a0", "a1", "a2", "m0", "m1", "m2"])
+
+    def test_rows_are_written_every_flush_size_before_the_commit(self):
+        with UnitOfWork(flush_size=2) as uow:
+            for n in range(3):
+                uow.add(ShippingAddress(**address_row(self.user_id, f"a{n}")))
+            self.assertEqual(db_session.query(ShippingAddress).count(), 2)
+
+    def test_exception_rolls_everything_back(self):
+        with self.assertRaises(RuntimeError):
+            with UnitOfWork(flush_size=2) as uow:
+                uow.add_all(ShippingAddress(**address_row(self.user_id, f"a{n}")) for n in range(3))
+                uow.add_mappings(ShippingAddress, [address_row(self.user_id, "m0")])
+                raise RuntimeError("boom")
+
+        # Same session: the flushed batch would still show without the rollback.
+        self.assertEqual(db_session.query(ShippingAddress).count(), 0)
+
+    def test_failed_flush_rolls_back_the_earlier_batches(self):
+        with self.assertRaises(IntegrityError):
+            with UnitOfWork(flush_size=2) as uow:
+                uow.add(ShippingAddress(**address_row(self.user_id, "a0")))
+                uow.add(ShippingAddress(**address_row(self.user_id, "a1")))
+                uow.add_mappings(ShippingAddress, [address_row(self.user_id, "a0")])
+
+        self.assertEqual(db_session.query(ShippingAddress).count(), 0)
+
+    def test_deletes_are_committed_on_exit(self):
+        db_add(ShippingAddress(**address_row(self.user_id, "a0")))
+        db_add(ShippingAddress(**address_row(self.user_id, "a1")))
+        with UnitOfWork() as uow:
+            uow.delete(ShippingAddress.query.filter_by(description="a0").one())
+
+        self.assertEqual(self.stored(), ["a1"])
+
+
+class DbHelpersTest(DatabaseTestCase):
+    def test_db_add_commits_and_db_rm_deletes(self):
+        user_id = self.make_user().id
+        address = ShippingAddress(**address_row(user_id, "a0"))
+        db_add(address)
+        self.assertIsNotNone(address.id)
+
+        db_rm(address)
+        db_session.remove()
+        self.assertEqual(db_session.query(ShippingAddress).count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
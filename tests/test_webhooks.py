@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from sqlalchemy.exc import OperationalError
+
+from csv_shipper.webhooks import WebhookConsumer
+
+from support import get_app
+
+
+class RecordingConsumer(WebhookConsumer):
+    """Keeps stored batches in memory instead of writing them to the database."""
+
+    def __init__(self, *args, fail_first: int = 0, **kwargs):
+        self.stored = []
+        self.fail_first = fail_first
+        self.stored_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _store(self, events):
+        with self.stored_lock:
+            if self.fail_first:
+                self.fail_first -= 1
+                raise OperationalError("INSERT", {}, Exception("database unavailable"))
+            if any(event["resource_url"].endswith("poison") for event in events):
+                raise RuntimeError("value too long for type character varying(255)")
+            self.stored.extend(events)
+
+
+def submit(consumer, n, **payload) -> bool:
+    payload = dict(
+        {"resource_type": "API_TRACK", "resource_url": f"https://example.com/{n}"}, **payload
+    )
+    return consumer.submit(json.dumps(payload).encode(), payload)
+
+
+class WebhookConsumerTest(unittest.TestCase):
+    def setUp(self):
+        self.app = get_app()
+
+    def test_close_stores_every_queued_event(self):
+        # A long flush interval keeps the events queued until close().
+        consumer = RecordingConsumer(self.app, batch_size=1000, flush_interval=60)
+        for n in range(250):
+            self.assertTrue(submit(consumer, n))
+
+        self.assertTrue(consumer.close(timeout=5))
+        self.assertEqual(len(consumer.stored), 250)
+        self.assertTrue(consumer.queue.empty())
+
+    def test_no_events_are_taken_after_close(self):
+        consumer = RecordingConsumer(self.app, flush_interval=0.01)
+        consumer.close(timeout=5)
+
+        self.assertFalse(submit(consumer, 1))
+        self.assertEqual(consumer.stored, [])
+
+    def test_failed_batch_is_retried(self):
+        consumer = RecordingConsumer(self.app, flush_interval=0.01, fail_first=1)
+        submit(consumer, 1)
+        submit(consumer, 1)
+        submit(consumer, 2)
+
+        consumer.close(timeout=5)
+        self.assertEqual(
+            sorted(event["resource_url"] for event in consumer.stored),
+            ["https://example.com/1", "https://example.com/2"],
+        )
+
+    def test_poison_event_is_dead_lettered_without_blocking_the_batch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dead_letter_path = os.path.join(tmp, "dead.jsonl")
+            consumer = RecordingConsumer(
+                self.app,
+                flush_interval=0.01,
+                max_attempts=3,
+                dead_letter_path=dead_letter_path,
+            )
+            submit(consumer, 1)
+            submit(consumer, "poison")
+            submit(consumer, 2)
+            self.assertTrue(consumer.close(timeout=5))
+
+            self.assertEqual(
+                sorted(event["resource_url"] for event in consumer.stored),
+                ["https://example.com/1", "https://example.com/2"],
+            )
+            with open(dead_letter_path) as f:
+                dead = [json.loads(line) for line in f]
+            self.assertEqual([event["resource_url"] for event in dead], ["https://example.com/poison"])
+            self.assertIn("character varying", dead[0]["error"])
+
+    def test_oversized_fields_are_truncated_to_the_columns(self):
+        consumer = RecordingConsumer(self.app, flush_interval=0.01)
+        submit(consumer, 1, resource_type="X" * 40, resource_url="https://" + "a" * 300)
+        consumer.close(timeout=5)
+
+        event = consumer.stored[0]
+        self.assertEqual(len(event["resource_type"]), 30)
+        self.assertEqual(len(event["resource_url"]), 255)
+        self.assertEqual(len(event["payload"]["resource_url"]), 308)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,7 @@
+from csv_shipper import create_app, load_dotenv
+
+load_dotenv()
+
+# The production entry point, e.g. `uwsgi --ini uwsgi.ini`. The config
+# profile comes from CSV_SHIPPER_ENV and defaults to production.
+app = create_app()